@@ -3,7 +3,7 @@ import machine
 from machine import Pin, SPI, RTC
 from font import vga1_8x16 as font
 from lib import microhydra as mh
-import os, time, sys
+import os, time, sys, array, gc
 from esp32 import NVS
 
 # increased freq makes fancy text drawing faster. This may not be necessary if fancytext function is optimized
@@ -43,6 +43,34 @@ _SPACE_CLASS = const(1)
 _INDENT_CLASS = const(2)
 _OTHER_CLASS = const(4)
 
+# syntax highlighting token kinds:
+_TOKEN_TEXT = const(0)
+_TOKEN_OPERATOR = const(1)
+_TOKEN_KEYWORD = const(2)
+_TOKEN_NUMBER = const(3)
+_TOKEN_STRING = const(4)
+_TOKEN_COMMENT = const(5)
+
+_KEYWORDS = const(('and','as','assert','break','class','continue','def','del','elif','else','except',
+                   'False','Finally','for','from','global','if','import','in','is','lambda','None',
+                   'nonlocal','not','or','pass','raise','return','True','try','while','with','yield'))
+_OPERATORS = const("<>,|[]{}()*^%!=-+/:;&@")
+
+# minimum free space (bytes) the document gap buffer grows by
+_GAP_SIZE = const(1024)
+# how many decoded lines the document keeps around
+_LINE_CACHE_SIZE = const(24)
+# files larger than this (in bytes) are read from storage as needed, rather than loaded into memory
+_LARGE_FILE_SIZE = const(40_000)
+# how many lines around the viewport are kept decoded for large files
+_LINE_WINDOW = const(48)
+# free memory needed to enable double buffering: the front buffer (240x135, 2 bytes per pixel),
+# plus room for the document to be reallocated (briefly needing two copies) as it grows.
+_DOUBLE_BUFFER_MIN_FREE = const(64_800 + 3 * _LARGE_FILE_SIZE)
+
+# how many uncached lines above a line are tokenized to find out if it starts inside a multi-line string
+_TOKEN_LOOKBACK = const(32)
+
 # rarely used whitespace chars are repurposed to denote converted tab/space indents
 _INDENT_SYM = const(' ')
 # _SPACE_INDENT_SYM = const(' ')
@@ -79,6 +107,9 @@ nvs = NVS("HyDE")
 # load config option to use tabs/spaces
 use_tabs = False
 
+# reusable per-character colors for draw_fancy_line
+line_colors = array.array('H')
+
 
 
 #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ Generate color palette: ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
@@ -111,6 +142,32 @@ comment_color = mhconfig.mix_color565(config.palette[1], config.palette[5], mix_
 dark_comment_color = mhconfig.mix_color565(config.palette[1], config.palette[5], mix_factor=0.25, hue_mix_fac=0, sat_mix_fac=0.1)
 
 
+def make_token_colors():
+    """
+    Build color lookup tables for each token kind, as (color, left_fade_color, right_fade_color).
+    Returns the table for fancy (main) lines, and a table for each fade level of small lines.
+    """
+    fancy = (
+        (config.palette[5], config.palette[3], config.palette[4]), # _TOKEN_TEXT
+        (op_color, op_color, op_color),                            # _TOKEN_OPERATOR
+        (keyword_color, keyword_color, keyword_color),             # _TOKEN_KEYWORD
+        (num_color, num_color, num_color),                         # _TOKEN_NUMBER
+        (str_color, dark_str_color, dark_str_color),               # _TOKEN_STRING
+        (comment_color, dark_comment_color, dark_comment_color),   # _TOKEN_COMMENT
+        )
+    small = []
+    for fade in range(3):
+        plain = (config.palette[max(4 - fade, 2)], config.palette[2], config.palette[max(3 - fade, 2)])
+        small.append(
+            (plain, plain, plain, plain,
+             (dark_str_color, dark_str_color, dark_str_color),
+             (dark_comment_color, dark_comment_color, dark_comment_color))
+            )
+    return fancy, small
+
+fancy_colors, small_colors = make_token_colors()
+
+
 
 
 #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
@@ -225,20 +282,6 @@ def classify_char(char) -> int:
     return _OTHER_CLASS
 
 
-def is_var(string) -> bool:
-    """Check if string could be a variable name."""
-    for idx, char in enumerate(string):
-        if idx == 0:
-        # first char can only be underscore or letter
-            if not (char.isalpha() or char == "_"):
-                return False
-        else:
-        # chars must be alphanumeric or underscores
-            if not (char.isalpha() or char == "_" or char.isdigit()):
-                return False
-    return True
-
-
 def is_numeric(string):
     """Check if string is numeric. Support for "_" and "." """
     any_numbers = False
@@ -322,6 +365,87 @@ def segment_from_str(string, index):
             idx -= 1
         else: break
     return output_str
+
+
+def find_string_end(line, quote, idx):
+    """Find the index of the quote that closes a string, skipping escaped quotes. Returns -1 if not found."""
+    end = line.find(quote, idx)
+    while end > 0 and line[end - 1] == "\\":
+        end = line.find(quote, end + 1)
+    return end
+
+
+def tokenize_line(line, string_state=None):
+    """
+    Split a line into tokens for syntax highlighting.
+    
+    string_state is the triple quote left open by the previous line (or None).
+    Returns a flat array of (kind, start, length) for each token,
+    and the string_state at the end of this line.
+    """
+    tokens = array.array('H')
+    
+    def add_token(kind, start, end):
+        # merge with the previous token when possible
+        if tokens and tokens[-3] == kind and tokens[-2] + tokens[-1] == start:
+            tokens[-1] = end - tokens[-2]
+        else:
+            tokens.append(kind)
+            tokens.append(start)
+            tokens.append(end - start)
+    
+    length = len(line)
+    idx = 0
+    
+    if string_state:
+        # this line starts inside a multi-line string
+        end = find_string_end(line, string_state, 0)
+        if end == -1:
+            add_token(_TOKEN_STRING, 0, length)
+            return tokens, string_state
+        idx = end + 3
+        add_token(_TOKEN_STRING, 0, idx)
+    
+    while idx < length:
+        char = line[idx]
+        
+        if char in "'\"":
+            quote = char * 3 if line.startswith(char * 3, idx) else char
+            end = find_string_end(line, quote, idx + len(quote))
+            if end == -1:
+                add_token(_TOKEN_STRING, idx, length)
+                # only triple quoted strings continue on the next line
+                return tokens, quote if len(quote) == 3 else None
+            end += len(quote)
+            add_token(_TOKEN_STRING, idx, end)
+            idx = end
+            
+        elif char == "#":
+            add_token(_TOKEN_COMMENT, idx, length)
+            break
+        
+        elif char in _OPERATORS:
+            add_token(_TOKEN_OPERATOR, idx, idx + 1)
+            idx += 1
+        
+        else:
+            char_class = classify_char(char)
+            end = idx + 1
+            if char_class == _ALPHA_CLASS:
+                # names can contain numbers
+                while end < length and classify_char(line[end]) in (_ALPHA_CLASS, _DIGIT_CLASS):
+                    end += 1
+                add_token(_TOKEN_KEYWORD if line[idx:end] in _KEYWORDS else _TOKEN_TEXT, idx, end)
+            elif char_class == _DIGIT_CLASS or char_class == _DOT_CLASS:
+                # numbers can start with, or contain a "."
+                while end < length and classify_char(line[end]) in (_DIGIT_CLASS, _DOT_CLASS):
+                    end += 1
+                add_token(_TOKEN_NUMBER if is_numeric(line[idx:end]) else _TOKEN_TEXT, idx, end)
+            else:
+                add_token(_TOKEN_TEXT, idx, end)
+            idx = end
+    
+    return tokens, None
     
     
     
@@ -329,46 +453,49 @@ def segment_from_str(string, index):
 #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ Graphics Functions: ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
-def draw_small_line(line,x,y,fade=0):
+def fill_line_colors(length, tokens, x, color_table):
+    """
+    Fill line_colors for the visible chars of a line, from its tokens.
+    Returns the range of chars that are visible when the line is drawn at x.
+    """
+    # grow the buffer by exactly the shortfall (only happens when a longer line is drawn)
+    for _ in range(length - len(line_colors)):
+        line_colors.append(0)
+    
+    vis_start = 0 if x >= 0 else (-x) // 8
+    vis_end = min(length, (_DISPLAY_WIDTH - 1 - x) // 8 + 1)
+    # chars before/after these indices are drawn faded
+    left_fade_end = (_LEFT_PADDING - x + 7) // 8
+    right_fade_start = (_RIGHT_TEXT_FADE - x + 7) // 8
+    
+    for t in range(0, len(tokens), 3):
+        start = max(tokens[t + 1], vis_start)
+        end = min(tokens[t + 1] + tokens[t + 2], vis_end)
+        if start >= end:
+            continue
+        color, left_color, right_color = color_table[tokens[t]]
+        for i in range(start, end):
+            if i < left_fade_end:
+                line_colors[i] = left_color
+            elif i >= right_fade_start:
+                line_colors[i] = right_color
+            else:
+                line_colors[i] = color
+    
+    return vis_start, vis_end
+
+
+def draw_small_line(line,tokens,x,y,fade=0):
     """apply special styling to a small line and display it."""
     line = format_display_line(line)
-    is_comment = False
-    string_char = None
-    for idx, char in enumerate(line):
-        # find comments
-        if char == "#" and string_char == None:
-            is_comment = True
-        # find strings
-        if char in "'\"":
-            if string_char == None:
-                string_char = char
-            elif char == string_char:
-                string_char = "END"
-        
-        # decide on color
-        clr_idx = 4 - fade
-        if x < _LEFT_PADDING: # fade left chars
-            color = config.palette[3]
-            clr_idx -= 2
-        elif x >= _RIGHT_TEXT_FADE:
-            color = config.palette[4]
-            clr_idx -= 1
-            
-        if is_comment:
-            color = dark_comment_color
-        elif string_char:
-            color = dark_str_color
-        else:
-            color = config.palette[max(clr_idx, 2)]
-        
-        tft.text(char,
-                    x,
-                    y, color
-                    )
-        
-        # reset style trackers for next cycle
-        if string_char == "END": string_char = None
-        x += 8
+    vis_start, vis_end = fill_line_colors(len(line), tokens, x, small_colors[fade])
+    
+    # draw runs of same-colored chars together
+    run_start = vis_start
+    for idx in range(vis_start + 1, vis_end + 1):
+        if idx == vis_end or line_colors[idx] != line_colors[run_start]:
+            tft.text(line[run_start:idx], x + run_start * 8, y, line_colors[run_start])
+            run_start = idx
 
 
 def draw_rule(x,y,small=False, highlight=False):
@@ -386,97 +513,318 @@ def draw_rules(line,x,y,small=False,highlight=False):
         x += 8
 
 
-def draw_fancy_line(line, x, y, highlight=False, trim=True):
+def draw_fancy_line(line, tokens, x, y, highlight=False):
     """apply special styling to a line and display it."""
-    _KEYWORDS = const(('and','as','assert','break','class','continue','def','del','elif','else','except',
-                       'False','Finally','for','from','global','if','import','in','is','lambda','None',
-                       'nonlocal','not','or','pass','raise','return','True','try','while','with','yield'))
-    _OPERATORS = const("<>,|[]{}()*^%!=-+/:;&@")
-    # TODO: I worry this may be extremely unoptomized. Should maybe be tested/optimized further.
     line = format_display_line(line)
-    # trim right part of line to speed up styling
-    if len(line) > _HORIZONTAL_CHARACTERS and trim:
-        offset = 0
-        if x < _LEFT_RULE:
-            offset_px = (x - _LEFT_RULE) * - 1
-            offset = offset_px // 8
-        start_trim = max(offset - 20,0)
-        line = line[start_trim:_HORIZONTAL_CHARACTERS + offset + 1]
-        x += start_trim*8
-    
-    # track if this line is commented
-    is_comment = False
-    # track if string found
-    string_char = None
-    num_char = False
-    
-    var_char = False
-    
-    current_segment = ""
-    segment_counter = -1
-    
-    for idx, char in enumerate(line):
-        
-        # track current word segment
-        if segment_counter <= 0: # need to fetch next segment
-            # currently we only care about these, so might as well save some time
-            current_segment = segment_from_str(line, idx)
-            segment_counter = len(current_segment)
-            
-            # check if it could be a var
-            if is_var(current_segment):
-                var_char = True
-            else:
-                var_char = False
-        
-        # find comments
-        if char == "#" and string_char == None:
-            is_comment = True
-        #find strings
-        elif char in "'\"":
-            if string_char == None:
-                string_char = char
-            elif char == string_char:
-                string_char = "END"
-        
-        #decide on color
-        if is_comment: # comment string
-            if x >= _RIGHT_TEXT_FADE or x < _LEFT_PADDING:
-                color = dark_comment_color
-            else:
-                color = comment_color
-        elif string_char: # this is in a string
-            if x >= _RIGHT_TEXT_FADE or x < _LEFT_PADDING:
-                color = dark_str_color
-            else:
-                color = str_color
-        elif current_segment in _KEYWORDS: # keywords
-            color = keyword_color
-        elif is_numeric(current_segment): # this is a number
-            color = num_color
-        elif char in _OPERATORS:
-            color = op_color
-        elif x < _LEFT_PADDING: # fade left chars
-            color = config.palette[3]
-        elif x >= _RIGHT_TEXT_FADE:
-            color = config.palette[4]
+    fill_line_colors(len(line), tokens, x, fancy_colors)
+    # draw the whole line at once
+    tft.bitmap_text_colors(font, line, x, y, line_colors)
+
+
+
+#--------------------------------------------------------------------------------------------------
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ Document Class: ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+#--------------------------------------------------------------------------------------------------
+class Document:
+    """
+    Holds the text of a file, as UTF-8 in a gap buffer, with a line start index.
+    
+    Lines are separated by "\n" in the buffer. Edits happen at the gap, so typing at the cursor
+    only ever moves the few bytes between the last edit and the new one.
+    
+    Line starts before the gap are stored as offsets from the start of the text,
+    and line starts after the gap are stored as distances from the end of the text,
+    so that inserting/deleting at the gap doesn't change any of them.
+    
+    Lines can be read like a list (doc[idx], len(doc)), and are decoded (and cached) on demand.
+    """
+    def __init__(self, capacity=0):
+        self.buf = bytearray(capacity + _GAP_SIZE)
+        self.gap_start = 0
+        self.gap_end = len(self.buf)
+        self.length = 0
+        self.starts = [0]
+        # lines below this index start before (or at) the gap
+        self.split = 1
+        self.line_cache = {}
+    
+    def __len__(self):
+        return len(self.starts)
+    
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += len(self.starts)
+        line = self.line_cache.get(idx)
+        if line is None:
+            if len(self.line_cache) >= _LINE_CACHE_SIZE:
+                self.line_cache = {}
+            line = str(self._get_bytes(self._line_start(idx), self._line_end(idx)), 'utf-8')
+            self.line_cache[idx] = line
+        return line
+    
+    def __setitem__(self, idx, line):
+        """Replace the text of a line."""
+        start = self._line_start(idx)
+        end = self._line_end(idx)
+        self._move_gap(end)
+        self._delete_before_gap(end - start)
+        self._insert_at_gap(line.encode())
+    
+    def _line_start(self, idx):
+        start = self.starts[idx]
+        return start if idx < self.split else self.length - start
+    
+    def _line_end(self, idx):
+        if idx + 1 < len(self.starts):
+            return self._line_start(idx + 1) - 1
+        return self.length
+    
+    def _pos(self, line_idx, char_idx):
+        """Convert a line and character index into a byte offset into the text."""
+        if char_idx == 0:
+            return self._line_start(line_idx)
+        return self._line_start(line_idx) + len(self[line_idx][:char_idx].encode())
+    
+    def _get_bytes(self, start, end):
+        """Get a range of the text, skipping over the gap."""
+        gap_start = self.gap_start
+        buf = memoryview(self.buf)
+        if end <= gap_start:
+            return buf[start:end]
+        gap_len = self.gap_end - gap_start
+        if start >= gap_start:
+            return buf[start + gap_len:end + gap_len]
+        return bytes(buf[start:gap_start]) + bytes(buf[self.gap_end:end + gap_len])
+    
+    def _grow(self, size):
+        """Reallocate the buffer, with room for at least 'size' more bytes in the gap."""
+        old_buf = memoryview(self.buf)
+        tail = len(self.buf) - self.gap_end
+        buf = bytearray(self.length + size + _GAP_SIZE + len(self.buf) // 8)
+        buf[:self.gap_start] = old_buf[:self.gap_start]
+        buf[len(buf) - tail:] = old_buf[self.gap_end:]
+        self.gap_end = len(buf) - tail
+        self.buf = buf
+    
+    def _move_gap(self, pos):
+        gap_start = self.gap_start
+        if pos == gap_start:
+            return
+        buf = memoryview(self.buf)
+        starts = self.starts
+        if pos < gap_start:
+            size = gap_start - pos
+            buf[self.gap_end - size:self.gap_end] = buf[pos:gap_start]
+            self.gap_start = pos
+            self.gap_end -= size
+            # lines that now start after the gap are stored as distance from the end
+            while starts[self.split - 1] > pos:
+                self.split -= 1
+                starts[self.split] = self.length - starts[self.split]
         else:
-            color = config.palette[5]
+            size = pos - gap_start
+            buf[gap_start:pos] = buf[self.gap_end:self.gap_end + size]
+            self.gap_start = pos
+            self.gap_end += size
+            # lines that now start before the gap are stored as offset from the start
+            while self.split < len(starts) and self.length - starts[self.split] <= pos:
+                starts[self.split] = self.length - starts[self.split]
+                self.split += 1
+    
+    def _insert_at_gap(self, data):
+        size = len(data)
+        if size > self.gap_end - self.gap_start:
+            self._grow(size)
+        gap_start = self.gap_start
+        self.buf[gap_start:gap_start + size] = data
+        # index new lines
+        idx = data.find(b"\n")
+        while idx != -1:
+            self.starts.insert(self.split, gap_start + idx + 1)
+            self.split += 1
+            idx = data.find(b"\n", idx + 1)
+        self.gap_start += size
+        self.length += size
+        self.line_cache = {}
+    
+    def _delete_before_gap(self, size):
+        pos = self.gap_start - size
+        # remove lines whose newline was deleted
+        while self.starts[self.split - 1] > pos:
+            self.split -= 1
+            self.starts.pop(self.split)
+        self.gap_start = pos
+        self.length -= size
+        self.line_cache = {}
+    
+    def insert_text(self, line_idx, char_idx, text):
+        """Insert text (which may contain newlines) at the given position."""
+        self._move_gap(self._pos(line_idx, char_idx))
+        self._insert_at_gap(text.encode())
+    
+    def delete_text(self, line_idx, char_idx, count):
+        """Delete 'count' characters starting at the given position. Newlines count as one character."""
+        start = self._pos(line_idx, char_idx)
+        # find the end position
+        while count > len(self[line_idx]) - char_idx and line_idx + 1 < len(self.starts):
+            count -= len(self[line_idx]) - char_idx + 1
+            line_idx += 1
+            char_idx = 0
+        end = self._pos(line_idx, min(char_idx + count, len(self[line_idx])))
+        self._move_gap(end)
+        self._delete_before_gap(end - start)
+    
+    def load(self, file):
+        """
+        Read the lines of a text file into the document, cleaning each one for display.
+        Returns True if tabs are used for indentation, False for spaces, or None if there are no indents.
+        """
+        use_tabs = None
+        first = True
+        for line in file:
+            if use_tabs is None:
+                use_tabs = auto_set_tabs((line,))
+            if not first:
+                self._insert_at_gap(b"\n")
+            self._insert_at_gap(clean_line(line).encode())
+            first = False
+        return use_tabs
+    
+    def save(self, filepath, indent):
+        """Write the document to a file, line by line, converting indents back to the given indent."""
+        # put all the text in one contiguous block
+        self._move_gap(self.length)
+        indent_sym = _INDENT_SYM.encode()
+        indent = indent.encode()
+        buf = memoryview(self.buf)
+        with open(filepath, "wb") as file:
+            for idx in range(len(self.starts)):
+                line = bytes(buf[self._line_start(idx):self._line_end(idx)])
+                if indent_sym in line:
+                    line = line.replace(indent_sym, indent)
+                file.write(line)
+                file.write(b"\r\n")
+
+
+class FileDocument:
+    """
+    A document for large files, which only keeps the file offset of each line in memory.
+    
+    Lines are read from the file (and decoded) as they are displayed,
+    and only a window of decoded lines is kept around.
+    Edited lines are stored as strings in place of their offset, until the file is saved.
+    
+    This has the same interface as Document.
+    """
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.file = None
+        self.index = ['']
+        self.line_cache = {}
+    
+    def __len__(self):
+        return len(self.index)
+    
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += len(self.index)
+        entry = self.index[idx]
+        if isinstance(entry, str):
+            # edited line
+            return entry
+        
+        line = self.line_cache.get(idx)
+        if line is None:
+            if len(self.line_cache) >= _LINE_WINDOW:
+                # forget lines that are far from this one
+                self.line_cache = {
+                    i: line for i, line in self.line_cache.items() if abs(i - idx) < _LINE_WINDOW // 2
+                    }
+            self.file.seek(entry)
+            line = clean_line(self.file.readline().decode())
+            self.line_cache[idx] = line
+        return line
+    
+    def __setitem__(self, idx, line):
+        self.index[idx] = line
+    
+    def load(self):
+        """
+        Index the start of each line in the file, in one pass.
+        Returns True if tabs are used for indentation, False for spaces, or None if there are no indents.
+        """
+        use_tabs = None
+        if self.file:
+            self.file.close()
+        self.file = open(self.filepath, 'rb')
+        
+        index = []
+        pos = 0
+        for line in self.file:
+            index.append(pos)
+            pos += len(line)
+            if use_tabs is None:
+                if line.startswith(b"\t"):
+                    use_tabs = True
+                elif line.startswith(b"    "):
+                    use_tabs = False
+        
+        self.index = index if index else ['']
+        self.line_cache = {}
+        return use_tabs
+    
+    def insert_text(self, line_idx, char_idx, text):
+        """Insert text (which may contain newlines) at the given position."""
+        line = self[line_idx]
+        new_lines = (line[:char_idx] + text + line[char_idx:]).split("\n")
+        self.index[line_idx] = new_lines[0]
+        for i in range(1, len(new_lines)):
+            self.index.insert(line_idx + i, new_lines[i])
+        if len(new_lines) > 1:
+            # line numbers have shifted
+            self.line_cache = {}
+    
+    def delete_text(self, line_idx, char_idx, count):
+        """Delete 'count' characters starting at the given position. Newlines count as one character."""
+        text = self[line_idx]
+        end_idx = line_idx
+        while count > len(text) - char_idx and end_idx + 1 < len(self.index):
+            end_idx += 1
+            text += "\n" + self[end_idx]
+        
+        self.index[line_idx] = text[:char_idx] + text[char_idx + count:]
+        for _ in range(end_idx - line_idx):
+            self.index.pop(line_idx + 1)
+        if end_idx > line_idx:
+            # line numbers have shifted
+            self.line_cache = {}
+    
+    def save(self, filepath, indent):
+        """
+        Write the document to a file, line by line, converting indents back to the given indent.
+        The original file is still being read from, so the new file is written beside it, then renamed.
+        """
+        temp_path = filepath + ".tmp"
+        with open(temp_path, "wb") as file:
+            for entry in self.index:
+                if not isinstance(entry, str):
+                    self.file.seek(entry)
+                    entry = clean_line(self.file.readline().decode())
+                file.write(entry.replace(_INDENT_SYM, indent).encode())
+                file.write(b"\r\n")
+        
+        self.file.close()
+        self.file = None
+        os.rename(temp_path, filepath)
+        # the saved file is our new source
+        self.filepath = filepath
+        self.load()
+        
         
-        tft.bitmap_text(font, char,
-                        x,
-                        y, color
-                        )
         
-        # reset style trackers for next cycle
-        if string_char == "END": string_char = None
-        if num_char: num_char = False
-        segment_counter -= 1
         
-        x += 8
-
-
-
 #--------------------------------------------------------------------------------------------------
 #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ Editor Class: ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
@@ -486,12 +834,58 @@ class Editor:
     #class to handle our text editor display and state
     def __init__(self, overlay):
         self.overlay = overlay
-        self.lines = []
+        self.lines = Document()
         self.display_index = [0,-3]
         self.cursor_index = [0,0]
         self.clipboard = ''
+        # syntax highlighting cache, {line_index: (line, start_string_state, tokens, end_string_state)}
+        self.token_cache = {}
+    
+    def get_tokens(self, idx):
+        """Get the syntax tokens for a line, only tokenizing it if it has changed."""
+        cache = self.token_cache
+        # find nearest cached line above this one, to carry multi-line string state from
+        first = idx
+        while first > 0 and idx - first < _TOKEN_LOOKBACK and (first - 1) not in cache:
+            first -= 1
+        state = cache[first - 1][3] if (first - 1) in cache else None
+        
+        for i in range(first, idx + 1):
+            line = self.lines[i]
+            entry = cache.get(i)
+            if entry is None or entry[1] != state or entry[0] != line:
+                tokens, end_state = tokenize_line(line, state)
+                entry = (line, state, tokens, end_state)
+                cache[i] = entry
+            state = entry[3]
+        return entry[2]
+    
+    def invalidate_tokens(self, idx, shift=0):
+        """
+        Forget the tokens for an edited line.
+        shift is the number of lines inserted (or removed, if negative) directly after idx.
+        """
+        cache = self.token_cache
+        if idx in cache:
+            del cache[idx]
+        if shift:
+            moved = {}
+            for i, entry in cache.items():
+                if i < idx:
+                    moved[i] = entry
+                elif shift > 0 or i > idx - shift:
+                    moved[i + shift] = entry
+            self.token_cache = moved
+    
+    def trim_token_cache(self):
+        """Drop cached tokens for lines far from the display."""
+        top = self.display_index[1] - _TOKEN_LOOKBACK
+        bottom = self.display_index[1] + _TOKEN_LOOKBACK
+        for i in [i for i in self.token_cache if i < top or i > bottom]:
+            del self.token_cache[i]
     
     def draw_lines(self):
+        self.trim_token_cache()
         draw_y = 0
         line_x = _LEFT_PADDING - (self.display_index[0] * 8)
         for i in range(self.display_index[1],self.display_index[1] + 11):
@@ -500,19 +894,19 @@ class Editor:
                     # only draw lines that are in the file:
                     if i >= 0 and i < len(self.lines):
                         draw_rules(self.lines[i],line_x,draw_y,small=True,highlight=False)
-                        draw_small_line(self.lines[i], line_x, draw_y, 2)
+                        draw_small_line(self.lines[i], self.get_tokens(i), line_x, draw_y, 2)
                     draw_y += 8
                 elif i <= self.display_index[1] + 1 or i >= self.display_index[1] + 9:
                     #top/bottom lines
                     if i >= 0 and i < len(self.lines):
                         draw_rules(self.lines[i],line_x,draw_y,small=True,highlight=False)
-                        draw_small_line(self.lines[i], line_x, draw_y, 1)
+                        draw_small_line(self.lines[i], self.get_tokens(i), line_x, draw_y, 1)
                     draw_y += 8
                 elif i <= self.display_index[1] + 2 or i >= self.display_index[1] + 8:
                     # compact lines
                     if i >= 0 and i < len(self.lines):
                         draw_rules(self.lines[i],line_x,draw_y,small=True,highlight=False)
-                        draw_small_line(self.lines[i], line_x, draw_y, 0)
+                        draw_small_line(self.lines[i], self.get_tokens(i), line_x, draw_y, 0)
                     draw_y += 8
                 else:
                     if i == self.cursor_index[1]:
@@ -520,7 +914,7 @@ class Editor:
                     if i >= 0 and i < len(self.lines):
                         is_currentline = (i == self.cursor_index[1])
                         draw_rules(self.lines[i],line_x,draw_y,small=False,highlight=is_currentline)
-                        draw_fancy_line(self.lines[i], line_x, draw_y, highlight=is_currentline,trim=is_currentline)
+                        draw_fancy_line(self.lines[i], self.get_tokens(i), line_x, draw_y, highlight=is_currentline)
                     draw_y += 16 + _DISPLAY_PADDING
                     
     def get_current_indentation(self):
@@ -572,36 +966,30 @@ class Editor:
         
     def insert_char(self, char):
         """insert a character at the cursor"""
-        l_line, r_line = self.split_line_at_cursor()
-        self.lines[self.cursor_index[1]] = l_line + char + r_line
+        self.lines.insert_text(self.cursor_index[1], self.cursor_index[0], char)
+        self.invalidate_tokens(self.cursor_index[1])
         self.move_right()
         
     def insert_tab(self):
         """insert a tab at the cursor"""
-        l_line, r_line = self.split_line_at_cursor()
-        
-        self.lines[self.cursor_index[1]] = l_line + _INDENT_SYM + r_line
+        self.lines.insert_text(self.cursor_index[1], self.cursor_index[0], _INDENT_SYM)
+        self.invalidate_tokens(self.cursor_index[1])
         self.move_right()
     
     def insert_line(self):
         """insert a new line at the cursor"""
-        l_line, r_line = self.split_line_at_cursor()
+        l_line, _ = self.split_line_at_cursor()
         
         # auto indent
+        indent = self.get_current_indentation()
         if l_line.endswith(':'):
-            indent = self.get_current_indentation() + _INDENT_SYM
-            r_line = indent + r_line
-            indent_count = len(indent)
-        else:
-            indent = self.get_current_indentation()
-            r_line = indent + r_line
-            indent_count = len(indent)
-            
-        self.lines[self.cursor_index[1]] = l_line
-        self.lines = self.lines[:self.cursor_index[1]+1] + [r_line] + self.lines[self.cursor_index[1]+1:]
+            indent += _INDENT_SYM
+        
+        self.lines.insert_text(self.cursor_index[1], self.cursor_index[0], "\n" + indent)
+        self.invalidate_tokens(self.cursor_index[1], shift=1)
 
         self.move_down()
-        self.cursor_index[0] = indent_count
+        self.cursor_index[0] = len(indent)
         self.display_to_cursor_x()
         
     
@@ -611,14 +999,18 @@ class Editor:
         
         # if cursor at start of line, delete line:
         if not l_line and self.cursor_index[1] > 0:
-            self.lines[self.cursor_index[1] - 1] += r_line
-            self.lines = self.lines[:self.cursor_index[1]] + self.lines[self.cursor_index[1] + 1:]
+            prev_idx = self.cursor_index[1] - 1
+            # delete the newline at the end of the previous line
+            self.lines.delete_text(prev_idx, len(self.lines[prev_idx]), 1)
+            self.invalidate_tokens(prev_idx, shift=-1)
             self.move_left()
             self.cursor_index[0] -= len(r_line)
             
         # else, delete one char:
         else:
-            self.lines[self.cursor_index[1]] = l_line[:-1] + r_line
+            if l_line:
+                self.lines.delete_text(self.cursor_index[1], self.cursor_index[0] - 1, 1)
+                self.invalidate_tokens(self.cursor_index[1])
             self.move_left()
             
         self.display_to_cursor_x()
@@ -759,28 +1151,36 @@ class Editor:
     def save_file(self, filepath):
         self.overlay.draw_textbox("Saving...",_DISPLAY_WIDTH//2,_DISPLAY_HEIGHT//2)
         tft.show()
-        with open(filepath,"w") as file:
-            for line in self.lines:
-                line = line.replace(
-                    _INDENT_SYM, _TAB_INDENT if use_tabs else _SPACE_INDENT 
-                    )
-                file.write(line + "\r\n")
+        self.lines.save(filepath, _TAB_INDENT if use_tabs else _SPACE_INDENT)
     
     def copy_line(self):
         self.clipboard = self.lines[self.cursor_index[1]]
     
     def paste(self):
-        for char in self.clipboard:
-            self.insert_char(char)
+        """insert the clipboard at the cursor, all at once"""
+        clipboard = self.clipboard
+        self.lines.insert_text(self.cursor_index[1], self.cursor_index[0], clipboard)
+        
+        new_lines = clipboard.count("\n")
+        self.invalidate_tokens(self.cursor_index[1], shift=new_lines)
+        if new_lines:
+            self.cursor_index[1] += new_lines
+            self.cursor_index[0] = len(clipboard) - clipboard.rfind("\n") - 1
+            self.display_to_cursor_y()
+        else:
+            self.cursor_index[0] += len(clipboard)
+        self.display_to_cursor_x()
     
     def cut_line(self):
         self.clipboard = self.lines[self.cursor_index[1]]
         self.lines[self.cursor_index[1]] = ''
+        self.invalidate_tokens(self.cursor_index[1])
         self.cursor_index[0] = 0
         self.clamp_cursor()
         
     def del_line(self):
         self.lines[self.cursor_index[1]] = ''
+        self.invalidate_tokens(self.cursor_index[1])
         self.cursor_index[0] = 0
         self.backspace()
         
@@ -792,6 +1192,7 @@ class Editor:
 #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ Main Loop: ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 def main_loop():
     global str_color, dark_str_color, keyword_color, comment_color, dark_comment_color, use_tabs
+    global fancy_colors, small_colors
     
     tft.fill(config['bg_color'])
     overlay = mhoverlay.UI_Overlay(config, kb, display_fbuf=tft)
@@ -805,21 +1206,25 @@ def main_loop():
         str_color = config['ui_color']; dark_str_color = config['ui_color']
         keyword_color = config['ui_color']
         comment_color = config['ui_color']; dark_comment_color = config['ui_color']
+        fancy_colors, small_colors = make_token_colors()
     
     
     try:
-        with open(target_file,'r') as file:
-            editor.lines = file.readlines()
+        file_size = os.stat(target_file)[6]
+        # set 'use tabs' option based on first indent found in file.
+        if file_size > _LARGE_FILE_SIZE:
+            # read large files from storage as they are viewed
+            editor.lines = FileDocument(target_file)
+            use_tabs = editor.lines.load()
+        else:
+            # reserve space for the whole file up front
+            editor.lines = Document(file_size)
+            with open(target_file,'r') as file:
+                use_tabs = editor.lines.load(file)
     except Exception as e:
         overlay.error(f"Couldn't open '{target_file}': {e}")
         machine.reset()
-        
-    #for when file empty
-    if not editor.lines:
-        editor.lines = ['']
-        
-    # set 'use tabs' option based on first indent found in file.
-    use_tabs = auto_set_tabs(editor.lines)
+
     # if 'auto_set_tabs' returned None, use stored value instead
     if use_tabs == None:
         try:
@@ -829,12 +1234,14 @@ def main_loop():
             nvs.set_i32("use_tabs",0)
             nvs.commit()
     
-        
-    for idx, line in enumerate(editor.lines):
-        editor.lines[idx] = clean_line(line)
     editor.move_end()
     editor.draw_lines()
     tft.show()
+    # draw the next frame while the last one is being sent,
+    # unless the front buffer could leave the document without room to grow
+    gc.collect()
+    if file_size <= _LARGE_FILE_SIZE and gc.mem_free() >= _DOUBLE_BUFFER_MIN_FREE:
+        tft.enable_double_buffer()
     pressed_keys = kb.get_new_keys()
     
     redraw_display = True
@@ -936,6 +1343,6 @@ def main_loop():
             time.sleep_ms(1)
             
         editor.draw_cursor() # cursor blinks so it needs to be redrawn regularly
-        tft.show()
+        tft.show_async()
     
 main_loop()
@@ -45,7 +45,7 @@ tft = st7789fbuf.ST7789(
 config = mhconfig.Config()
 kb = smartkeyboard.KeyBoard(config=config)
 overlay = mhoverlay.UI_Overlay(config, kb, display_fbuf=tft)
-beep = beeper.Beeper()
+beep = beeper.Beeper(nonblocking=True)
 
 sd = None
 
@@ -243,6 +243,7 @@ def ext_options(overlay):
         tft.show()
         rtc = machine.RTC()
         rtc.memory('')
+        beep.wait()
         machine.reset()
 
 def file_options(file, overlay):
@@ -300,6 +301,7 @@ def open_file(file):
     # write path to RTC memory
     rtc = machine.RTC()
     rtc.memory(full_path)
+    beep.wait()
     time.sleep_ms(10)
     machine.reset()
     
@@ -1,6 +1,6 @@
 import time, os, math, ntptime, network, framebuf, array
-from lib import smartkeyboard, beeper, battlevel
-import machine
+from lib import smartkeyboard, beeper, battlevel, apploader
+import machine, esp32
 from launcher import st7789hybrid as st7789
 from launcher.icons import battery
 from font import vga1_8x16 as fontsmall
@@ -41,6 +41,11 @@ The basic app loading logic works like this:
  - app at given path now has control of device.
  - pressing the reset button will relaunch the launcher program, and so will calling machine.reset() from the app. 
 
+If 'fast_launch' is enabled in the settings, the launcher skips the reset instead:
+ - launcher passes the app path to lib.apploader, cleans up its hardware, and returns from main_loop
+ - apploader unloads the launcher modules, collects garbage, and imports the app directly
+ - if there isn't enough free memory left after that, apploader falls back to the reset method above
+
 This approach was chosen to reduce the chance of conflicts or memory errors when switching apps.
 Because MicroPython completely resets between apps, the only "wasted" ram from the app switching process will be from main.py
 
@@ -56,8 +61,6 @@ _APPNAME_Y = const(80)
 _DISPLAY_WIDTH = const(240)
 _DISPLAY_HEIGHT = const(135)
 
-_DISPLAY_WIDTH_HALF = const(_DISPLAY_WIDTH//2)
-
 _FONT_WIDTH = const(16)
 _FONT_HEIGHT = const(32)
 _SMALLFONT_WIDTH = const(8)
@@ -67,9 +70,23 @@ _ICON_HEIGHT = const(32)
 _ICON_WIDTH = const(32)
 
 _ICON_FBUF_WIDTH = const(_FONT_WIDTH*3) # wide enough to fit the word "off"
+_ICON_X = const((_ICON_FBUF_WIDTH - _ICON_WIDTH) // 2)
 
 _SCROLL_ANIMATION_TIME = const(300)
 
+# idle scheduling:
+_ACTIVE_FREQ = const(240_000_000)
+_IDLE_FREQ = const(80_000_000)
+# how long after the last input or animation to wait before idling
+_IDLE_DELAY_MS = const(2000)
+# while idle, how long to (light)sleep between keyboard scans
+_IDLE_POLL_MS = const(40)
+
+# where the app index is persisted between boots
+_APP_INDEX_PATH = const("/app_index.json")
+# where rasterized icons are stored
+_ICON_CACHE_DIR = const("/.iconcache")
+
 
 # icon definitions:
 _SD_ICON = const("a2,30,3,31,27,31,28,30,28,1,27,0,6,0,5,1,5,7,2,10,2,13,4,15,4,16,2,18ut,a7,2,7,6,8,6,8,2bf,a10,2,10,6,11,6,11,2bf,a13,2,13,6,14,6,14,2bf,a16,1,16,6,17,6,17,1bf,a19,2,19,6,20,6,20,2bf,a22,1,22,6,23,6,23,1bf,a25,2,25,6,26,6,26,2bf,a11,24,13,24,13,25,14,25,14,27,13,27,13,28,11,28bf,a9,24,7,24,6,25,6,26,9,26,9,27,8,28,6,28bf,a8,25uf,a7,27uf,")
@@ -108,16 +125,24 @@ DISPLAY = st7789.ST7789(
     )
 DISPLAY.vscrdef(20,240,40)
 
+# also used to draw the app selector in strips, while it is being scrolled
+NAME_BUF = bytearray(_FONT_HEIGHT * _DISPLAY_WIDTH * 2)
 NAME_FBUF = framebuf.FrameBuffer(
-    bytearray(_FONT_HEIGHT * _DISPLAY_WIDTH * 2),
+    NAME_BUF,
     _DISPLAY_WIDTH, _FONT_HEIGHT, framebuf.RGB565,
     )
 ICON_FBUF = framebuf.FrameBuffer(
     bytearray(_ICON_HEIGHT * _ICON_FBUF_WIDTH * 2),
     _ICON_FBUF_WIDTH, _ICON_HEIGHT, framebuf.RGB565,
     )
+# holds one rasterized icon, for reading/writing the icon cache
+ICON_CACHE_BUF = bytearray(_ICON_HEIGHT * _ICON_WIDTH * 2)
+ICON_CACHE_FBUF = framebuf.FrameBuffer(
+    ICON_CACHE_BUF,
+    _ICON_WIDTH, _ICON_HEIGHT, framebuf.RGB565,
+    )
 
-BEEP = beeper.Beeper()
+BEEP = beeper.Beeper(nonblocking=True)
 CONFIG = Config()
 KB = smartkeyboard.KeyBoard(config=CONFIG)
 SD = None
@@ -126,25 +151,41 @@ BATT = battlevel.Battery()
 
 SYNC_NTP_ATTEMPTS = 0
 CONNECT_WIFI_ATTEMPTS = 0
+
 SYNCING_CLOCK = None
 
 APP_NAMES = None
 APP_PATHS = None
+APP_ICONS = None
 APP_SELECTOR_INDEX = 0
-PREV_SELECTOR_INDEX = 0
-LASTDRAWN_MINUTE = -1
+# ticks_ms at which the statusbar clock needs to be redrawn
+NEXT_STATUSBAR_MS = 0
+
+LAST_ACTIVE_MS = 0
+IS_IDLE = False
 
 SCROLL_START_MS = 0
 SCROLL_DIRECTION = 0
 IS_SCROLLING = True
+# the animation offset most recently applied with DISPLAY.hw_scroll
+SCROLL_X = 0
+# total hardware scrolling of the display, which is normally 0 again at the end of each animation
+SCROLL_OFFSET = 0
 ICON_UPDATED = False
+ICON_CACHE_PREFIX = None
 
 
 #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ Finding Apps ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-def scan_apps():
-    global SD, APP_NAMES, APP_PATHS
+def scan_apps(full_rescan=False):
+    """
+    Find apps on the flash and SDCard, and set APP_NAMES, APP_PATHS and APP_ICONS.
+    
+    Results are kept in an index on flash, so that unchanged directory entries don't need to be re-examined.
+    If full_rescan is True, every entry is examined again.
+    """
+    global SD, APP_NAMES, APP_PATHS, APP_ICONS
     # first we need a list of apps located on the flash or SDCard
 
     main_directory = os.listdir("/")
@@ -184,42 +225,41 @@ def scan_apps():
         sd_directory = os.listdir("/sd")
 
 
-
+    old_index = {} if full_rescan else load_app_index()
+    
     # if everything above worked, sdcard should be mounted (if available), and both app directories should exist. now look inside to find our apps:
-    main_app_list = list(os.ilistdir("/apps"))
-    sd_app_list = []
+    app_index = {"/apps/": scan_app_dir("/apps/", old_index.get("/apps/", {}))}
 
     if "sd" in main_directory:
         try:
-            sd_app_list = list(os.ilistdir("/sd/apps"))
+            app_index["/sd/apps/"] = scan_app_dir("/sd/apps/", old_index.get("/sd/apps/", {}))
         except OSError as e:
             print(e)
             print("SDCard mounted but cant be opened; assuming it's been removed. Unmounting /sd.")
             os.umount('/sd')
-
+    
+    if app_index != old_index:
+        save_app_index(app_index)
 
     
     # now lets collect some separate app names and locations
     app_names = []
     app_paths = {}
+    app_icons = set()
     
-    for entry in main_app_list:
-        this_name, this_path = get_app_paths(entry, "/apps/")
-        if this_name:
-            
-            if this_name not in app_names:
-                app_names.append(this_name)
+    for directory in ("/apps/", "/sd/apps/"):
+        for entry in app_index.get(directory, {}).values():
+            this_name, this_path, has_icon = entry[2:]
+            if this_name:
                 
-            app_paths[this_name] = this_path
-        
-    for entry in sd_app_list:
-        this_name, this_path = get_app_paths(entry, "/sd/apps/")
-        if this_name:
-            
-            if this_name not in app_names:
-                app_names.append(this_name)
-                
-            app_paths[this_name] = this_path
+                if this_name not in app_names:
+                    app_names.append(this_name)
+                    
+                app_paths[this_name] = this_path
+                if has_icon:
+                    app_icons.add(this_name)
+                else:
+                    app_icons.discard(this_name)
             
             
     #sort alphabetically without uppercase/lowercase discrimination:
@@ -239,6 +279,69 @@ def scan_apps():
 
     APP_NAMES = app_names
     APP_PATHS = app_paths
+    APP_ICONS = app_icons
+
+
+def load_app_index():
+    """Read the saved app index, or return an empty index if there isn't a valid one."""
+    import json
+    try:
+        with open(_APP_INDEX_PATH, "r") as index_file:
+            return json.loads(index_file.read())
+    except (OSError, ValueError):
+        return {}
+
+
+def save_app_index(app_index):
+    import json
+    try:
+        with open(_APP_INDEX_PATH, "w") as index_file:
+            index_file.write(json.dumps(app_index))
+    except OSError as e:
+        print(f"Couldn't save app index: {e}")
+
+
+def scan_app_dir(current_dir, old_entries):
+    """
+    Build the index entries for one app directory.
+    
+    Each entry is [kind, fingerprint, app_name, app_path, has_icon], keyed by the directory entry name.
+    Entries whose kind and fingerprint match old_entries are reused as-is.
+    """
+    entries = {}
+    for ientry in os.ilistdir(current_dir):
+        entry = ientry[0]
+        kind = ientry[1]
+        fingerprint = get_fingerprint(ientry, current_dir)
+        
+        old_entry = old_entries.get(entry)
+        if old_entry and old_entry[0] == kind and old_entry[1] == fingerprint:
+            entries[entry] = old_entry
+        else:
+            entries[entry] = [kind, fingerprint] + list(get_app_paths(ientry, current_dir))
+    return entries
+
+
+def get_fingerprint(ientry, current_dir):
+    # files are fingerprinted by size.
+    # directories are fingerprinted by the size and mtime of the files that make them an app (get_app_paths),
+    # because a directory's mtime doesn't change when a file inside it is rewritten (or doesn't exist at all on LittleFS).
+    # stat-ing these is much cheaper than listing the whole directory.
+    _DIR_FLAG = const(16384)
+    if ientry[1] == _DIR_FLAG:
+        dir_path = current_dir + ientry[0]
+        fingerprint = 0
+        for file_name in ("/__init__.py", "/__init__.mpy", "/__icon__.txt"):
+            try:
+                stat = os.stat(dir_path + file_name)
+                fingerprint = (fingerprint * 31 + stat[6] + stat[8] + 1) & 0x3FFFFFFF
+            except OSError:
+                # file doesn't exist
+                fingerprint = (fingerprint * 31) & 0x3FFFFFFF
+        return fingerprint
+    if len(ientry) > 3:
+        return ientry[3]
+    return os.stat(current_dir + ientry[0])[6]
 
 
 def get_app_paths(ientry, current_dir):
@@ -251,6 +354,7 @@ def get_app_paths(ientry, current_dir):
     
     app_name = None
     app_path = None
+    has_icon = False
     
     if entry.endswith(".py"):
         app_name = entry[:-3]
@@ -265,8 +369,9 @@ def get_app_paths(ientry, current_dir):
         if "__init__.py" in dir_content or "__init__.mpy" in dir_content:
             app_name = entry
             app_path = current_dir + entry
+            has_icon = "__icon__.txt" in dir_content
     
-    return app_name, app_path
+    return app_name, app_path, has_icon
 
 
 #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
@@ -274,10 +379,28 @@ def get_app_paths(ientry, current_dir):
 #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
 def launch_app(app_path):
-    RTC.memory(app_path)
+    """
+    Launch the given app. 
+    Normally this resets the device, and main.py imports the app. 
+    If 'fast_launch' is enabled, this returns instead, and main_loop should return so that main.py can import the app directly.
+    """
     print(f"Launching '{app_path}'...")
+    # let the launch sound finish before resetting
+    BEEP.wait()
     # reset clock speed to default. 
     machine.freq(160_000_000)
+    
+    if CONFIG['fast_launch']:
+        # release the hardware the app will want to use, as a reset would
+        BEEP.deinit()
+        if NIC is not None:
+            NIC.active(False)
+        # the app doesn't expect the GO button to wake it from lightsleep
+        esp32.wake_on_ext0(pin=None)
+        apploader.launch_in_process(app_path)
+        return
+    
+    RTC.memory(app_path)
     time.sleep_ms(10)
     machine.reset()
 
@@ -318,7 +441,7 @@ def play_sound(notes,time_ms=40):
 #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         
 def draw_statusbar(t=None):
-    global LASTDRAWN_MINUTE
+    global NEXT_STATUSBAR_MS
     
     _STATUSBAR_HEIGHT = const(18)
     _CLOCK_X = const(6)
@@ -337,7 +460,7 @@ def draw_statusbar(t=None):
     DISPLAY.fill_rect(_CLOCK_X,_CLOCK_Y,_CLOCK_ERASE_WIDTH, _SMALLFONT_HEIGHT, CONFIG.palette[2])
     
     #clock
-    _,_,_, hour_24, minute, _,_,_ = time.localtime()
+    _,_,_, hour_24, minute, second, _,_ = time.localtime()
     formatted_time, ampm = time_24_to_12(hour_24, minute)
     
     DISPLAY.text(
@@ -350,7 +473,8 @@ def draw_statusbar(t=None):
         _CLOCK_AMPM_X_OFFSET + (len(formatted_time) * _SMALLFONT_WIDTH), _CLOCK_AMPM_Y,
         CONFIG.palette[3], CONFIG.palette[2])
     
-    LASTDRAWN_MINUTE = minute
+    # next redraw is at the start of the next minute
+    NEXT_STATUSBAR_MS = time.ticks_add(time.ticks_ms(), (60 - second) * 1000)
     
     #battery
     batt_lvl = BATT.read_level()
@@ -397,67 +521,154 @@ def draw_scrollbar():
     DISPLAY.hline(scrollbar_x, _SCROLLBAR_SHADOW_Y, scrollbar_width, CONFIG.palette[0])
     
 def draw_app_selector():
-    global ICON_UPDATED, IS_SCROLLING
-    
-    _BLIT_NAME_WIDTH = const(_DISPLAY_WIDTH-1) # TODO: trim this down
-    _BLIT_NAME_Y_END = const(_APPNAME_Y+_FONT_HEIGHT-1)
+    global ICON_UPDATED, SCROLL_X, SCROLL_OFFSET
     
     _ICON_FBUF_WIDTH_HALF = const(_ICON_FBUF_WIDTH // 2)
     _BLIT_ICON_X_START = const((_DISPLAY_WIDTH // 2) - _ICON_FBUF_WIDTH_HALF)
-    _BLIT_ICON_SECOND_X = const(_BLIT_ICON_X_START-_DISPLAY_WIDTH)
-    _BLIT_ICON_X_END = const(_BLIT_ICON_X_START + _ICON_FBUF_WIDTH)
-    _BLIT_ICON_Y_END = const(_ICON_Y + _ICON_HEIGHT)
     
     if not IS_SCROLLING:
-        time.sleep_ms(5)
         return
     
-    _TOTAL_SELECTOR_HEIGHT = const((_APPNAME_Y + _FONT_HEIGHT) - _ICON_Y)
-    
     x = animate_scroll()
     
-    draw_name_fbuf(x)
+    if x or SCROLL_X:
+        # the panel scrolls the old app out of view by itself, so only the new app's exposed strip needs drawing
+        if not ICON_UPDATED:
+            draw_icon_fbuf()
+            ICON_UPDATED = True
+        
+        if SCROLL_DIRECTION > 0:
+            step = (SCROLL_X - x) % _DISPLAY_WIDTH
+        else:
+            step = -((x - SCROLL_X) % _DISPLAY_WIDTH)
+        SCROLL_X = x
+        
+        if step:
+            SCROLL_OFFSET = (SCROLL_OFFSET + step) % _DISPLAY_WIDTH
+            strip_x, _, strip_width, _ = DISPLAY.hw_scroll(step)
+            # where the new app's page is drawn, relative to the display
+            page_x = 0
+            if x:
+                page_x = x + _DISPLAY_WIDTH if SCROLL_DIRECTION > 0 else x - _DISPLAY_WIDTH
+            draw_selector_strip(strip_x, strip_width, strip_x - page_x)
+            draw_fixed_areas()
+        
+        if x:
+            return
+        
+        if SCROLL_OFFSET:
+            # a scroll was interrupted by another one, so the display was left partially scrolled
+            DISPLAY.reset_hw_scroll()
+            SCROLL_OFFSET = 0
+            draw_background()
     
-    if x == 0:
-        DISPLAY.blit_buffer(ICON_FBUF, _BLIT_ICON_X_START, _ICON_Y, _ICON_FBUF_WIDTH, _ICON_HEIGHT)
+    draw_name_fbuf()
+    DISPLAY.blit_buffer(ICON_FBUF, _BLIT_ICON_X_START, _ICON_Y, _ICON_FBUF_WIDTH, _ICON_HEIGHT)
+    DISPLAY.blit_buffer(NAME_FBUF, 0, _APPNAME_Y, _DISPLAY_WIDTH, _FONT_HEIGHT)
 
-    else:
-        icon_center = _DISPLAY_WIDTH_HALF+x
-        
-        # if icon has scrolled out of view:
-        if not 0 < icon_center < _DISPLAY_WIDTH:
-            
-            # switch to new icon and wrap icon around the other end
-            if not ICON_UPDATED:
-                draw_icon_fbuf()
-                ICON_UPDATED = True
-            
-            icon_center %= _DISPLAY_WIDTH
-            
-        icon_start = icon_center - _ICON_FBUF_WIDTH_HALF
-        icon_end = icon_start + _ICON_FBUF_WIDTH
+def draw_selector_strip(x, width, page_x):
+    """
+    Draw a full-height strip of the app selector at display column x,
+    showing the columns of the current app that start at page_x.
+    """
+    _SELECTOR_HEIGHT = const((_APPNAME_Y + _FONT_HEIGHT) - _ICON_Y)
+    _SELECTOR_NAME_Y = const(_APPNAME_Y - _ICON_Y)
+    # the widest strip NAME_BUF can hold
+    _MAX_STRIP_WIDTH = const((_FONT_HEIGHT * _DISPLAY_WIDTH) // _SELECTOR_HEIGHT)
+    _STRIP_TOP_Y = const(_STATUSBAR_HEIGHT + 1)
+    _STRIP_BOTTOM_Y = const(_APPNAME_Y + _FONT_HEIGHT)
+    
+    _ICON_FBUF_WIDTH_HALF = const(_ICON_FBUF_WIDTH // 2)
+    _BLIT_ICON_X_START = const((_DISPLAY_WIDTH // 2) - _ICON_FBUF_WIDTH_HALF)
+    
+    current_app_text = get_app_name_text(APP_SELECTOR_INDEX)
+    text_x = center_text_x(current_app_text)
+    
+    DISPLAY.hline(x, _STATUSBAR_HEIGHT, width, CONFIG.palette[0])
+    DISPLAY.fill_rect(x, _STRIP_TOP_Y, width, _ICON_Y - _STRIP_TOP_Y, CONFIG['bg_color'])
+    DISPLAY.fill_rect(x, _STRIP_BOTTOM_Y, width, _SCROLLBAR_Y - _STRIP_BOTTOM_Y, CONFIG['bg_color'])
+    
+    while width > 0:
+        strip_width = min(width, _MAX_STRIP_WIDTH)
+        strip = framebuf.FrameBuffer(NAME_BUF, strip_width, _SELECTOR_HEIGHT, framebuf.RGB565)
         
-        # erase to left of icon
-        if icon_start > 0:
-            DISPLAY.fill_rect(0, _ICON_Y, icon_start, _ICON_HEIGHT, CONFIG.palette[1])
-        # erase to right of icon
-        if icon_end < _DISPLAY_WIDTH:
-            DISPLAY.fill_rect(icon_end, _ICON_Y, _DISPLAY_WIDTH - icon_end, _ICON_HEIGHT+1, CONFIG.palette[1])
+        DISPLAY.fill(CONFIG['bg_color'], fbuf=strip)
+        strip.blit(ICON_FBUF, _BLIT_ICON_X_START - page_x, 0)
+        DISPLAY.fbuf_bitmap_text(
+            font, strip, current_app_text,
+            text_x - page_x, _SELECTOR_NAME_Y,
+            CONFIG['ui_color'])
         
         DISPLAY.blit_buffer(
-            ICON_FBUF,
-            icon_start,
-            _ICON_Y,
-            _ICON_FBUF_WIDTH, _ICON_HEIGHT)
+            memoryview(NAME_BUF)[:strip_width * _SELECTOR_HEIGHT * 2],
+            x, _ICON_Y,
+            strip_width, _SELECTOR_HEIGHT)
         
-    # finally, draw app name(s)
-    DISPLAY.blit_buffer(NAME_FBUF, 0, _APPNAME_Y, _DISPLAY_WIDTH, _FONT_HEIGHT)
+        x += strip_width
+        page_x += strip_width
+        width -= strip_width
+
+def draw_fixed_areas():
+    """Redraw the statusbar and scrollbar, which hardware scrolling moves along with everything else."""
+    DISPLAY.fill_rect(0, 0, _DISPLAY_WIDTH, _STATUSBAR_HEIGHT, CONFIG.palette[2])
+    draw_statusbar()
+    draw_scrollbar()
+
+def draw_background():
+    DISPLAY.fill(CONFIG['bg_color'])
+    DISPLAY.fill_rect(0, 0, _DISPLAY_WIDTH, _STATUSBAR_HEIGHT, CONFIG.palette[2])
+    DISPLAY.hline(0, _STATUSBAR_HEIGHT, _DISPLAY_WIDTH, CONFIG.palette[0])
+    draw_scrollbar()
+    draw_statusbar()
+
+
 
+def wake_from_idle():
+    """Go back to full speed, after input (or anything else that needs a smooth UI)."""
+    global IS_IDLE, LAST_ACTIVE_MS
+    LAST_ACTIVE_MS = time.ticks_ms()
+    if IS_IDLE:
+        IS_IDLE = False
+        machine.freq(_ACTIVE_FREQ)
+
+
+def idle_wait():
+    """
+    Wait for the next main loop iteration when there is nothing to animate.
+    
+    Shortly after input stops, this drops the CPU frequency, 
+    and (if 'idle_sleep' is enabled) lightsleeps between keyboard scans.
+    The GO button wakes us immediately. The keyboard matrix can only be read one row at a time,
+    so other keys are picked up by the next scan, within _IDLE_POLL_MS.
+    """
+    global IS_IDLE
+    
+    if (SYNCING_CLOCK # wifi needs us awake
+    or KB.key_state # keys are held, and may repeat
+    or BEEP.playing
+    or time.ticks_diff(time.ticks_ms(), LAST_ACTIVE_MS) < _IDLE_DELAY_MS):
+        time.sleep_ms(5)
+        return
+    
+    if not IS_IDLE:
+        IS_IDLE = True
+        machine.freq(_IDLE_FREQ)
+    
+    # don't sleep through the next statusbar update
+    sleep_ms = min(_IDLE_POLL_MS, time.ticks_diff(NEXT_STATUSBAR_MS, time.ticks_ms()))
+    if sleep_ms <= 0:
+        return
+    if CONFIG['idle_sleep']:
+        machine.lightsleep(sleep_ms)
+    else:
+        time.sleep_ms(sleep_ms)
 
 
 def start_scroll(direct=1):
-    global SCROLL_DIRECTION, SCROLL_START_MS, IS_SCROLLING, ICON_UPDATED
+    global SCROLL_DIRECTION, SCROLL_START_MS, IS_SCROLLING, ICON_UPDATED, SCROLL_X
     SCROLL_DIRECTION = direct
+    # if a scroll is already running, the new one continues from what's on the display
+    SCROLL_X = 0
     SCROLL_START_MS = time.ticks_ms()
     IS_SCROLLING = True
     ICON_UPDATED = False
@@ -480,23 +691,20 @@ def animate_scroll() -> int:
         )
     
 def unpack_shape(string):
-    # this weird little function takes the memory-efficient 'packed' shape definition, and unpacks it to a valid arg tuple for DISPLAY.polygon
-    unpacked = (
-        "shape=("
-        + string.replace(
-        'u', ")),CONFIG['ui_color']"
-        ).replace(
-        'b', ")),CONFIG['bg_color']"
-        ).replace(
-        'a', "(8,0,array.array('h', ("
-        ).replace(
-        't', ',True)'
-        ).replace(
-        'f', ',False)'
-        )
-        + ")"
-        )
-    exec(unpacked)
+    """
+    Parse a 'packed' shape definition into a list of arg tuples for DISPLAY.polygon.
+    
+    Each polygon starts with 'a', followed by comma-separated points,
+    then its color ('u' for ui_color, 'b' for bg_color), and whether it's filled ('t' or 'f').
+    """
+    shape = []
+    for poly in string.split('a'):
+        poly = poly.strip().rstrip(',')
+        if not poly:
+            continue
+        color = CONFIG['ui_color'] if poly[-2] == 'u' else CONFIG['bg_color']
+        points = array.array('h', [int(num) for num in poly[:-2].split(',')])
+        shape.append((_ICON_X, 0, points, color, poly[-1] == 't'))
     return shape
 
 def draw_icon(icon_def):
@@ -504,15 +712,58 @@ def draw_icon(icon_def):
     for poly in shape:
         DISPLAY.polygon(*poly, fbuf=ICON_FBUF)
 
+def prepare_icon_cache(clear=False):
+    """Create the icon cache, removing icons that were cached for other theme colors (or all icons if clear=True)."""
+    global ICON_CACHE_PREFIX
+    theme = f"{CONFIG['ui_color']:04x}{CONFIG['bg_color']:04x}"
+    ICON_CACHE_PREFIX = f"{_ICON_CACHE_DIR}/{theme}"
+    try:
+        for name in os.listdir(_ICON_CACHE_DIR):
+            if clear or not name.startswith(theme):
+                os.remove(f"{_ICON_CACHE_DIR}/{name}")
+    except OSError:
+        try:
+            os.mkdir(_ICON_CACHE_DIR)
+        except OSError as e:
+            print(f"Couldn't create icon cache: {e}")
+
+def icon_cache_path(cache_key):
+    return ICON_CACHE_PREFIX + cache_key.replace('/', '_')
+
+def load_cached_icon(cache_key):
+    """Blit a cached icon into ICON_FBUF. Returns False if the icon isn't cached."""
+    try:
+        with open(icon_cache_path(cache_key), 'rb') as icon_file:
+            if icon_file.readinto(ICON_CACHE_BUF) != len(ICON_CACHE_BUF):
+                return False
+    except OSError:
+        return False
+    ICON_FBUF.blit(ICON_CACHE_FBUF, _ICON_X, 0)
+    return True
+
+def save_cached_icon(cache_key):
+    """Store the icon currently drawn in ICON_FBUF in the icon cache."""
+    ICON_CACHE_FBUF.blit(ICON_FBUF, -_ICON_X, 0)
+    try:
+        with open(icon_cache_path(cache_key), 'wb') as icon_file:
+            icon_file.write(ICON_CACHE_BUF)
+    except OSError as e:
+        print(f"Couldn't cache icon: {e}")
+
+def draw_cached_icon(icon_def, cache_key):
+    # draw from the icon cache, rasterizing the icon definition if it's not cached yet
+    if not load_cached_icon(cache_key):
+        draw_icon(icon_def)
+        save_cached_icon(cache_key)
+
 def draw_default_icon(current_app_path):
     if current_app_path.startswith("/sd"):
-        draw_icon(_SD_ICON)
+        draw_cached_icon(_SD_ICON, "sd")
     else:
-        draw_icon(_FLASH_ICON)
+        draw_cached_icon(_FLASH_ICON, "flash")
 
 def draw_icon_fbuf():
     
-    _ICON_CENTERED_X = const((_ICON_FBUF_WIDTH - _ICON_WIDTH) // 2)
     _ICON_ONECHAR_X = const((_ICON_FBUF_WIDTH//2) - (_FONT_WIDTH // 2))
     
     current_app_text = APP_NAMES[APP_SELECTOR_INDEX]
@@ -525,7 +776,7 @@ def draw_icon_fbuf():
         if CONFIG['ui_sound']:
             DISPLAY.fbuf_bitmap_text(
                 font, ICON_FBUF, "On",
-                _ICON_CENTERED_X, 0,
+                _ICON_X, 0,
                 CONFIG.palette[5])
         else:
             DISPLAY.fbuf_bitmap_text(
@@ -534,25 +785,29 @@ def draw_icon_fbuf():
                 CONFIG.palette[3])
             
     elif current_app_text == "Files":
-        draw_icon(_FILES_ICON)
+        draw_cached_icon(_FILES_ICON, "Files")
             
     elif current_app_text == "Reload Apps":
-        draw_icon(_REFRESH_ICON)
+        draw_cached_icon(_REFRESH_ICON, "Reload Apps")
         
     elif current_app_text == "Settings":
-        draw_icon(_SETTINGS_ICON)
+        draw_cached_icon(_SETTINGS_ICON, "Settings")
         
     else:
         # check if custom icon exists!
         current_app_path = APP_PATHS[current_app_text]
         try:
-            if ((not (current_app_path.endswith('.py')
-                or current_app_path.endswith('.mpy')) )
-                and '__icon__.txt' in os.listdir(current_app_path)):
+            if current_app_text in APP_ICONS:
                 
                 # try drawing custom icon
-                with open(current_app_path + '/__icon__.txt', 'r') as icon_file:
-                    draw_icon(icon_file.read())
+                icon_path = current_app_path + '/__icon__.txt'
+                # key the cached raster by the icon file's size and mtime, so that edited icons are redrawn
+                icon_stat = os.stat(icon_path)
+                cache_key = f"{current_app_path}@{icon_stat[6]}-{icon_stat[8]}"
+                if not load_cached_icon(cache_key):
+                    with open(icon_path, 'r') as icon_file:
+                        draw_icon(icon_file.read())
+                    save_cached_icon(cache_key)
                     
             else:
                 draw_default_icon(APP_PATHS[current_app_text])
@@ -564,36 +819,24 @@ def draw_icon_fbuf():
                 0, 0,
                 CONFIG.rgb_colors[0])
     
-def draw_name_fbuf(x=0):
-    current_app_text = APP_NAMES[APP_SELECTOR_INDEX]
-    
-    #crop text for display
-    if len(current_app_text) > 15:
-        current_app_text = current_app_text[:12] + "..."
+def get_app_name_text(index):
+    """Get an app's name, cropped to fit the display."""
+    app_text = APP_NAMES[index]
+    if len(app_text) > 15:
+        app_text = app_text[:12] + "..."
+    return app_text
+
+def draw_name_fbuf():
+    current_app_text = get_app_name_text(APP_SELECTOR_INDEX)
     
     #blackout the old text
     DISPLAY.fill(CONFIG['bg_color'], fbuf=NAME_FBUF)
 
     #draw new text
-    if x:
-        prev_app_text = APP_NAMES[PREV_SELECTOR_INDEX]
-        
-        DISPLAY.fbuf_bitmap_text(
-            font, NAME_FBUF, prev_app_text,
-            center_text_x(prev_app_text)+x, 0,
-            CONFIG['ui_color'])
-        
-        DISPLAY.fbuf_bitmap_text(
-            font, NAME_FBUF, current_app_text,
-            _DISPLAY_WIDTH+center_text_x(current_app_text)+x if SCROLL_DIRECTION > 0 else -_DISPLAY_WIDTH+center_text_x(current_app_text)+x,
-            #center_text_x(current_app_text)+x,
-            0,
-            CONFIG['ui_color'])
-    else:
-        DISPLAY.fbuf_bitmap_text(
-            font, NAME_FBUF, current_app_text,
-            center_text_x(current_app_text)+x, 0,
-            CONFIG['ui_color'])
+    DISPLAY.fbuf_bitmap_text(
+        font, NAME_FBUF, current_app_text,
+        center_text_x(current_app_text), 0,
+        CONFIG['ui_color'])
 
 def try_sync_clock():
     global SYNCING_CLOCK, RTC, SYNC_NTP_ATTEMPTS, CONNECT_WIFI_ATTEMPTS
@@ -677,10 +920,11 @@ def try_sync_clock():
 #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 #--------------------------------------------------------------------------------------------------
 def main_loop():
-    global APP_SELECTOR_INDEX, PREV_SELECTOR_INDEX, SYNCING_CLOCK, IS_SCROLLING, ICON_UPDATED
+    global APP_SELECTOR_INDEX, SYNCING_CLOCK, IS_SCROLLING, ICON_UPDATED, LAST_ACTIVE_MS
     
     # scan apps asap to populate app names/paths and SD
     scan_apps()
+    prepare_icon_cache()
         
     # sync our RTC on boot, if set in settings
     SYNCING_CLOCK = CONFIG['sync_clock']
@@ -702,6 +946,10 @@ def main_loop():
     new_keys = []
 #     repeater = KeyRepeater()
     
+    # the GO button can wake us from lightsleep while idle
+    esp32.wake_on_ext0(pin=KB.go, level=esp32.WAKEUP_ALL_LOW)
+    wake_from_idle()
+    
     #starupp sound
     play_sound(
             ('C3',
@@ -710,12 +958,7 @@ def main_loop():
             ))
         
     #init diplsay
-    DISPLAY.fill(CONFIG['bg_color'])
-    DISPLAY.fill_rect(0,0,_DISPLAY_WIDTH, _STATUSBAR_HEIGHT, CONFIG.palette[2])
-    DISPLAY.hline(0,_STATUSBAR_HEIGHT,_DISPLAY_WIDTH,CONFIG.palette[0])
-    
-    draw_scrollbar()
-    draw_statusbar()
+    draw_background()
     draw_icon_fbuf()
     
     while True:
@@ -725,11 +968,13 @@ def main_loop():
         new_keys = KB.get_new_keys()
         #new_keys = repeater.update_keys(new_keys)
         
+        if new_keys or KB.key_state:
+            wake_from_idle()
+        
         if new_keys:
             
             # ~~~~~~ check if the arrow keys are newly pressed ~~~~~
             if "/" in new_keys: # right arrow
-                PREV_SELECTOR_INDEX = APP_SELECTOR_INDEX
                 APP_SELECTOR_INDEX = (APP_SELECTOR_INDEX + 1) % len(APP_NAMES)
                 draw_scrollbar()
                 
@@ -740,7 +985,6 @@ def main_loop():
 
                 
             elif "," in new_keys: # left arrow
-                PREV_SELECTOR_INDEX = APP_SELECTOR_INDEX
                 APP_SELECTOR_INDEX = (APP_SELECTOR_INDEX - 1) % len(APP_NAMES)
                 draw_scrollbar()
                 
@@ -770,7 +1014,8 @@ def main_loop():
                         IS_SCROLLING = True
                 
                 elif APP_NAMES[APP_SELECTOR_INDEX] == "Reload Apps":
-                    scan_apps()
+                    scan_apps(full_rescan=True)
+                    prepare_icon_cache(clear=True)
                     APP_SELECTOR_INDEX = 0
                     start_scroll(-1)
                     draw_scrollbar()
@@ -782,13 +1027,15 @@ def main_loop():
                     #save CONFIG if it has been changed:
                     CONFIG.save()
                         
-                    # shut off the display
-                    DISPLAY.fill(0)
-                    DISPLAY.sleep_mode(True)
-                    machine.Pin(38, machine.Pin.OUT).value(0) #backlight off
+                    # leave the display on, so the app can take it over without re-initializing it (see lib.displaysession)
                     DISPLAY.spi.deinit()
                     
                     if SD != None:
+                        # main.py mounts the card again if the app needs it
+                        try:
+                            os.umount('/sd')
+                        except OSError:
+                            pass
                         try:
                             SD.deinit()
                         except:
@@ -797,6 +1044,8 @@ def main_loop():
                     play_sound(('C4','B4','C5','C5'),100)
                         
                     launch_app(APP_PATHS[APP_NAMES[APP_SELECTOR_INDEX]])
+                    # only reached when launching in-process; main.py takes it from here
+                    return
 
             else: # keyboard shortcuts!
                 for key in new_keys:
@@ -814,7 +1063,6 @@ def main_loop():
                                     elif APP_SELECTOR_INDEX < idx:
                                         start_scroll(1)
                                     # go there!
-                                    PREV_SELECTOR_INDEX = APP_SELECTOR_INDEX
                                     APP_SELECTOR_INDEX = idx
                                     play_sound(("G3"), 100)
                                     draw_scrollbar()
@@ -825,10 +1073,14 @@ def main_loop():
         #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ Main Graphics: ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         
-        if time.localtime()[4] != LASTDRAWN_MINUTE:
+        if time.ticks_diff(time.ticks_ms(), NEXT_STATUSBAR_MS) >= 0:
             draw_statusbar()
         
-        draw_app_selector()
+        if IS_SCROLLING:
+            draw_app_selector()
+            LAST_ACTIVE_MS = time.ticks_ms()
+        else:
+            idle_wait()
             
         #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
         #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ WIFI and RTC: ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
@@ -92,6 +92,8 @@ menu_def = [
     (HydraMenu.WriteItem, 'wifi_pass', {'hide':True}),
     (HydraMenu.BoolItem, 'sync_clock', {}),
     (HydraMenu.IntItem, 'timezone', {'min_int':-13,'max_int':13}),
+    (HydraMenu.BoolItem, 'fast_launch', {}),
+    (HydraMenu.BoolItem, 'idle_sleep', {}),
     ]
 
 # build menu from def
@@ -108,6 +110,9 @@ menu.append(HydraMenu.DoItem(menu, "Confirm", callback=save_conf))
 
 repeater = KeyRepeater()
 
+# draw the next animation frame while the last one is being sent
+display.enable_double_buffer()
+
 updating_display = True
 
 while True:
@@ -123,7 +128,7 @@ while True:
         
     if updating_display:
         updating_display = menu.draw()
-        display.show()
+        display.show_async()
     
     
     if not keys and not updating_display:
@@ -28,6 +28,12 @@ It has been modified for optimal use with MicroHydra launcher, and has been trim
 
 import math, time, framebuf, struct
 
+# optional, lets drivers skip initializing a panel that the last app already set up
+try:
+    from lib import displaysession
+except ImportError:
+    displaysession = None
+
 # ST7789 commands
 # _ST7789_SWRESET = b"\x01"
 _ST7789_SLPIN = b"\x10"
@@ -43,13 +49,13 @@ _ST7789_RAMWR = b"\x2c"
 _ST7789_VSCRDEF = b"\x33"
 # _ST7789_COLMOD = b"\x3a"
 _ST7789_MADCTL = b"\x36"
-# _ST7789_VSCSAD = b"\x37"
+_ST7789_VSCSAD = b"\x37"
 # _ST7789_RAMCTL = b"\xb0"
 # _ST7789_PTLON = 0x12
 # MADCTL bits
 # _ST7789_MADCTL_MY = const(0x80)
 # _ST7789_MADCTL_MX = const(0x40)
-# _ST7789_MADCTL_MV = const(0x20)
+_ST7789_MADCTL_MV = const(0x20)
 # _ST7789_MADCTL_ML = const(0x10)
 _ST7789_MADCTL_BGR = const(0x08)
 # _ST7789_MADCTL_MH = const(0x04)
@@ -75,6 +81,9 @@ _ENCODE_POS_16 = const("<HH")
 # must be at least 256 for 16 bit wide fonts
 _BUFFER_SIZE = const(256)
 
+# number of lines in the ST7789's frame memory, along its hardware scrolling axis
+_ST7789_SCROLL_LINES = const(320)
+
 _BIT7 = const(0x80)
 _BIT6 = const(0x40)
 _BIT5 = const(0x20)
@@ -207,15 +216,21 @@ class ST7789:
         self.cs = cs
         self.backlight = backlight
         self._rotation = rotation % 4
+        self._hw_scroll = 0
         self.color_order = color_order
         self.init_cmds = custom_init or _ST7789_INIT_CMDS
-        self.hard_reset()
-        # yes, twice, once is not always enough
-        self.init(self.init_cmds)
-        self.init(self.init_cmds)
-        self.rotation(self._rotation)
+        resuming = displaysession is not None and displaysession.take_over(self, custom_init)
+        if not resuming:
+            self.hard_reset()
+            # yes, twice, once is not always enough
+            self.init(self.init_cmds)
+            self.init(self.init_cmds)
+            self.rotation(self._rotation)
+            if displaysession is not None:
+                displaysession.save(self, custom_init)
         self.needs_swap = False
-        self.fill(0x0)
+        if not resuming:
+            self.fill(0x0)
 
         if backlight is not None:
             backlight.value(1)
@@ -252,6 +267,8 @@ class ST7789:
         """
         Hard reset display.
         """
+        if displaysession is not None:
+            displaysession.end()
         if self.cs:
             self.cs.off()
         if self.reset:
@@ -282,6 +299,9 @@ class ST7789:
             mode
         """
         if value:
+            if displaysession is not None:
+                # the next driver will need to wake the panel up again
+                displaysession.end()
             self._write(_ST7789_SLPIN)
         else:
             self._write(_ST7789_SLPOUT)
@@ -312,6 +332,8 @@ class ST7789:
 
             custom_rotations can have any number of rotations
         """
+        if self._hw_scroll:
+            self.reset_hw_scroll()
         rotation %= len(self.rotations)
         self._rotation = rotation
         (
@@ -329,6 +351,10 @@ class ST7789:
             madctl &= ~_ST7789_MADCTL_BGR
 
         self._write(_ST7789_MADCTL, bytes([madctl]))
+        # the panel always scrolls along its own rows, which are the x axis when rows and columns are exchanged
+        self._scroll_landscape = bool(madctl & _ST7789_MADCTL_MV)
+        # vscrdef can change self.width, so remember the visible length of the scrolling axis
+        self._scroll_span = self.width if self._scroll_landscape else self.height
 
     def _set_window(self, x0, y0, x1, y1):
         """
@@ -341,6 +367,16 @@ class ST7789:
             y1 (int): row end address
         """
         #if x0 <= x1 <= self.width and y0 <= y1 <= self.height:
+        if self._hw_scroll:
+            # content has been moved by hw_scroll, find where the window is in frame memory
+            if self._scroll_landscape:
+                x1 -= x0
+                x0 = (x0 + self._hw_scroll) % self._scroll_span
+                x1 += x0
+            else:
+                y1 -= y0
+                y0 = (y0 + self._hw_scroll) % self._scroll_span
+                y1 += y0
         self._write(
             _ST7789_CASET,
             struct.pack(_ENCODE_POS, x0 + self.xstart, x1 + self.xstart),
@@ -424,8 +460,47 @@ class ST7789:
         if x_end > self.max_x or x_end < self.min_x:
             return
         
+        if self._hw_scroll:
+            # only the visible area is scrolled, so clip to it
+            # and send areas that wrap around the scrolled frame memory in two parts
+            buffer = memoryview(buffer)
+            span = self._scroll_span
+            if self._scroll_landscape:
+                cols = min(x_end + 1, span) - x
+                split = self._scroll_split(x, y, x + cols - 1, y)
+                left = split - x if split else cols
+                self._blit_columns(buffer, width, 0, left, x, y, height)
+                if split:
+                    self._blit_columns(buffer, width, left, cols - left, split, y, height)
+            else:
+                rows = min(y + height, span) - y
+                split = self._scroll_split(x, y, x, y + rows - 1)
+                top = split - y if split else rows
+                self._set_window(x, y, x_end, y + top - 1)
+                self._write(None, buffer[:top * width * 2])
+                if split:
+                    self._set_window(x, split, x_end, y + rows - 1)
+                    self._write(None, buffer[top * width * 2:rows * width * 2])
+            return
+        
         self._set_window(x, y, x_end, y_end)
         self._write(None, buffer)
+    
+    def _blit_columns(self, buffer, buffer_width, col, cols, x, y, height):
+        """
+        Send some columns of an RGB565 buffer to the display, one row at a time.
+        """
+        self._set_window(x, y, x + cols - 1, y + height - 1)
+        self.dc.on()
+        if self.cs:
+            self.cs.off()
+        stride = buffer_width * 2
+        start = col * 2
+        for _ in range(height):
+            self.spi.write(buffer[start:start + cols * 2])
+            start += stride
+        if self.cs:
+            self.cs.on()
 
 #     def rect(self, x, y, w, h, color):
 #         """
@@ -454,6 +529,25 @@ class ST7789:
             height (int): Height in pixels
             color (int): 565 encoded color
         """
+        if self._hw_scroll:
+            # only the visible area is scrolled, so clip to it
+            if self._scroll_landscape:
+                width = min(x + width, self._scroll_span) - x
+            else:
+                height = min(y + height, self._scroll_span) - y
+            if width <= 0 or height <= 0:
+                return
+        split = self._scroll_split(x, y, x + width - 1, y + height - 1)
+        if split:
+            # the area wraps around the scrolled frame memory, fill it in two parts
+            if self._scroll_landscape:
+                self.fill_rect(x, y, split - x, height, color)
+                self.fill_rect(split, y, x + width - split, height, color)
+            else:
+                self.fill_rect(x, y, width, split - y, color)
+                self.fill_rect(x, split, width, y + height - split, color)
+            return
+        
         self._set_window(x, y, x + width - 1, y + height - 1)
         chunks, rest = divmod(width * height, _BUFFER_SIZE)
         pixel = struct.pack(
@@ -531,24 +625,80 @@ class ST7789:
         self.max_x = vsa + bfa
         self._write(_ST7789_VSCRDEF, struct.pack(">HHH", tfa, vsa, bfa))
 
-#     def vscsad(self, vssa):
-#         """
-#         Set Vertical Scroll Start Address of RAM.
-# 
-#         Defines which line in the Frame Memory will be written as the first
-#         line after the last line of the Top Fixed Area on the display
-# 
-#         Example:
-# 
-#             for line in range(40, 280, 1):
-#                 tft.vscsad(line)
-#                 utime.sleep(0.01)
-# 
-#         Args:
-#             vssa (int): Vertical Scrolling Start Address
-# 
-#         """
-#         self._write(_ST7789_VSCSAD, struct.pack(">H", vssa))
+    def vscsad(self, vssa):
+        """
+        Set Vertical Scroll Start Address of RAM.
+
+        Defines which line in the Frame Memory will be written as the first
+        line after the last line of the Top Fixed Area on the display
+
+        Example:
+
+            for line in range(40, 280, 1):
+                tft.vscsad(line)
+                utime.sleep(0.01)
+
+        Args:
+            vssa (int): Vertical Scrolling Start Address
+
+        """
+        self._write(_ST7789_VSCSAD, struct.pack(">H", vssa))
+
+    def _scroll_split(self, x0, y0, x1, y1):
+        """
+        If the given area wraps around the end of the scrolled frame memory,
+        return the coordinate (along the scrolling axis) where it wraps. Otherwise return 0.
+        """
+        if self._hw_scroll:
+            split = self._scroll_span - self._hw_scroll
+            if self._scroll_landscape:
+                if x0 < split <= x1:
+                    return split
+            elif y0 < split <= y1:
+                return split
+        return 0
+
+    def hw_scroll(self, step):
+        """
+        Scroll the whole display using the panel's hardware scrolling (VSCRDEF/VSCSAD).
+        
+        The panel scrolls along its own rows, which is the x axis in landscape rotations,
+        and the y axis in portrait rotations. Positive steps move the content toward 0.
+        
+        Drawing coordinates stay the same after scrolling, so only the newly exposed strip needs to be drawn.
+
+        Args:
+            step (int): pixels to scroll by
+
+        Returns:
+            tuple: (x, y, width, height) of the newly exposed strip
+        """
+        span = self._scroll_span
+        start = self.xstart if self._scroll_landscape else self.ystart
+        
+        if step >= span or step <= -span:
+            step %= span
+            exposed = (0, span)
+        elif step > 0:
+            exposed = (span - step, step)
+        else:
+            exposed = (0, -step)
+        
+        self._hw_scroll = (self._hw_scroll + step) % span
+        # (not using self.vscrdef, because it changes the drawable area)
+        self._write(_ST7789_VSCRDEF, struct.pack(">HHH", start, span, _ST7789_SCROLL_LINES - start - span))
+        self.vscsad(start + self._hw_scroll)
+        
+        if self._scroll_landscape:
+            return (exposed[0], 0, exposed[1], self.height)
+        return (0, exposed[0], self.width, exposed[1])
+    
+    def reset_hw_scroll(self):
+        """
+        Undo any hardware scrolling. The display content will need to be redrawn.
+        """
+        self._hw_scroll = 0
+        self.vscsad(self.xstart if self._scroll_landscape else self.ystart)
 
     @micropython.viper
     @staticmethod
@@ -741,6 +891,9 @@ class ST7789:
 
         if fbuf:
             self.fbuf_blit(buffer, fbuf, x, y, width, height, key=0)
+        elif self._hw_scroll:
+            # the icon might wrap around the scrolled frame memory
+            self.blit_buffer(buffer, x, y, width, height)
         else:
             self._set_window(x, y, to_col, to_row)
             self._write(None, buffer)
@@ -85,7 +85,7 @@ class Menu:
         if beep:
             BEEP = beep
         else:
-            BEEP = beeper.Beeper()
+            BEEP = beeper.Beeper(nonblocking=True)
         
         if display_fbuf: # st7789fbuf 
             DISPLAY = display_fbuf
@@ -0,0 +1,32 @@
+"""
+lib.apploader
+
+Lets an app (normally the launcher) ask main.py to launch another app without resetting the device.
+
+main.py imports apps by their file path (for example, '.frozen/launcher/launcher.py'),
+so once an app's code finishes running, the import itself fails ('py' is not a module).
+That means main.py can't get anything back from the app module; instead, it checks this module,
+which it imports before any app, and keeps loaded while apps are unloaded.
+
+Usage (from an app):
+    launch_in_process(app_path)
+    # then clean up the hardware, and return from the app's main loop
+"""
+
+# the app main.py should import next, or None
+next_app_path = None
+
+
+
+def launch_in_process(app_path):
+    """Ask main.py to import app_path once the current app returns."""
+    global next_app_path
+    next_app_path = app_path
+
+
+def take_next_app():
+    """Get the app path requested by launch_in_process (or None), and clear the request."""
+    global next_app_path
+    app_path = next_app_path
+    next_app_path = None
+    return app_path
@@ -1,5 +1,5 @@
 from machine import I2S, Pin
-import math
+import math, time, array
 
 _SCK_PIN = const(41)
 _WS_PIN = const(43)
@@ -12,6 +12,13 @@ _SAMPLE_RATE_IN_HZ = const(22050)
 
 _SAMPLE_RATE_PER_MS = const(_SAMPLE_RATE_IN_HZ//1000)
 
+# the most sounds that can be waiting to play in nonblocking mode. Older sounds are dropped past this.
+_MAX_QUEUE_LENGTH = const(4)
+# the most notes that can be played together
+_MAX_VOICES = const(8)
+# how many bytes of rendered sounds can be cached
+_SOUND_CACHE_SIZE = const(16000)
+
 volume_map = const((1,4,10,16,20,28,36,50,60,80,127))
 
 tone_map = {
@@ -65,8 +72,22 @@ tone_map = {
 "B6": 1976,
 }
 
+# phase accumulator steps for each note. Phase is 16-bit fixed point (0x10000 is one full period),
+# and advances once per output byte.
+_NOTE_STEPS = {name:(freq << 16) // (_SAMPLE_RATE_IN_HZ * 2) for name, freq in tone_map.items()}
+
+
 class Beeper:
-    def __init__(self, buf_size=4000):
+    def __init__(self, buf_size=4000, nonblocking=False):
+        """
+        Play simple square wave tones over the I2S speaker.
+        
+        If nonblocking is True, notes are queued and played in the background using the I2S irq,
+        so that play() returns immediately.
+        
+        Rendered note sequences are cached (up to _SOUND_CACHE_SIZE bytes),
+        so that repeated UI sounds don't need to be synthesized again.
+        """
         
         self._output = I2S(            
             _I2S_ID,
@@ -79,268 +100,124 @@ class Beeper:
             rate=_SAMPLE_RATE_IN_HZ,
             ibuf=_BUFFER_LENGTH_IN_BYTES)
         
-        self._current_notes = []
-
+        # the longest a single note can be
         self.buf_size = buf_size
-        self._buf = bytearray(buf_size)
-        self._mv = memoryview(self._buf)
+        
+        # per-voice phase accumulator state for the mixer
+        self._steps = array.array('H', range(_MAX_VOICES))
+        self._phases = array.array('H', range(_MAX_VOICES))
+        
+        self._sound_cache = {}
+        self._sound_cache_used = 0
+        
+        self.nonblocking = nonblocking
+        if nonblocking:
+            self._queue = []
+            self._next_sound = None
+            # keeps the sound being played alive until I2S is done with it
+            self._playing_sound = None
+            self.playing = False
+            self._output.irq(self._process_buffer)
         
         
     def __del__(self):
+        self.deinit()
+    
+    def deinit(self):
+        """Stop the I2S output, freeing its buffers and pins."""
         self._output.deinit()
         
         
     @micropython.viper
-    def gen_square_wave(self, frequency:int, time_ms:int, high_sample:int, max_bytes:int) -> int:
+    def _mix(self, buf, num_bytes:int, voices:int, high_sample:int):
         """
-        Rough micropython viper method for generating a square wave. Wave it put in self._buf,
-        and returns the end index of the gennerated wave in _buf
+        Mix a square wave for each voice into buf, using the steps in self._steps.
+        Each voice gets an equal share of high_sample.
         """
-
-        
-        # 2 bytes per sample
-        samples_per_segment = _SAMPLE_RATE_IN_HZ // (frequency)
-        
-        #this is for helping to distinguish notes from eachother who would get garbled together thanks to int division
-        samples_per_segment_remainder = _SAMPLE_RATE_IN_HZ % (frequency)
-        samples_per_segment_low = samples_per_segment + (samples_per_segment_remainder // frequency)
-        
-        total_samples = _SAMPLE_RATE_PER_MS * time_ms
-        
-        #total_repetitions = total_samples // (samples_per_segment * 2) 
-        number_of_bytes = total_samples * 2
-        #this is needed in case our samples per segment overshoots our actual bytearray size
-        #byte_safe_ending = number_of_bytes - (samples_per_segment + samples_per_segment_low * 32)
-        if number_of_bytes > max_bytes:
-            number_of_bytes = max_bytes
-        
-        written_bytes = 0
-        high_sample_counter = 0
-        low_sample_counter = 0
-        while written_bytes < number_of_bytes: #write samples until total samples written
-            
-            #write high samples
-            while high_sample_counter < samples_per_segment:
-                self._buf[written_bytes] = high_sample 
-                written_bytes += 1
-                high_sample_counter += 1
-            
-            
-            
-            #write low samples
-            while low_sample_counter < samples_per_segment_low:
-                self._buf[written_bytes] = 0x00
-                written_bytes += 1
-                low_sample_counter += 1
-            
-            #reset samples counters
-            high_sample_counter = 0
-            low_sample_counter = 0
-        
-        return written_bytes
+        out = ptr8(buf)
+        steps = ptr16(self._steps)
+        phases = ptr16(self._phases)
+        level = high_sample // voices
+        
+        for v in range(voices):
+            phases[v] = 0
+        
+        for i in range(num_bytes):
+            sample = 0
+            for v in range(voices):
+                phase = (phases[v] + steps[v]) & 0xffff
+                phases[v] = phase
+                # first half of the period is high
+                if phase < 0x8000:
+                    sample += level
+            out[i] = sample
     
     
-    
-    @micropython.viper
-    def double_square_wave(self, frequency1:int, frequency2:int, time_ms:int, high_sample:int, max_bytes:int) -> int:
+    def _render(self, notes, time_ms, volume):
         """
-        This is the same as self.gen_square_wave, except it has been refactored to play two frequencies together.
+        Render a note sequence (in the same format as play) into a buffer, and return it.
+        Rendered sequences are cached, and returned from the cache when requested again.
         """
+        key = (notes, time_ms, volume)
+        try:
+            sound = self._sound_cache.get(key)
+        except TypeError: # unhashable (lists) can't be cached
+            key = None
+            sound = None
+        if sound:
+            return sound
         
-        # 2 bytes per sample
-        samples_per_segment1 = _SAMPLE_RATE_IN_HZ // (frequency1)
-        #this is for helping to distinguish notes from eachother who would get garbled together thanks to int division
-        samples_per_segment_remainder = _SAMPLE_RATE_IN_HZ % (frequency1)
-        samples_per_segment_low1 = samples_per_segment1 + (samples_per_segment_remainder // frequency1)
-        
-        
-        samples_per_segment2 = _SAMPLE_RATE_IN_HZ // (frequency2)
-        #this is for helping to distinguish notes from eachother who would get garbled together thanks to int division
-        samples_per_segment_remainder = _SAMPLE_RATE_IN_HZ % (frequency2)
-        samples_per_segment_low2 = samples_per_segment2 + (samples_per_segment_remainder // frequency2)
-        
-        total_samples = _SAMPLE_RATE_PER_MS * time_ms
-        number_of_bytes = total_samples * 2
-        
-        #this is needed in case our samples per segment overshoots our actual bytearray size
-        #byte_safe_ending = number_of_bytes - (samples_per_segment1 * 32)
-        if number_of_bytes > max_bytes:
-            number_of_bytes = max_bytes
-        
-        
-        written_bytes = 0
-        high_sample_counter = 0
-        low_sample_counter = 0
-        high_sample1 = True 
-        
-        high_sample_counter2 = 0
-        low_sample_counter2 = 0
-        high_sample2 = True
-        while written_bytes < number_of_bytes: #write samples until total samples written
-
-            this_sample = 0
-            #calc sample1
-            if high_sample1:
-                this_sample += high_sample // 2
-                high_sample_counter += 1
-                if high_sample_counter >= samples_per_segment1:
-                    high_sample1 = False
-                    high_sample_counter = 0
-            else: #low_sample1
-                low_sample_counter += 1
-                if low_sample_counter >= samples_per_segment_low1:
-                    low_sample_counter = 0
-                    high_sample1 = True
-               
-            #calc sample2
-            if high_sample2:
-                this_sample += high_sample // 2
-                high_sample_counter2 += 1
-                if high_sample_counter2 >= samples_per_segment2:
-                    high_sample2 = False
-                    high_sample_counter2 = 0
-            else: # low sample2
-                low_sample_counter2 += 1
-                if low_sample_counter2 >= samples_per_segment_low2:
-                    low_sample_counter2 = 0
-                    high_sample2 = True
-            
-            self._buf[written_bytes] = this_sample
-            written_bytes += 1
-
-            
-
-        
-        return written_bytes
-
-    @micropython.viper
-    def triple_square_wave(self, frequency1:int, frequency2:int, frequency3:int, time_ms:int, high_sample:int, max_bytes:int) -> int:
-        """
-        This is the same as self.gen_square_wave/self.double_square_wave,
-        except it has been refactored to play three frequencies together.
-        """
-        # 2 bytes per sample
-        samples_per_segment1 = _SAMPLE_RATE_IN_HZ // (frequency1)
-        #this is for helping to distinguish notes from eachother who would get garbled together thanks to int division
-        samples_per_segment_remainder = _SAMPLE_RATE_IN_HZ % (frequency1)
-        samples_per_segment_low1 = samples_per_segment1 + (samples_per_segment_remainder // frequency1)
-        
-        samples_per_segment2 = _SAMPLE_RATE_IN_HZ // (frequency2)
-        #this is for helping to distinguish notes from eachother who would get garbled together thanks to int division
-        samples_per_segment_remainder = _SAMPLE_RATE_IN_HZ % (frequency2)
-        samples_per_segment_low2 = samples_per_segment2 + (samples_per_segment_remainder // frequency2)
-        
-        samples_per_segment3 = _SAMPLE_RATE_IN_HZ // (frequency3)
-        #this is for helping to distinguish notes from eachother who would get garbled together thanks to int division
-        samples_per_segment_remainder = _SAMPLE_RATE_IN_HZ % (frequency3)
-        samples_per_segment_low3 = samples_per_segment3 + (samples_per_segment_remainder // frequency3)
-        
-        total_samples = _SAMPLE_RATE_PER_MS * time_ms
-        number_of_bytes = total_samples * 2
-        #this is needed in case our samples per segment overshoots our actual bytearray size
-        #byte_safe_ending = number_of_bytes - (samples_per_segment1 * 32)
-        if number_of_bytes > max_bytes:
-            number_of_bytes = max_bytes
-        
-        written_bytes = 0
-        high_sample_counter = 0
-        low_sample_counter = 0
-        high_sample1 = True 
-        
-        high_sample_counter2 = 0
-        low_sample_counter2 = 0
-        high_sample2 = True
-        
-        high_sample_counter3 = 0
-        low_sample_counter3 = 0
-        high_sample3 = True
-        while written_bytes < number_of_bytes: #write samples until total samples written
-            
-            this_sample = 0
-            #calc sample1
-            if high_sample1:
-                this_sample += high_sample // 3
-                high_sample_counter += 1
-                if high_sample_counter >= samples_per_segment1:
-                    high_sample1 = False
-                    high_sample_counter = 0
-            else: #low_sample1
-                low_sample_counter += 1
-                if low_sample_counter >= samples_per_segment_low1:
-                    low_sample_counter = 0
-                    high_sample1 = True
-               
-            #calc sample2
-            if high_sample2:
-                this_sample += high_sample // 3
-                high_sample_counter2 += 1
-                if high_sample_counter2 >= samples_per_segment2:
-                    high_sample2 = False
-                    high_sample_counter2 = 0
-            else: # low sample2
-                low_sample_counter2 += 1
-                if low_sample_counter2 >= samples_per_segment_low2:
-                    low_sample_counter2 = 0
-                    high_sample2 = True
-            
-            #calc sample3
-            if high_sample3:
-                this_sample += high_sample // 3
-                high_sample_counter3 += 1
-                if high_sample_counter3 >= samples_per_segment3:
-                    high_sample3 = False
-                    high_sample_counter3 = 0
-            else: # low sample3
-                low_sample_counter3 += 1
-                if low_sample_counter3 >= samples_per_segment_low3:
-                    low_sample_counter3 = 0
-                    high_sample3 = True
-            
-            self._buf[written_bytes] = this_sample
-            written_bytes += 1
-
-        return written_bytes
-        
-    @micropython.native
-    def play_freq(self, freq, time_ms, volume):
-        """Simply play the given frequency"""
-        high_sample = volume_map[volume]
-
-        #while time_ms * 64 > self.buf_size:
-        #    time_ms -= self.buf_size // 64
-        #    written_samples = self.gen_square_wave(freq, self.buf_size // 64, high_sample)
-        #    self._output.write(self._mv[0:written_samples])
-
-        written_samples = self.gen_square_wave(freq, time_ms, high_sample, self.buf_size //2)
-        self._output.write(self._mv[0:written_samples])
+        if type(notes) == str:
+            notes = (notes,)
         
-    @micropython.native 
-    def play_double(self, freq, freq2, time_ms, volume):
-        """Simply play the two given frequencies"""
+        # notes are capped at half the buffer size, which keeps UI sounds short.
+        note_bytes = min(_SAMPLE_RATE_PER_MS * time_ms * 2, self.buf_size // 2)
         high_sample = volume_map[volume]
-
-#         while time_ms * 64 > self.buf_size:
-#             time_ms -= self.buf_size // 64
-#             written_samples = self.double_square_wave(freq, freq2, self.buf_size // 64, high_sample)
-#             self._output.write(self._mv[0:written_samples])
-
-        written_samples = self.double_square_wave(freq, freq2, time_ms, high_sample, self.buf_size//2)
-        self._output.write(self._mv[0:written_samples])
+        sound = bytearray(note_bytes * len(notes))
+        mv = memoryview(sound)
+        
+        for idx, note in enumerate(notes):
+            if type(note) == str:
+                note = (note,)
+            voices = min(len(note), _MAX_VOICES)
+            for v in range(voices):
+                self._steps[v] = _NOTE_STEPS[note[v]]
+            self._mix(mv[idx * note_bytes:], note_bytes, voices, high_sample)
+        
+        if key:
+            if self._sound_cache_used + len(sound) > _SOUND_CACHE_SIZE:
+                self._sound_cache = {}
+                self._sound_cache_used = 0
+            if len(sound) <= _SOUND_CACHE_SIZE:
+                self._sound_cache[key] = sound
+                self._sound_cache_used += len(sound)
+        return sound
+    
+    
+    def _process_buffer(self, arg):
+        """I2S IRQ function. Starts playing the next rendered sound, then renders the one after it."""
+        if self._next_sound is None and self._queue:
+            self._next_sound = self._render(*self._queue.pop(0))
+        self._playing_sound = self._next_sound
+        if self._next_sound:
+            self._output.write(self._next_sound)
+            self._next_sound = self._render(*self._queue.pop(0)) if self._queue else None
+        else:
+            self.playing = False
+    
+    
+    def wait(self):
+        """Block until all queued notes have finished playing (nonblocking mode only)."""
+        if self.nonblocking:
+            while self.playing:
+                time.sleep_ms(1)
+    
+    def stop(self):
+        """Drop any queued notes (nonblocking mode only)."""
+        if self.nonblocking:
+            self._queue.clear()
     
-    @micropython.native
-    def play_triple(self, freq, freq2, freq3, time_ms, volume):
-        """Simply play the three given frequencies"""
-        high_sample = volume_map[volume]
-
-#         while time_ms * 64 > self.buf_size:
-#             time_ms -= self.buf_size // 64
-#             written_samples = self.triple_square_wave(freq, freq2, freq3, self.buf_size // 64, high_sample)
-#             self._output.write(self._mv[0:written_samples])
-
-        written_samples = self.triple_square_wave(freq, freq2, freq3, time_ms, high_sample, self.buf_size//2)
-        self._output.write(self._mv[0:written_samples])
     
-    @micropython.native
     def play(self, notes, time_ms=100, volume=4):
         """
         This is the main outward-facing method of Beeper.
@@ -354,26 +231,24 @@ class Beeper:
             - a tuple of strings of notes names, to be played together (like a chord).
             
         "time_ms" is the time in milliseconds to play each note for.
-        If time_ms creates a note longer than Beeper's internal buffer, then each note will
-        be played multiple times to achieve the requested length.
+        Notes are limited to half of Beeper's buffer size.
         
         "volume" is an integer between 0 and 10.
-        """
         
-        high_sample = volume_map[volume]
-        
-        if type(notes) == str:
-            self.play_freq(tone_map[notes], time_ms, volume)
-        else:
-            for note in notes:
-                if type(note) == str:
-                    self.play_freq(tone_map[note], time_ms, volume)
-                elif len(note) == 1:
-                    self.play_freq(tone_map[note[0]], time_ms, volume)
-                elif len(note) == 2:
-                    self.play_double(tone_map[note[0]],tone_map[note[1]], time_ms, volume)
-                else:
-                    self.play_triple(tone_map[note[0]],tone_map[note[1]], tone_map[note[2]], time_ms, volume)
+        In nonblocking mode, the notes are queued and this returns immediately.
+        """
+        if not self.nonblocking:
+            self._output.write(self._render(notes, time_ms, volume))
+            return
+        
+        self._queue.append((notes, time_ms, volume))
+        # don't let sounds fall behind
+        while len(self._queue) > _MAX_QUEUE_LENGTH:
+            self._queue.pop(0)
+        
+        if not self.playing:
+            self.playing = True
+            self._process_buffer(None)
         
     
 if __name__ == "__main__":
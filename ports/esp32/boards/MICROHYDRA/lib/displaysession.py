@@ -0,0 +1,102 @@
+try:
+    from esp32 import NVS
+except ImportError:
+    NVS = None
+
+
+
+"""
+lib.displaysession
+
+Remembers (in NVS) that the display panel is already initialized, so that the next app can take it over
+without a hard reset, two passes of init commands, and a black frame.
+A panel is only taken over if it was saved with the same rotation and color order, using the default init commands,
+and nothing has put it to sleep, reset it, or changed its inversion since. Otherwise it is fully initialized, as usual.
+
+The ST7789 drivers handle this themselves:
+    - on construction, they skip the reset and init if take_over(self, custom_init) is True
+    - after a full init, they call save(self, custom_init)
+    - when the panel goes to sleep or is reset, they call end()
+
+main.py calls end() after any boot that wasn't caused by machine.reset(),
+because the panel may have lost power (and its state) since the session was saved.
+"""
+
+_NVS_NAMESPACE = const("mhdisplay")
+_NVS_KEY = const("session")
+
+# set in every saved session, so that 0 means "no session"
+_SESSION_FLAG = const(0x10000)
+
+# vertical scrolling registers, and their values after a full init.
+# (these are written directly, because some drivers' vscrdef also changes their drawable area)
+_VSCRDEF = b"\x33"
+_VSCSAD = b"\x37"
+_SCROLL_DEFAULTS = b"\x00\x00\x01\x40\x00\x00" # 0, 320, 0
+
+_nvs = None
+# the last session read/written, or -1 if not read yet
+_session = -1
+
+
+
+def _get():
+    global _nvs, _session
+    if _session == -1:
+        _session = 0
+        if NVS is not None:
+            try:
+                _nvs = NVS(_NVS_NAMESPACE)
+                _session = _nvs.get_i32(_NVS_KEY)
+            except OSError:
+                # key doesn't exist yet
+                pass
+    return _session
+
+
+def _set(session):
+    global _session
+    if _get() == session or _nvs is None:
+        return
+    _session = session
+    try:
+        _nvs.set_i32(_NVS_KEY, session)
+        _nvs.commit()
+    except OSError as e:
+        print(f"Couldn't save display session: {e}")
+
+
+def _pack(rotation, color_order):
+    return _SESSION_FLAG | (color_order << 8) | rotation
+
+
+def take_over(display, custom_init=None):
+    """
+    Take over the panel from the last driver, if it is already initialized the way display needs it.
+
+    On success, display's rotation is applied, and any hardware scrolling left behind is undone.
+    The panel keeps showing its current image until display draws over it.
+
+    Returns:
+        True if the panel was taken over, or False if display must fully initialize it (and then call save).
+    """
+    if custom_init is not None or _get() != _pack(display._rotation, display.color_order):
+        return False
+    display.rotation(display._rotation)
+    display._write(_VSCRDEF, _SCROLL_DEFAULTS)
+    display._write(_VSCSAD, b"\x00\x00")
+    return True
+
+
+def save(display, custom_init=None):
+    """Record that display has initialized the panel (and that it is awake), so the next driver can take it over."""
+    if custom_init is not None:
+        # other drivers can't know what the custom commands did
+        _set(0)
+    else:
+        _set(_pack(display._rotation, display.color_order))
+
+
+def end():
+    """Record that the panel state is unknown, so the next driver must fully initialize it."""
+    _set(0)
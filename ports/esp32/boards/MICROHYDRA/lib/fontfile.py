@@ -0,0 +1,90 @@
+import framebuf, struct, array
+
+
+
+"""
+lib.fontfile
+
+Reader for MicroHydra binary font files (.mhf).
+These are made from the Python font modules using tools/fontconvert.py,
+and can be drawn with st7789fbuf's write() and bitmap_text() methods.
+
+Only the font header and glyph index are kept in memory.
+Glyph bitmaps are read from the file as needed, and a small number of them are cached,
+so the RAM used by a font does not depend on the size of its bitmaps.
+
+
+File layout (little-endian):
+    magic       4 bytes, b"MHF\\x01"
+    height      uint16
+    max_width   uint16
+    count       uint16, number of glyphs
+    map_len     uint16, length of the character map in bytes
+    map         map_len bytes, UTF-8 string of every character in the font
+    widths      count bytes, width of each glyph
+    offsets     count uint32, file offset of each glyph bitmap
+    bitmaps     MONO_HLSB glyph bitmaps, each ((width + 7) // 8) * height bytes
+"""
+
+_MAGIC = const(b"MHF\x01")
+_HEADER_FORMAT = const("<4sHHHH")
+_HEADER_SIZE = const(12)
+
+
+
+class FontFile:
+    def __init__(self, path, cache_size=32):
+        """
+        Open a binary font file.
+
+        Args:
+            path (str): path to the .mhf file
+            cache_size (int): how many glyphs to keep in memory
+        """
+        self._file = open(path, 'rb')
+        magic, self.HEIGHT, self.MAX_WIDTH, count, map_len = struct.unpack(
+            _HEADER_FORMAT, self._file.read(_HEADER_SIZE)
+            )
+        if magic != _MAGIC:
+            self._file.close()
+            raise ValueError(f"{path} is not a MicroHydra font file")
+
+        # these mirror the attributes of converted true-type font modules
+        self.MAP = self._file.read(map_len).decode()
+        self.WIDTHS = self._file.read(count)
+        self._offsets = array.array('I', self._file.read(count * 4))
+
+        self.cache_size = cache_size
+        self._cache = {}
+        # cached characters, oldest first
+        self._cache_order = []
+
+    def close(self):
+        self._file.close()
+        self._cache = {}
+        self._cache_order = []
+
+    def get(self, character, default=None):
+        """
+        Return (FrameBuffer, width) for the given character,
+        reading it from the file if it isn't cached. Returns default if the character isn't in the font.
+        """
+        glyph = self._cache.get(character)
+        if glyph is not None:
+            return glyph
+
+        idx = self.MAP.find(character)
+        if idx == -1:
+            return default
+
+        width = self.WIDTHS[idx]
+        buf = bytearray(((width + 7) >> 3) * self.HEIGHT)
+        self._file.seek(self._offsets[idx])
+        self._file.readinto(buf)
+        glyph = (framebuf.FrameBuffer(buf, width, self.HEIGHT, framebuf.MONO_HLSB), width)
+
+        if len(self._cache_order) >= self.cache_size:
+            del self._cache[self._cache_order.pop(0)]
+        self._cache[character] = glyph
+        self._cache_order.append(character)
+        return glyph
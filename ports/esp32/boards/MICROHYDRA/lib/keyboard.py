@@ -1,18 +1,21 @@
 from machine import Pin
+from lib.keymatrix import (
+    kc_shift, kc_fn, build_layer, diff_rows,
+    MATRIX_ROWS, SHIFT_INDEX, FN_INDEX, GO_BIT, MOD_BIT, NEW_KEYS, KEYS_CHANGED,
+    )
 
 
 
 """
-lib.keyboard version: 1.1
+lib.keyboard version: 1.2
 changes:
+    Key state is now held as a matrix bitmask, and turned into key names with precomputed lookup tables.
+    New keys are found by diffing the current and previous masks in viper,
+    so polling the keyboard doesn't allocate unless a key is actually pressed.
     Cleaned unused code.
     Added KeyBoard.get_new_keys()
 """
 
-#lookup values for our keyboard
-kc_shift = const(61)
-kc_fn = const(65)
-
 keymap = {
     67:'`',  63:'1',  57:'2',  53:'3', 47:'4', 43:'5', 37:'6', 33:'7', 27:'8', 23:'9', 17:'0', 13:'_', 7:'=', 3:'BSPC',
     
@@ -44,6 +47,11 @@ keymap_fn = {
     }
 
 
+_LAYER_BASE = build_layer(keymap, {})
+_LAYER_SHIFT = build_layer(keymap, keymap_shift)
+_LAYER_FN = build_layer(keymap, keymap_fn)
+
+
 class KeyBoard():
     def __init__(self):
         self._key_list_buffer = []
@@ -65,13 +73,16 @@ class KeyBoard():
         self.a1 = Pin(9, Pin.OUT)
         self.a2 = Pin(11, Pin.OUT)
         
-        self.key_state = []
-        self.prev_key_state = []
+        # key matrix bitmasks, one byte per row
+        self._rows = bytearray(MATRIX_ROWS)
+        self._prev_rows = bytearray(MATRIX_ROWS)
+        self._new_rows = bytearray(MATRIX_ROWS)
         
-    def scan(self):
-        """scan through the matrix to see what keys are pressed."""
+        self.key_state = []
         
-        self._key_list_buffer = []
+    def _read_matrix(self):
+        """Read the whole matrix (and the "Go" button) into self._rows, as one bitmask per row."""
+        rows = self._rows
         
         #this for loop iterates through the 8 rows of our matrix
         for row in range(0,8):
@@ -79,74 +90,104 @@ class KeyBoard():
             self.a1.value( ( row & 0b010 ) >> 1)
             self.a2.value( ( row & 0b100 ) >> 2)
         
-            #for i, col in enumerate(self.columns):
-            #for i in range(0,7):
-            #    if not self.columns[i].value(): # button pressed
-            #        key_address = (i * 10) + row
-            #        self._key_list_buffer.append(key_address)
             # I know this is ugly, it should be a loop.
             # but this scan can be slow, and doing  this instead of a loop runs much faster:
+            bits = 0
             if not self.c6.value():
-                self._key_list_buffer.append(row)
+                bits |= 0b0000001
             if not self.c5.value():
-                self._key_list_buffer.append(10 + row)
+                bits |= 0b0000010
             if not self.c4.value():
-                self._key_list_buffer.append(20 + row)
+                bits |= 0b0000100
             if not self.c3.value():
-                self._key_list_buffer.append(30 + row)
+                bits |= 0b0001000
             if not self.c2.value():
-                self._key_list_buffer.append(40 + row)
+                bits |= 0b0010000
             if not self.c1.value():
-                self._key_list_buffer.append(50 + row)
+                bits |= 0b0100000
             if not self.c0.value():
-                self._key_list_buffer.append(60 + row)
+                bits |= 0b1000000
+            rows[row] = bits
         
-        return self._key_list_buffer                
-                
-                
-    def get_pressed_keys(self):
-        """Get a readable list of currently held keys."""
-        
-        #update our scan results
-        self.scan()
+        if not self.go.value():
+            rows[0] |= GO_BIT
+    
+    def _layer(self):
+        """Get the key name lookup table for the currently held modifier keys."""
+        if self._rows[FN_INDEX >> 3] & MOD_BIT:
+            return _LAYER_FN
+        if self._rows[SHIFT_INDEX >> 3] & MOD_BIT:
+            return _LAYER_SHIFT
+        return _LAYER_BASE
+    
+    def _update_key_state(self):
+        """Rebuild self.key_state from the key matrix."""
+        layer = self._layer()
+        rows = self._rows
         self.key_state = []
-        
-        if self.go.value() == 0:
+        # "GO" always comes first
+        if rows[0] & GO_BIT:
             self.key_state.append("GO")
+        for row in range(MATRIX_ROWS):
+            bits = rows[row] & ~GO_BIT
+            idx = row * 8
+            while bits:
+                if bits & 1 and layer[idx]:
+                    self.key_state.append(layer[idx])
+                bits >>= 1
+                idx += 1
         
-        if not self._key_list_buffer and not self.key_state: # if nothing is pressed, we can return an empty list
-            return self.key_state
+    def scan(self):
+        """scan through the matrix to see what keys are pressed. Returns a list of keycodes."""
         
-        if kc_fn in self._key_list_buffer:
-            #remove modifier keys which are already accounted for
-            self._key_list_buffer.remove(kc_fn)
-            if kc_shift in self._key_list_buffer:
-                self._key_list_buffer.remove(kc_shift)
-                
-            for keycode in self._key_list_buffer:
-                self.key_state.append(keymap_fn[keycode])
-                
-        elif kc_shift in self._key_list_buffer:
-            #remove modifier keys which are already accounted for
-            self._key_list_buffer.remove(kc_shift)
-            
-            for keycode in self._key_list_buffer:
-                self.key_state.append(keymap_shift[keycode])
+        self._key_list_buffer = []
+        self._read_matrix()
         
-        else:
-            for keycode in self._key_list_buffer:
-                self.key_state.append(keymap[keycode])
+        for row in range(0,8):
+            bits = self._rows[row] & ~GO_BIT
+            col = 0
+            while bits:
+                if bits & 1:
+                    self._key_list_buffer.append(col * 10 + row)
+                bits >>= 1
+                col += 1
         
+        return self._key_list_buffer                
+                
+                
+    def get_pressed_keys(self):
+        """Get a readable list of currently held keys."""
+        self._read_matrix()
+        # these keys have been seen now, so get_new_keys shouldn't report them again
+        self._prev_rows[:] = self._rows
+        self._update_key_state()
         return self.key_state
     
     def get_new_keys(self):
         """
         Return a list of keys which are newly pressed.
         """
-        self.prev_key_state = self.key_state
-        self.get_pressed_keys()
-        # Originally I wanted to use a set() for this, but with testing, this is apparantly faster. 
-        return [key for key in self.key_state if key not in self.prev_key_state]
+        self._read_matrix()
+        flags = diff_rows(self._rows, self._prev_rows, self._new_rows)
+        if flags & KEYS_CHANGED:
+            self._update_key_state()
+        if not flags & NEW_KEYS:
+            return []
+        
+        layer = self._layer()
+        new_rows = self._new_rows
+        keylist = []
+        if new_rows[0] & GO_BIT:
+            keylist.append("GO")
+        for row in range(MATRIX_ROWS):
+            bits = new_rows[row] & ~GO_BIT
+            idx = row * 8
+            while bits:
+                if bits & 1 and layer[idx]:
+                    keylist.append(layer[idx])
+                bits >>= 1
+                idx += 1
+        return keylist
         
 
 
@@ -0,0 +1,81 @@
+"""
+lib.keymatrix
+
+Shared key matrix helpers for lib.keyboard and lib.smartkeyboard.
+
+The key matrix is stored as 8 rows of bits. Keycode (col * 10) + row is at bit col of that row,
+so its "key index" in the matrix is (row * 8) + col.
+The "Go" button is not part of the matrix, and uses the unused bit 7 of row 0 (keycode kc_go).
+"""
+
+#lookup values for our keyboard
+kc_go = const(8)
+kc_shift = const(61)
+kc_fn = const(65)
+kc_opt = const(60)
+
+MATRIX_ROWS = const(8)
+KEY_COUNT = const(64)
+GO_INDEX = const(7)
+SHIFT_INDEX = const(14) # kc_shift
+FN_INDEX = const(46) # kc_fn
+OPT_INDEX = const(6) # kc_opt
+GO_BIT = const(0x80)
+MOD_BIT = const(0x40) # column of the shift, fn, and opt keys
+
+# flags returned by diff_rows
+NEW_KEYS = const(1)
+KEYS_CHANGED = const(2)
+
+
+
+def key_index(keycode):
+    """Get the key index of a keycode."""
+    if keycode == kc_go:
+        return GO_INDEX
+    return (keycode % 10) * 8 + keycode // 10
+
+
+# keycodes by key index (None for unused bits)
+KEYCODES = tuple(
+    kc_go if idx == GO_INDEX else ((idx & 7) * 10 + (idx >> 3) if idx & 7 != 7 else None)
+    for idx in range(KEY_COUNT)
+    )
+
+
+def build_layer(keymap, layer):
+    """Make a lookup table of key names, by key index, for one modifier layer of keymap."""
+    names = [None] * KEY_COUNT
+    for code in keymap:
+        names[key_index(code)] = layer.get(code, keymap[code])
+    names[GO_INDEX] = "GO"
+    # modifier keys are applied to other keys, rather than reported
+    names[SHIFT_INDEX] = None
+    names[FN_INDEX] = None
+    return tuple(names)
+
+
+@micropython.viper
+def diff_rows(current, previous, new) -> int:
+    """
+    Store the newly set bits of current in new, and copy current to previous.
+    Returns NEW_KEYS if any keys were newly pressed, and KEYS_CHANGED if any changed at all.
+    """
+    cur = ptr8(current)
+    prev = ptr8(previous)
+    out = ptr8(new)
+    changed = 0
+    pressed = 0
+    for row in range(MATRIX_ROWS):
+        bits = cur[row]
+        diff = bits ^ prev[row]
+        out[row] = diff & bits
+        prev[row] = bits
+        changed |= diff
+        pressed |= diff & bits
+    flags = 0
+    if pressed:
+        flags |= NEW_KEYS
+    if changed:
+        flags |= KEYS_CHANGED
+    return flags
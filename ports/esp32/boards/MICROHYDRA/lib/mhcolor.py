@@ -0,0 +1,201 @@
+import array
+
+
+
+"""
+lib.mhcolor
+
+Fast integer math for RGB565 colors.
+
+The color functions in lib.mhconfig convert through HSV space, which looks nice but is slow.
+These functions blend colors channel-by-channel with integer (viper) math instead,
+so they are cheap enough to call every frame, or for every pixel in a gradient.
+
+Blend factors are floats from 0.0 to 1.0, and are used internally as 8-bit fixed-point values.
+
+Example:
+    from lib import mhcolor
+
+    # a 256 step fade from the background color to the UI color:
+    ramp = mhcolor.fade_ramp(config.palette[1], config.palette[5])
+    display.fill(ramp[frame & 255])
+"""
+
+_FACTOR_ONE = const(256)
+_FACTOR_SHIFT = const(8)
+
+# max number of cached fade ramps
+_RAMP_CACHE_SIZE = const(8)
+
+_RAMPS = {}
+# cached ramp keys, oldest first
+_RAMP_ORDER = []
+
+# holds a single target color for blend_array
+_TARGET = array.array('H', (0,))
+
+# max number of results remembered by cached() functions
+_COLOR_CACHE_SIZE = const(64)
+_COLOR_CACHE = {}
+
+
+
+@micropython.viper
+def _blend(color1:int, color2:int, factor:int) -> int:
+    """Blend two RGB565 colors, using a factor from 0 to 256."""
+    inverse = _FACTOR_ONE - factor
+    red = ((color1 >> 11) * inverse + (color2 >> 11) * factor + 128) >> _FACTOR_SHIFT
+    green = (((color1 >> 5) & 0x3F) * inverse + ((color2 >> 5) & 0x3F) * factor + 128) >> _FACTOR_SHIFT
+    blue = ((color1 & 0x1F) * inverse + (color2 & 0x1F) * factor + 128) >> _FACTOR_SHIFT
+    return (red << 11) | (green << 5) | blue
+
+
+@micropython.viper
+def _blend_arrays(colors1, colors2, output, count:int, factor:int, step2:int):
+    """
+    Blend count colors from two array('H')s into output.
+    step2 is 0 to blend every color with colors2[0], or 1 to blend the arrays element by element.
+    """
+    src1 = ptr16(colors1)
+    src2 = ptr16(colors2)
+    dest = ptr16(output)
+    inverse = _FACTOR_ONE - factor
+    j = 0
+    for i in range(count):
+        color1 = src1[i]
+        color2 = src2[j]
+        red = ((color1 >> 11) * inverse + (color2 >> 11) * factor + 128) >> _FACTOR_SHIFT
+        green = (((color1 >> 5) & 0x3F) * inverse + ((color2 >> 5) & 0x3F) * factor + 128) >> _FACTOR_SHIFT
+        blue = ((color1 & 0x1F) * inverse + (color2 & 0x1F) * factor + 128) >> _FACTOR_SHIFT
+        dest[i] = (red << 11) | (green << 5) | blue
+        j += step2
+
+
+@micropython.viper
+def _fill_ramp(output, color1:int, color2:int, steps:int, increment:int):
+    """Fill output with steps colors fading from color1 to color2. increment is the factor step, << 16."""
+    dest = ptr16(output)
+    red1 = color1 >> 11
+    green1 = (color1 >> 5) & 0x3F
+    blue1 = color1 & 0x1F
+    red2 = color2 >> 11
+    green2 = (color2 >> 5) & 0x3F
+    blue2 = color2 & 0x1F
+    accumulator = 0
+    for i in range(steps):
+        factor = accumulator >> 16
+        inverse = _FACTOR_ONE - factor
+        red = (red1 * inverse + red2 * factor + 128) >> _FACTOR_SHIFT
+        green = (green1 * inverse + green2 * factor + 128) >> _FACTOR_SHIFT
+        blue = (blue1 * inverse + blue2 * factor + 128) >> _FACTOR_SHIFT
+        dest[i] = (red << 11) | (green << 5) | blue
+        accumulator += increment
+
+
+
+def _factor(factor):
+    """Convert a float factor into an int from 0 to 256."""
+    factor = int(factor * _FACTOR_ONE)
+    if factor < 0:
+        return 0
+    if factor > _FACTOR_ONE:
+        return _FACTOR_ONE
+    return factor
+
+
+def cached(func):
+    """
+    Decorator which remembers the results of a slow color function (like the HSV functions in lib.mhconfig).
+    These are often called repeatedly with the same colors (for example, in a draw loop).
+    The cache is shared by every decorated function, and is emptied when it fills up.
+    """
+    def wrapper(*args, **kwargs):
+        key = (func, args, tuple(sorted(kwargs.items()))) if kwargs else (func, args)
+        result = _COLOR_CACHE.get(key)
+        if result is None:
+            if len(_COLOR_CACHE) >= _COLOR_CACHE_SIZE:
+                _COLOR_CACHE.clear()
+            result = _COLOR_CACHE[key] = func(*args, **kwargs)
+        return result
+    return wrapper
+
+
+def blend565(color1, color2, factor=0.5):
+    """
+    Linearly blend two RGB565 colors.
+
+    Args:
+        color1 (int): the color returned when factor is 0.0
+        color2 (int): the color returned when factor is 1.0
+        factor (float): how far to blend from color1 to color2
+    """
+    return _blend(color1, color2, _factor(factor))
+
+
+def darker565(color, factor=0.5):
+    """Blend a color toward black."""
+    return _blend(color, 0, _factor(factor))
+
+
+def lighter565(color, factor=0.5):
+    """Blend a color toward white."""
+    return _blend(color, 0xFFFF, _factor(factor))
+
+
+def blend_array(colors, target, factor=0.5, output=None):
+    """
+    Blend a whole array of RGB565 colors at once.
+
+    Args:
+        colors (array('H')): the colors to blend
+        target (int | array('H')): a single color to blend every color toward,
+            or an array of colors to blend with element by element
+        factor (float): how far to blend toward the target
+        output (array('H')): where to put the results. Can be the same as colors.
+            A new array is made if this is None.
+
+    Returns:
+        array('H'): the blended colors
+    """
+    count = len(colors)
+    if output is None:
+        output = array.array('H', colors)
+    if isinstance(target, int):
+        _TARGET[0] = target
+        _blend_arrays(colors, _TARGET, output, count, _factor(factor), 0)
+    else:
+        _blend_arrays(colors, target, output, min(count, len(target)), _factor(factor), 1)
+    return output
+
+
+def fade_ramp(color1, color2, steps=256):
+    """
+    Get a precomputed fade between two colors, as an array('H') of length steps.
+
+    Recently used ramps are cached, so this can be called every frame.
+    Don't modify the returned array.
+    """
+    key = (color1, color2, steps)
+    ramp = _RAMPS.get(key)
+    if ramp is not None:
+        return ramp
+
+    ramp = array.array('H', (0 for _ in range(steps)))
+    if steps > 1:
+        _fill_ramp(ramp, color1, color2, steps, (_FACTOR_ONE << 16) // (steps - 1))
+        ramp[steps - 1] = color2
+    elif steps:
+        ramp[0] = color1
+
+    if len(_RAMP_ORDER) >= _RAMP_CACHE_SIZE:
+        del _RAMPS[_RAMP_ORDER.pop(0)]
+    _RAMPS[key] = ramp
+    _RAMP_ORDER.append(key)
+    return ramp
+
+
+def clear_cache():
+    """Free the cached fade ramps, and the results of cached() functions."""
+    _RAMPS.clear()
+    _RAMP_ORDER.clear()
+    _COLOR_CACHE.clear()
@@ -1,6 +1,13 @@
+from lib import mhcolor
+
 
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ CONSTANT ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
-DEFAULT_CONFIG = {"ui_color":53243, "bg_color":4421, "ui_sound":True, "volume":2, "wifi_ssid":'', "wifi_pass":'', 'sync_clock':True, 'timezone':0}
+DEFAULT_CONFIG = {"ui_color":53243, "bg_color":4421, "ui_sound":True, "volume":2, "wifi_ssid":'', "wifi_pass":'', 'sync_clock':True, 'timezone':0, 'fast_launch':False, 'idle_sleep':False}
+
+# generated palettes, {(ui_color, bg_color): (palette, rgb_colors)}
+_PALETTE_CACHE_SIZE = const(8)
+_PALETTE_CACHE = {}
+
 
 def mix(val2, val1, fac=0.5):
     """Mix two values to the weight of fac"""
@@ -98,6 +105,7 @@ def hsv_to_rgb(h, s, v):
     # Cannot get here
     
 
+@mhcolor.cached
 def mix_color565(color1, color2, mix_factor=0.5, hue_mix_fac=None, sat_mix_fac=None):
     """
     High quality mixing of two rgb565 colors, by converting through HSV color space.
@@ -136,6 +144,7 @@ def mix_color565(color1, color2, mix_factor=0.5, hue_mix_fac=None, sat_mix_fac=N
 
 
 
+@mhcolor.cached
 def darker_color565(color,mix_factor=0.5):
     """
     Get the darker version of a 565 color.
@@ -161,6 +170,7 @@ def darker_color565(color,mix_factor=0.5):
     return combine_color565(r,g,b)
 
 
+@mhcolor.cached
 def lighter_color565(color,mix_factor=0.2):
     """
     Get the lighter version of a 565 color.
@@ -186,6 +196,7 @@ def lighter_color565(color,mix_factor=0.2):
     return combine_color565(r,g,b)
 
 
+@mhcolor.cached
 def color565_shiftred(color, mix_factor=0.4, hue_mix_fac=0.8, sat_mix_fac=0.8):
     """
     Simple convenience function which shifts a color toward red.
@@ -195,6 +206,7 @@ def color565_shiftred(color, mix_factor=0.4, hue_mix_fac=0.8, sat_mix_fac=0.8):
     return mix_color565(color, _RED, mix_factor, hue_mix_fac, sat_mix_fac)
     
 
+@mhcolor.cached
 def color565_shiftgreen(color, mix_factor=0.1, hue_mix_fac=0.4, sat_mix_fac=0.1):
     """
     Simple convenience function which shifts a color toward green.
@@ -203,6 +215,7 @@ def color565_shiftgreen(color, mix_factor=0.1, hue_mix_fac=0.4, sat_mix_fac=0.1)
     _GREEN = const(2016)
     return mix_color565(color, _GREEN, mix_factor, hue_mix_fac, sat_mix_fac)
 
+@mhcolor.cached
 def color565_shiftblue(color, mix_factor=0.1, hue_mix_fac=0.4, sat_mix_fac=0.2):
     """
     Simple convenience function which shifts a color toward blue.
@@ -228,6 +241,10 @@ class Config:
             with open("config.json", "w") as conf:
                 self.config = DEFAULT_CONFIG
                 conf.write(json.dumps(self.config))
+        # fill in any options that were added since config.json was saved
+        for key, val in DEFAULT_CONFIG.items():
+            if key not in self.config:
+                self.config[key] = val
         # storing just the vals from the config lets us check later if any values have been modified
         self.initial_values = tuple( self.config.values() )
         # generate an extended color palette
@@ -246,6 +263,11 @@ class Config:
         """
         ui_color = self.config['ui_color']
         bg_color = self.config['bg_color']
+        cached = _PALETTE_CACHE.get((ui_color, bg_color))
+        if cached:
+            self.palette, self.rgb_colors = cached
+            return
+        
         mid_color = mix_color565(bg_color, ui_color, 0.5)
         
             
@@ -265,6 +287,16 @@ class Config:
             color565_shiftgreen(mid_color), # green color
             color565_shiftblue(darker_color565(mid_color)) # blue color
             )
+        if len(_PALETTE_CACHE) >= _PALETTE_CACHE_SIZE:
+            _PALETTE_CACHE.clear()
+        _PALETTE_CACHE[(ui_color, bg_color)] = (self.palette, self.rgb_colors)
+    
+    def palette_ramp(self, start=1, end=5, steps=256):
+        """
+        Get a precomputed fade (array('H') of length steps) between two palette colors.
+        By default, this fades from the bg color to the ui color.
+        """
+        return mhcolor.fade_ramp(self.palette[start], self.palette[end], steps)
         
     def __getitem__(self, key):
         # get item passthrough
@@ -1,4 +1,5 @@
 import math
+from lib.mhcolor import cached
 
 
 '''
@@ -8,6 +9,9 @@ This is a collection of utility functions for MicroHydra.
 This module was created to prevent 'launcher.py' from becoming too large,
 and to provide easy access to any other scripts or apps who want to use these same utilities.
 
+The HSV color functions here are slow, so their results are cached.
+For fast blending, fades, and gradients, see lib.mhcolor.
+
 '''
 
 
@@ -148,6 +152,7 @@ def hsv_to_rgb(h, s, v):
     # Cannot get here
     
 
+@cached
 def mix_color565(color1, color2, mix_factor=0.5):
     """
     High quality mixing of two rgb565 colors, by converting through HSV color space.
@@ -181,6 +186,7 @@ def mix_color565(color1, color2, mix_factor=0.5):
 
 
 
+@cached
 def darker_color565(color,mix_factor=0.5):
     """
     Get the darker version of a 565 color.
@@ -206,6 +212,7 @@ def darker_color565(color,mix_factor=0.5):
     return combine_color565(r,g,b)
 
 
+@cached
 def lighter_color565(color,mix_factor=0.5):
     """
     Get the lighter version of a 565 color.
@@ -231,6 +238,7 @@ def lighter_color565(color,mix_factor=0.5):
     return combine_color565(r,g,b)
 
 
+@cached
 def color565_shiftred(color, mix_factor=0.5):
     """
     Simple convenience function which shifts a color toward red.
@@ -240,6 +248,7 @@ def color565_shiftred(color, mix_factor=0.5):
     return mix_color565(color, red, mix_factor)
     
 
+@cached
 def color565_shiftgreen(color, mix_factor=0.5):
     """
     Simple convenience function which shifts a color toward green.
@@ -1,14 +1,37 @@
 from machine import Pin
-import time
+import time, array
+from lib.keymatrix import (
+    kc_go, kc_shift, kc_fn, kc_opt, build_layer, diff_rows, key_index, KEYCODES,
+    MATRIX_ROWS, KEY_COUNT, GO_INDEX, SHIFT_INDEX, FN_INDEX, OPT_INDEX, GO_BIT, MOD_BIT, NEW_KEYS, KEYS_CHANGED,
+    )
+
+try:
+    import _thread
+except ImportError:
+    _thread = None
 
 """
-lib.smartkeyboard version: 1.0
+lib.smartkeyboard version: 1.2
+changes:
+    Key state is now held as a matrix bitmask (8 rows of 8 bits), and turned into key names
+    with precomputed lookup tables for each modifier layer. New keys are found by diffing the
+    current and previous masks in viper, and repeats are tracked in a fixed-size timestamp array,
+    so polling the keyboard doesn't allocate unless a key is actually pressed.
+    
+    Added an optional background scanning engine (KeyBoard.start).
+    While it runs, the matrix is scanned from a Timer (or a thread) at a fixed rate,
+    debounced, and turned into press/release/repeat events in a ring buffer.
+    get_new_keys and get_pressed_keys then read those results instead of rescanning.
 """
 
-#lookup values for our keyboard
-kc_shift = const(61)
-kc_fn = const(65)
-kc_opt = const(60)
+# event types for KeyBoard.get_event. Events are ints: (type << 8) | keycode
+EVENT_PRESS = const(1)
+EVENT_RELEASE = const(2)
+EVENT_REPEAT = const(3)
+
+# must be a power of 2
+_EVENT_QUEUE_SIZE = const(32)
+_EVENT_QUEUE_MASK = const(31)
 
 keymap = {
     67:'`',  63:'1',  57:'2',  53:'3', 47:'4', 43:'5', 37:'6', 33:'7', 27:'8', 23:'9', 17:'0', 13:'_', 7:'=', 3:'BSPC',
@@ -42,6 +65,12 @@ def get_special(dict_, code):
         return dict_[code]
     else:
         return keymap[code]
+
+
+_LAYER_BASE = build_layer(keymap, {})
+_LAYER_SHIFT = build_layer(keymap, keymap_shift)
+_LAYER_FN = build_layer(keymap, keymap_fn)
+
     
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ KeyBoard: ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 class KeyBoard():
@@ -54,8 +83,7 @@ class KeyBoard():
             from lib import mhconfig
             self.config = mhconfig.Config()
         
-        self.tracker = {}
-        self.hold_ms=600
+        self.hold_ms = hold_ms
         self.repeat_delta = hold_ms - repeat_ms
         
         #setup the "Go" button!
@@ -75,107 +103,283 @@ class KeyBoard():
         self.a1 = Pin(9, Pin.OUT)
         self.a2 = Pin(11, Pin.OUT)
         
+        # column pins ordered by keycode; bit n of a row is keycode (n * 10) + row
+        self._columns = (self.c6, self.c5, self.c4, self.c3, self.c2, self.c1, self.c0)
+        
+        # key matrix bitmasks, one byte per row
+        self._raw_rows = bytearray(MATRIX_ROWS)
+        self._prev_rows = bytearray(MATRIX_ROWS)
+        self._new_rows = bytearray(MATRIX_ROWS)
+        # when each key was pressed (or last repeated), by key index
+        self._held_since = array.array('i', (0 for _ in range(KEY_COUNT)))
+        
+        # scanning engine state
+        self._last_rows = bytearray(MATRIX_ROWS)
+        self._stable_rows = bytearray(MATRIX_ROWS)
+        self._stable_changed = False
+        self._events = array.array('H', (0 for _ in range(_EVENT_QUEUE_SIZE)))
+        self._event_head = 0
+        self._event_tail = 0
+        self._timer = None
+        self._running = False
+        
+        self.key_state = []
+        
+    def _read_matrix(self):
+        """Read the whole matrix (and the "Go" button) into self._raw_rows, as one bitmask per row."""
+        rows = self._raw_rows
+        columns = self._columns
+        a0 = self.a0; a1 = self.a1; a2 = self.a2
+        
+        #this for loop iterates through the 8 rows of our matrix
+        for row in range(0,8):
+            a0.value(row & 0b001)
+            a1.value( ( row & 0b010 ) >> 1)
+            a2.value( ( row & 0b100 ) >> 2)
+            
+            bits = 0
+            for col in range(7):
+                if not columns[col].value():
+                    bits |= 1 << col
+            rows[row] = bits
+        
+        if not self.go.value():
+            rows[0] |= GO_BIT
+    
+    def _rows(self):
+        """The current key matrix: debounced if the scanning engine is running, otherwise the last scan."""
+        return self._stable_rows if self._running else self._raw_rows
+    
+    def _layer(self):
+        """Get the key name lookup table for the currently held modifier keys."""
+        rows = self._rows()
+        if rows[FN_INDEX >> 3] & MOD_BIT:
+            return _LAYER_FN
+        if rows[SHIFT_INDEX >> 3] & MOD_BIT:
+            return _LAYER_SHIFT
+        return _LAYER_BASE
+    
+    def _update_key_state(self):
+        """Rebuild self.key_state from the key matrix."""
+        layer = self._layer()
+        rows = self._rows()
         self.key_state = []
-        #self.prev_key_state = []
+        # "GO" always comes first
+        if rows[0] & GO_BIT:
+            self.key_state.append("GO")
+        for row in range(MATRIX_ROWS):
+            bits = rows[row] & ~GO_BIT
+            idx = row * 8
+            while bits:
+                if bits & 1 and layer[idx]:
+                    self.key_state.append(layer[idx])
+                bits >>= 1
+                idx += 1
         
     def scan(self):
-        """scan through the matrix to see what keys are pressed."""
+        """scan through the matrix to see what keys are pressed. Returns a list of keycodes."""
         
         self._key_list_buffer = []
         
-        #this for loop iterates through the 8 rows of our matrix
+        if not self._running:
+            self._read_matrix()
+        rows = self._rows()
+        
         for row in range(0,8):
-            self.a0.value(row & 0b001)
-            self.a1.value( ( row & 0b010 ) >> 1)
-            self.a2.value( ( row & 0b100 ) >> 2)
-        
-            if not self.c6.value():
-                self._key_list_buffer.append(row)
-            if not self.c5.value():
-                self._key_list_buffer.append(10 + row)
-            if not self.c4.value():
-                self._key_list_buffer.append(20 + row)
-            if not self.c3.value():
-                self._key_list_buffer.append(30 + row)
-            if not self.c2.value():
-                self._key_list_buffer.append(40 + row)
-            if not self.c1.value():
-                self._key_list_buffer.append(50 + row)
-            if not self.c0.value():
-                self._key_list_buffer.append(60 + row)
+            bits = rows[row] & ~GO_BIT
+            col = 0
+            while bits:
+                if bits & 1:
+                    self._key_list_buffer.append(col * 10 + row)
+                bits >>= 1
+                col += 1
         
         return self._key_list_buffer                
                 
                 
     def get_pressed_keys(self):
         """Get a readable list of currently held keys."""
+        if not self._running:
+            self._read_matrix()
+        self._update_key_state()
+        return self.key_state
+    
+    def get_new_keys(self):
+        """
+        Return a list of keys which are newly pressed (or held long enough to repeat).
+        """
+        if self._running:
+            return self._get_new_keys_from_events()
         
-        #update our scan results
-        self.scan()
-        self.key_state = []
+        self._read_matrix()
+        rows = self._raw_rows
+        flags = diff_rows(rows, self._prev_rows, self._new_rows)
+        if flags & KEYS_CHANGED:
+            self._update_key_state()
         
-        if self.go.value() == 0:
-            self.key_state.append("GO")
+        if not flags & NEW_KEYS and not self.key_state:
+            # nothing new, and nothing held that could repeat
+            return []
         
-        if not self._key_list_buffer and not self.key_state: # if nothing is pressed, we can return an empty list
-            return self.key_state
+        layer = self._layer()
+        new_rows = self._new_rows
+        held_since = self._held_since
+        now = time.ticks_ms()
+        keylist = []
         
-        if kc_fn in self._key_list_buffer:
-            #remove modifier keys which are already accounted for
-            self._key_list_buffer.remove(kc_fn)
-            if kc_shift in self._key_list_buffer:
-                self._key_list_buffer.remove(kc_shift)
-                
-            for keycode in self._key_list_buffer:
-                self.key_state.append(get_special(keymap_fn, keycode))
-                
-        elif kc_shift in self._key_list_buffer:
-            #remove modifier keys which are already accounted for
-            self._key_list_buffer.remove(kc_shift)
-            
-            for keycode in self._key_list_buffer:
-                self.key_state.append(get_special(keymap_shift, keycode))
+        # row -1 is just the "GO" button, so that it always comes first
+        for row in range(-1, MATRIX_ROWS):
+            if row < 0:
+                bits = rows[0] >> 7
+                new = new_rows[0] >> 7
+                idx = GO_INDEX
+            else:
+                bits = rows[row] & ~GO_BIT
+                new = new_rows[row]
+                idx = row * 8
+            while bits:
+                if bits & 1 and layer[idx]:
+                    if new & 1:
+                        keylist.append(layer[idx])
+                        held_since[idx] = now
+                    elif time.ticks_diff(now, held_since[idx]) >= self.hold_ms:
+                        # test if keys have been held long enough to repeat
+                        keylist.append(layer[idx])
+                        held_since[idx] = now - self.repeat_delta
+                bits >>= 1
+                new >>= 1
+                idx += 1
         
-        else:
-            for keycode in self._key_list_buffer:
-                self.key_state.append(keymap[keycode])
+        self.system_commands(keylist)
         
-        return self.key_state
+        return keylist
     
-    def get_new_keys(self):
-        """
-        Return a list of keys which are newly pressed.
-        """
-        self.populate_tracker()
-        self.get_pressed_keys()
+    def _get_new_keys_from_events(self):
+        """Drain the event queue into a list of newly pressed (or repeated) keys."""
+        if self._stable_changed:
+            self._stable_changed = False
+            self._update_key_state()
         
-        keylist = [key for key in self.key_state if key not in self.tracker.keys()]
+        event = self.get_event()
+        if event == -1:
+            return []
         
-        for key in self.tracker.keys():
-            # test if keys have been held long enough to repeat
-            if time.ticks_diff(time.ticks_ms(), self.tracker[key]) >= self.hold_ms:
-                keylist.append(key)
-                self.tracker[key] = time.ticks_ms() - self.repeat_delta
+        layer = self._layer()
+        keylist = []
+        while event != -1:
+            name = layer[key_index(event & 0xFF)]
+            if event >> 8 != EVENT_RELEASE and name:
+                keylist.append(name)
+            event = self.get_event()
         
         self.system_commands(keylist)
-        
         return keylist
     
-    def populate_tracker(self):
-        """Move currently pressed keys to tracker"""
-        # add new keys
-        for key in self.key_state:
-            if key not in self.tracker.keys():
-                self.tracker[key] = time.ticks_ms()
-                
-        # remove keys that arent being pressed from tracker
-        for key in self.tracker.keys():
-            if key not in self.key_state:
-                self.tracker.pop(key)
+    def key_name(self, keycode):
+        """Get the name of a keycode (from an event), using the modifier keys that are currently held."""
+        return self._layer()[key_index(keycode)]
+    
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ scanning engine: ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    def start(self, period_ms=10, timer_id=0, use_thread=False):
+        """
+        Start scanning the keyboard in the background.
+        
+        The matrix is read once every period_ms, and debounced (a key must read the same for two scans in a row).
+        Changes are pushed into a ring buffer of events, which get_new_keys (or get_event) drains.
+        
+        Args:
+            period_ms (int): how often to scan the matrix
+            timer_id (int): which machine.Timer to use
+            use_thread (bool): scan from a new thread instead of a Timer
+        """
+        if self._running:
+            return
+        self._event_head = 0
+        self._event_tail = 0
+        self._running = True
+        if use_thread and _thread:
+            _thread.start_new_thread(self._scan_loop, (period_ms,))
+        else:
+            from machine import Timer
+            self._timer = Timer(timer_id)
+            self._timer.init(mode=Timer.PERIODIC, period=period_ms, callback=self._tick)
+    
+    def stop(self):
+        """Stop the background scanning engine, and go back to scanning on request."""
+        self._running = False
+        if self._timer is not None:
+            self._timer.deinit()
+            self._timer = None
+    
+    def _scan_loop(self, period_ms):
+        while self._running:
+            self._tick()
+            time.sleep_ms(period_ms)
+    
+    def _push_event(self, event):
+        """Add an event to the ring buffer, dropping the oldest event if it's full."""
+        head = self._event_head
+        self._events[head] = event
+        head = (head + 1) & _EVENT_QUEUE_MASK
+        if head == self._event_tail:
+            self._event_tail = (self._event_tail + 1) & _EVENT_QUEUE_MASK
+        self._event_head = head
+    
+    def get_event(self):
+        """
+        Pop the oldest event from the queue, or return -1 if it is empty.
+        Events are ints, where (event >> 8) is the event type, and (event & 0xFF) is the keycode.
+        Use key_name to get the name of the key.
+        """
+        tail = self._event_tail
+        if tail == self._event_head:
+            return -1
+        self._event_tail = (tail + 1) & _EVENT_QUEUE_MASK
+        return self._events[tail]
+    
+    def _tick(self, timer=None):
+        """Scan and debounce the matrix once, and queue any events."""
+        self._read_matrix()
+        now = time.ticks_ms()
+        raw_rows = self._raw_rows
+        last_rows = self._last_rows
+        stable_rows = self._stable_rows
+        held_since = self._held_since
         
+        for row in range(MATRIX_ROWS):
+            raw = raw_rows[row]
+            # only bits which read the same as the last scan are allowed to change
+            agree = ~(raw ^ last_rows[row]) & 0xFF
+            last_rows[row] = raw
+            old = stable_rows[row]
+            new = (old & ~agree) | (raw & agree)
+            
+            if old | new:
+                if old != new:
+                    stable_rows[row] = new
+                    self._stable_changed = True
+                changed = old ^ new
+                idx = row * 8
+                bits = old | new
+                while bits:
+                    if bits & 1:
+                        if changed & 1:
+                            if new & 1:
+                                self._push_event((EVENT_PRESS << 8) | KEYCODES[idx])
+                                held_since[idx] = now
+                            else:
+                                self._push_event((EVENT_RELEASE << 8) | KEYCODES[idx])
+                        elif time.ticks_diff(now, held_since[idx]) >= self.hold_ms:
+                            self._push_event((EVENT_REPEAT << 8) | KEYCODES[idx])
+                            held_since[idx] = now - self.repeat_delta
+                    bits >>= 1
+                    changed >>= 1
+                    new >>= 1
+                    idx += 1
+    
     def system_commands(self, keylist):
         """Check for system commands in the keylist and apply to config"""
-        if 'OPT' in self.key_state:
+        if self._rows()[OPT_INDEX >> 3] & MOD_BIT:
             # system commands are bound to 'OPT': remove OPT and apply commands
             if 'OPT' in keylist:
                 keylist.remove('OPT')
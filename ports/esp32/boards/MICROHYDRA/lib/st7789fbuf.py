@@ -40,10 +40,17 @@ This driver supports:
 - Display rotation
 - RGB and BGR color orders
 - Hardware based scrolling
+- Partial display updates (only changed regions of the framebuffer are sent)
+- Hardware scrolling (only the newly exposed strip is sent)
+- Optional double buffering, so the display can be updated in a background
+  thread while the next frame is drawn (show_async/wait_flush)
 - Drawing text using 8 and 16 bit wide bitmap fonts with heights that are
   multiples of 8.  Included are 12 bitmap fonts derived from classic pc
-  BIOS text mode fonts.
-- Drawing text using converted TrueType fonts.
+  BIOS text mode fonts. Glyphs are cached, so repeated text is cheap to draw.
+- Drawing text using converted TrueType fonts. Each font is expanded into a
+  glyph atlas on first use, which can be dropped to free memory.
+- Drawing text from binary font files (see lib.fontfile), which are read from
+  storage as needed.
 - Drawing converted bitmaps
 - Named color constants
 
@@ -59,7 +66,18 @@ This driver supports:
 """
 
 from math import sin, cos, floor, pi, sqrt, pow
-import framebuf, struct, array
+import framebuf, struct, array, gc
+
+try:
+    import _thread
+except ImportError:
+    _thread = None
+
+# optional, lets drivers skip initializing a panel that the last app already set up
+try:
+    from lib import displaysession
+except ImportError:
+    displaysession = None
 
 #
 # This allows sphinx to build the docs
@@ -155,6 +173,31 @@ _BIT2 = const(0x04)
 _BIT1 = const(0x02)
 _BIT0 = const(0x01)
 
+# height of the horizontal bands used to track changed (dirty) areas of the framebuffer
+_DIRTY_BAND_HEIGHT = const(8)
+_DIRTY_BAND_SHIFT = const(3)
+
+# number of lines in the ST7789's frame memory, along its hardware scrolling axis
+_ST7789_SCROLL_LINES = const(320)
+
+# fixed-point polygon transforms
+_FIXED_SHIFT = const(12)
+_FIXED_ONE = const(4096)
+_ANGLE_STEPS = const(512)
+_ANGLE_MASK = const(511)
+_QUARTER_TURN = const(128)
+_WARP_SHIFT = const(10)
+_WARP_ONE = const(1024)
+_EASE_STEPS = const(64)
+_EASE_SHIFT = const(4)
+_EASE_MASK = const(15)
+
+# bytes sent per spi.write by the background flush, so the drawing thread can run in between
+_FLUSH_CHUNK_SIZE = const(4096)
+
+# rough size (in bytes) of the objects holding each cached glyph, besides the glyph data
+_GLYPH_OVERHEAD = const(64)
+
 # fmt: off
 
 # Rotation tables
@@ -353,6 +396,112 @@ def ease_in_out_circ(x):
     else:
         return (sqrt(1 - pow(-2 * x + 2, 2)) + 1) / 2
 
+
+# Fixed-point polygon transforms (used by ST7789.polygon):
+# sine table, with _ANGLE_STEPS steps per full turn, scaled by _FIXED_ONE
+_SIN_TABLE = array.array(
+    'h', (round(sin(i * 2 * pi / _ANGLE_STEPS) * _FIXED_ONE) for i in range(_ANGLE_STEPS))
+    )
+# easing curves for the warp, sampled at _EASE_STEPS + 1 points (plus one spare for interpolation), scaled by _WARP_ONE
+_EASE_SINE_TABLE = array.array(
+    'h', (round(ease_in_out_sine(min(i, _EASE_STEPS) / _EASE_STEPS) * _WARP_ONE) for i in range(_EASE_STEPS + 2))
+    )
+_EASE_CIRC_TABLE = array.array(
+    'h', (round(ease_in_out_circ(min(i, _EASE_STEPS) / _EASE_STEPS) * _WARP_ONE) for i in range(_EASE_STEPS + 2))
+    )
+
+@micropython.viper
+def _affine_points(src, dst, count:int, matrix):
+    """
+    Apply a fixed-point affine matrix (a, b, c, d, tx, ty), scaled by _FIXED_ONE,
+    to count values of an array('h') of points. src and dst may be the same array.
+    """
+    source = ptr16(src)
+    dest = ptr16(dst)
+    mat = ptr32(matrix)
+    a = mat[0]
+    b = mat[1]
+    c = mat[2]
+    d = mat[3]
+    tx = mat[4]
+    ty = mat[5]
+    i = 0
+    while i < count:
+        # sign-extend the 16 bit values
+        px = source[i]
+        if px & 0x8000:
+            px -= 0x10000
+        py = source[i + 1]
+        if py & 0x8000:
+            py -= 0x10000
+        dest[i] = (a * px + b * py + tx) >> _FIXED_SHIFT
+        dest[i + 1] = (c * px + d * py + ty) >> _FIXED_SHIFT
+        i += 2
+
+@micropython.viper
+def _warp_fixed(points, count:int, params, sine_table, circ_table):
+    """
+    Fixed-point version of warp_points, working in place on count values of an array('h').
+    params is (smallest, largest, tilt_center, focus_center_x, reciprocal),
+    where tilt_center is scaled by _WARP_ONE, and reciprocal is (1 << 16) // (largest - smallest).
+    """
+    pts = ptr16(points)
+    prm = ptr32(params)
+    sine = ptr16(sine_table)
+    circ = ptr16(circ_table)
+    smallest = prm[0]
+    largest = prm[1]
+    span = largest - smallest
+    focus = prm[3]
+    reciprocal = prm[4]
+    new_midpoint = span * prm[2]
+    temp_largest = (span << _WARP_SHIFT) - new_midpoint
+    base = smallest << _WARP_SHIFT
+    
+    i = 1
+    while i < count:
+        py = pts[i]
+        if py & 0x8000:
+            py -= 0x10000
+        adj_point = py - smallest
+        
+        # factor (0 - _WARP_ONE) within the lower or upper half, eased with the sine table
+        if py + py < smallest + largest:
+            factor = ((adj_point << (_WARP_SHIFT + 1)) * reciprocal) >> 16
+        else:
+            factor = (((adj_point << 1) - span) * reciprocal << _WARP_SHIFT) >> 16
+        if factor < 0:
+            factor = 0
+        elif factor > _WARP_ONE:
+            factor = _WARP_ONE
+        idx = factor >> _EASE_SHIFT
+        eased = sine[idx]
+        eased += ((sine[idx + 1] - eased) * (factor & _EASE_MASK)) >> _EASE_SHIFT
+        
+        if py + py < smallest + largest:
+            value = ((new_midpoint * eased) >> _WARP_SHIFT) + base
+        else:
+            value = ((temp_largest * eased) >> _WARP_SHIFT) + new_midpoint + base
+        
+        if focus:
+            # apply the effect more strongly to points nearer to the center x
+            px = pts[i - 1]
+            if px & 0x8000:
+                px -= 0x10000
+            x_factor = ((px - smallest) << 1) - span
+            if x_factor < 0:
+                x_factor = 0 - x_factor
+            x_factor = ((x_factor << _WARP_SHIFT) * reciprocal) >> 16
+            if x_factor > _WARP_ONE:
+                x_factor = _WARP_ONE
+            idx = x_factor >> _EASE_SHIFT
+            eased = circ[idx]
+            eased += ((circ[idx + 1] - eased) * (x_factor & _EASE_MASK)) >> _EASE_SHIFT
+            value = ((py << _WARP_SHIFT) * eased + value * (_WARP_ONE - eased)) >> _WARP_SHIFT
+        
+        pts[i] = value >> _WARP_SHIFT
+        i += 2
+
 class ST7789:
     """
     ST7789 driver class
@@ -386,6 +535,8 @@ class ST7789:
           - ((width, height, xstart, ystart, madctl, needs_swap), ...)
           
         reserved_bytearray (bytearray): pre-allocated bytearray to use for framebuffer
+        
+        glyph_cache_size (int): memory budget (in bytes) for glyphs cached by bitmap_text
 
     """
 
@@ -402,7 +553,8 @@ class ST7789:
         color_order=BGR,
         custom_init=None,
         custom_rotations=None,
-        reserved_bytearray = None
+        reserved_bytearray = None,
+        glyph_cache_size=8192,
     ):
         """
         Initialize display.
@@ -422,6 +574,7 @@ class ST7789:
         #init the fbuf
         if reserved_bytearray == None:
             reserved_bytearray = bytearray(height*width*2)
+        self._fbuf_mv = memoryview(reserved_bytearray)
             
         if rotation == 1 or rotation == 3:
             self.fbuf = framebuf.FrameBuffer(reserved_bytearray, height, width, framebuf.RGB565)
@@ -438,16 +591,55 @@ class ST7789:
         self.cs = cs
         self.backlight = backlight
         self._rotation = rotation % 4
+        self._hw_scroll = 0
+        # front buffer for show_async (None unless double buffering is enabled)
+        self._front_mv = None
+        self._flushing = False
+        # areas for the flush worker to send (None tells it to stop), and the lock it waits on
+        self._flush_areas = None
+        self._flush_lock = None
         self.color_order = color_order
         self.init_cmds = custom_init or _ST7789_INIT_CMDS
-        self.hard_reset()
-        # yes, twice, once is not always enough
-        self.init(self.init_cmds)
-        self.init(self.init_cmds)
-        self.rotation(self._rotation)
+        resuming = displaysession is not None and displaysession.take_over(self, custom_init)
+        if not resuming:
+            self.hard_reset()
+            # yes, twice, once is not always enough
+            self.init(self.init_cmds)
+            self.init(self.init_cmds)
+            self.rotation(self._rotation)
+            if displaysession is not None:
+                displaysession.save(self, custom_init)
         self.needs_swap = True
+        
+        # dirty x range for each horizontal band of the framebuffer, (-1 means clean)
+        num_bands = (max(width, height) + _DIRTY_BAND_HEIGHT - 1) >> _DIRTY_BAND_SHIFT
+        self._dirty_x0 = array.array('h', (-1 for _ in range(num_bands)))
+        self._dirty_x1 = array.array('h', (-1 for _ in range(num_bands)))
+        
+        # bitmap_text glyph cache, {font: {codepoint: [FrameBuffer, last_used]}}
+        self._glyph_cache = {}
+        self._glyph_cache_used = 0
+        self._glyph_tick = 0
+        self._glyph_palette = framebuf.FrameBuffer(bytearray(4), 2, 1, framebuf.RGB565)
+        self.glyph_cache_size = glyph_cache_size
+        self.glyph_cache_hits = 0
+        self.glyph_cache_misses = 0
+        
+        # reusable scratch buffer for bitmap_text_colors
+        self._line_buffer = bytearray(0)
+        
+        # reusable buffers for polygon transforms
+        self._poly_scratch = array.array('h')
+        self._poly_matrix = array.array('i', (0 for _ in range(6)))
+        self._warp_params = array.array('i', (0 for _ in range(5)))
+        
+        # glyph atlases for converted true-type fonts, {font: {character: (FrameBuffer, width)}}
+        self._font_atlases = {}
+        
         self.fill(0x0)
-        self.show()
+        if not resuming:
+            self.show()
+        # (when resuming, the existing image stays up until the first show() replaces it)
 
         if backlight is not None:
             backlight.value(1)
@@ -463,6 +655,7 @@ class ST7789:
         """
         Initialize display.
         """
+        self.wait_flush()
         for command, data, delay in commands:
             self._write(command, data)
             sleep_ms(delay)
@@ -484,6 +677,9 @@ class ST7789:
         """
         Hard reset display.
         """
+        self.wait_flush()
+        if displaysession is not None:
+            displaysession.end()
         if self.cs:
             self.cs.off()
         if self.reset:
@@ -502,6 +698,9 @@ class ST7789:
         """
         Soft reset display.
         """
+        self.wait_flush()
+        if displaysession is not None:
+            displaysession.end()
         self._write(_ST7789_SWRESET)
         sleep_ms(150)
 
@@ -513,7 +712,11 @@ class ST7789:
             value (bool): if True enable sleep mode. if False disable sleep
             mode
         """
+        self.wait_flush()
         if value:
+            if displaysession is not None:
+                # the next driver will need to wake the panel up again
+                displaysession.end()
             self._write(_ST7789_SLPIN)
         else:
             self._write(_ST7789_SLPOUT)
@@ -526,6 +729,10 @@ class ST7789:
             value (bool): if True enable inversion mode. if False disable
             inversion mode
         """
+        self.wait_flush()
+        if displaysession is not None:
+            # differs from the init commands
+            displaysession.end()
         if value:
             self._write(_ST7789_INVON)
         else:
@@ -544,6 +751,9 @@ class ST7789:
 
             custom_rotations can have any number of rotations
         """
+        self.wait_flush()
+        if self._hw_scroll:
+            self.reset_hw_scroll()
         rotation %= len(self.rotations)
         self._rotation = rotation
         (
@@ -561,6 +771,8 @@ class ST7789:
             madctl &= ~_ST7789_MADCTL_BGR
 
         self._write(_ST7789_MADCTL, bytes([madctl]))
+        # the panel always scrolls along its own rows, which are the x axis when rows and columns are exchanged
+        self._scroll_landscape = bool(madctl & _ST7789_MADCTL_MV)
 
     def _set_window(self, x0, y0, x1, y1):
         """
@@ -573,6 +785,16 @@ class ST7789:
             y1 (int): row end address
         """
         if x0 <= x1 <= self.width and y0 <= y1 <= self.height:
+            if self._hw_scroll:
+                # content has been moved by hw_scroll, find where the window is in frame memory
+                if self._scroll_landscape:
+                    x1 -= x0
+                    x0 = (x0 + self._hw_scroll) % self.width
+                    x1 += x0
+                else:
+                    y1 -= y0
+                    y0 = (y0 + self._hw_scroll) % self.height
+                    y1 += y0
             self._write(
                 _ST7789_CASET,
                 struct.pack(_ENCODE_POS, x0 + self.xstart, x1 + self.xstart),
@@ -595,6 +817,7 @@ class ST7789:
         """
         if self.needs_swap:
             color = swap_bytes(color)
+        self.mark_dirty(x, y, 1, length)
         self.fbuf.vline(x, y, length, color)
 
     def hline(self, x, y, length, color):
@@ -609,6 +832,7 @@ class ST7789:
         """
         if self.needs_swap:
             color = swap_bytes(color)
+        self.mark_dirty(x, y, length, 1)
         self.fbuf.hline(x, y, length, color)
 
     def pixel(self, x, y, color):
@@ -622,15 +846,282 @@ class ST7789:
         """
         if self.needs_swap:
             color = swap_bytes(color)
+        self.mark_dirty(x, y, 1, 1)
         self.fbuf.pixel(x,y,color)
         
         
-    def show(self):
+    def mark_dirty(self, x, y, width, height):
         """
-        Write the current framebuf to the display
+        Mark an area of the FrameBuffer as changed, so that it is sent on the next show().
+        
+        All of the drawing methods in this class call this automatically.
+        Call this yourself if you draw to self.fbuf directly.
+
+        Args:
+            x (int): Top left corner x coordinate
+            y (int): Top left corner y coordinate
+            width (int): Width in pixels
+            height (int): Height in pixels
         """
-        self._set_window(0, 0, self.width - 1, self.height - 1)
-        self._write(None, self.fbuf)
+        x1 = x + width - 1
+        y1 = y + height - 1
+        
+        # clip to the display
+        if x < 0:
+            x = 0
+        if y < 0:
+            y = 0
+        if x1 >= self.width:
+            x1 = self.width - 1
+        if y1 >= self.height:
+            y1 = self.height - 1
+        if x > x1 or y > y1:
+            return
+        
+        dirty_x0 = self._dirty_x0
+        dirty_x1 = self._dirty_x1
+        for band in range(y >> _DIRTY_BAND_SHIFT, (y1 >> _DIRTY_BAND_SHIFT) + 1):
+            if dirty_x1[band] == -1:
+                dirty_x0[band] = x
+                dirty_x1[band] = x1
+            else:
+                if x < dirty_x0[band]:
+                    dirty_x0[band] = x
+                if x1 > dirty_x1[band]:
+                    dirty_x1[band] = x1
+        
+        
+    def _show_area(self, x0, y0, x1, y1, fbuf_mv=None):
+        """
+        Send one rectangular area of the FrameBuffer (or the given buffer) to the display.
+        """
+        width = self.width
+        
+        if self._hw_scroll:
+            # areas that wrap around the end of the scrolled frame memory are sent in two parts
+            if self._scroll_landscape:
+                split = width - self._hw_scroll
+                if x0 < split <= x1:
+                    self._send_area(x0, y0, split - 1, y1, fbuf_mv)
+                    x0 = split
+            else:
+                split = self.height - self._hw_scroll
+                if y0 < split <= y1:
+                    self._send_area(x0, y0, x1, split - 1, fbuf_mv)
+                    y0 = split
+        self._send_area(x0, y0, x1, y1, fbuf_mv)
+    
+    def _send_area(self, x0, y0, x1, y1, fbuf_mv=None):
+        """
+        Send a rectangular area of the FrameBuffer (that doesn't wrap around the scrolled frame memory).
+        
+        If fbuf_mv is given, the area is sent from it instead, in chunks of _FLUSH_CHUNK_SIZE.
+        """
+        width = self.width
+        self._set_window(x0, y0, x1, y1)
+        
+        stride = width * 2
+        if fbuf_mv is None:
+            fbuf_mv = self._fbuf_mv
+            chunk = len(fbuf_mv)
+        else:
+            chunk = _FLUSH_CHUNK_SIZE
+        self.dc.on()
+        if x0 == 0 and x1 == width - 1:
+            start = y0 * stride
+            end = (y1 + 1) * stride
+            while start < end:
+                self.spi.write(fbuf_mv[start:min(start + chunk, end)])
+                start += chunk
+        else:
+            start = y0 * stride + x0 * 2
+            row_len = (x1 - x0 + 1) * 2
+            for _ in range(y1 - y0 + 1):
+                self.spi.write(fbuf_mv[start:start + row_len])
+                start += stride
+        if self.cs:
+            self.cs.on()
+        
+        
+    def show(self, full=False):
+        """
+        Write the changed areas of the framebuf to the display.
+        
+        Adjacent changed bands are merged and sent using one window each.
+
+        Args:
+            full (bool): send the entire framebuf, regardless of what has changed.
+        """
+        self.wait_flush()
+        for area in self._take_dirty_areas(full):
+            if self._front_mv is not None:
+                self._copy_to_front(*area)
+            self._show_area(*area)
+    
+    def show_async(self, full=False):
+        """
+        Start writing the changed areas of the framebuf to the display, and return without waiting.
+        
+        With double buffering enabled (see enable_double_buffer), the changed areas are copied to
+        the front buffer, which is sent by the flush worker thread. Drawing can continue on the FrameBuffer
+        in the meantime. Otherwise, this is the same as show().
+        
+        Any previous flush is waited for first.
+
+        Args:
+            full (bool): send the entire framebuf, regardless of what has changed.
+        """
+        if self._front_mv is None:
+            self.show(full)
+            return
+        
+        self.wait_flush()
+        areas = self._take_dirty_areas(full)
+        if not areas:
+            return
+        for area in areas:
+            self._copy_to_front(*area)
+        
+        self._flush_areas = areas
+        self._flushing = True
+        # wake the worker
+        self._flush_lock.release()
+    
+    def wait_flush(self):
+        """
+        Wait until the display update started by show_async has finished.
+        """
+        while self._flushing:
+            sleep_ms(1)
+    
+    def _flush_worker(self, flush_lock):
+        """
+        Runs in its own thread while double buffering is enabled.
+        Sends the front buffer areas given by show_async each time flush_lock is released.
+        """
+        while True:
+            flush_lock.acquire()
+            areas = self._flush_areas
+            if areas is None:
+                return
+            try:
+                front_mv = self._front_mv
+                for area in areas:
+                    self._show_area(*area, front_mv)
+            except Exception as e:
+                # keep the worker alive, so that wait_flush doesn't hang
+                print(f"show_async failed: {e}")
+            self._flushing = False
+    
+    def enable_double_buffer(self, reserved_bytearray=None):
+        """
+        Allocate a front buffer for show_async, which uses as much RAM as the FrameBuffer itself,
+        and start the thread that sends it to the display.
+        
+        Args:
+            reserved_bytearray (bytearray): pre-allocated bytearray to use for the front buffer
+        
+        Returns:
+            bool: True if double buffering is enabled,
+            False if threads aren't available or there isn't enough memory.
+        """
+        if self._front_mv is not None:
+            return True
+        if _thread is None:
+            return False
+        if reserved_bytearray is None:
+            try:
+                reserved_bytearray = bytearray(len(self._fbuf_mv))
+            except MemoryError:
+                return False
+        
+        # the worker waits on this lock, so start with it locked
+        flush_lock = _thread.allocate_lock()
+        flush_lock.acquire()
+        self._flush_areas = None
+        try:
+            _thread.start_new_thread(self._flush_worker, (flush_lock,))
+        except (OSError, MemoryError):
+            return False
+        self._flush_lock = flush_lock
+        
+        # the front buffer must match whatever is already on the display
+        self.show()
+        self._front_mv = memoryview(reserved_bytearray)
+        self._front_mv[:] = self._fbuf_mv
+        return True
+    
+    def disable_double_buffer(self):
+        """
+        Stop using the front buffer (so that it can be freed), and stop the flush worker.
+        """
+        self.wait_flush()
+        if self._flush_lock is not None:
+            self._flush_areas = None
+            self._flush_lock.release()
+            self._flush_lock = None
+        self._front_mv = None
+    
+    def _copy_to_front(self, x0, y0, x1, y1):
+        """
+        Copy a rectangular area of the FrameBuffer into the front buffer.
+        """
+        stride = self.width * 2
+        front_mv = self._front_mv
+        fbuf_mv = self._fbuf_mv
+        if x0 == 0 and x1 == self.width - 1:
+            front_mv[y0 * stride:(y1 + 1) * stride] = fbuf_mv[y0 * stride:(y1 + 1) * stride]
+        else:
+            start = y0 * stride + x0 * 2
+            end = start + (x1 - x0 + 1) * 2
+            for _ in range(y1 - y0 + 1):
+                front_mv[start:end] = fbuf_mv[start:end]
+                start += stride
+                end += stride
+    
+    def _take_dirty_areas(self, full=False):
+        """
+        Return a list of (x0, y0, x1, y1) areas to send to the display, and mark them as clean.
+        
+        Adjacent changed bands are merged into one area.
+        """
+        if full:
+            self.mark_dirty(0, 0, self.width, self.height)
+        
+        areas = []
+        dirty_x0 = self._dirty_x0
+        dirty_x1 = self._dirty_x1
+        num_bands = (self.height + _DIRTY_BAND_HEIGHT - 1) >> _DIRTY_BAND_SHIFT
+        band = 0
+        while band < num_bands:
+            if dirty_x1[band] == -1:
+                band += 1
+                continue
+            
+            # merge this band with any dirty bands directly below it
+            start_band = band
+            x0 = dirty_x0[band]
+            x1 = dirty_x1[band]
+            band += 1
+            while band < num_bands and dirty_x1[band] != -1:
+                if dirty_x0[band] < x0:
+                    x0 = dirty_x0[band]
+                if dirty_x1[band] > x1:
+                    x1 = dirty_x1[band]
+                band += 1
+            
+            y1 = (band << _DIRTY_BAND_SHIFT) - 1
+            if y1 >= self.height:
+                y1 = self.height - 1
+            # a wide area is cheaper to send as full rows (one contiguous write)
+            if (x1 - x0) >= (self.width >> 1):
+                x0 = 0
+                x1 = self.width - 1
+            areas.append((x0, start_band << _DIRTY_BAND_SHIFT, x1, y1))
+        
+        for band in range(num_bands):
+            dirty_x1[band] = -1
+        return areas
         
         
     def blit_buffer(self, buffer, x, y, width, height, key=-1, palette=None):
@@ -646,9 +1137,10 @@ class ST7789:
             key (int): color to be considered transparent
             palette (framebuf): the color pallete to use for the buffer
         """
+        self.mark_dirty(x, y, width, height)
         self.fbuf.blit(framebuf.FrameBuffer(buffer,width, height, framebuf.RGB565), x,y,key,palette)
         
-    def blit_framebuf(self, fbuf, x, y, key=-1, palette=None):
+    def blit_framebuf(self, fbuf, x, y, key=-1, palette=None, width=None, height=None):
         """
         Copy FrameBuffer to internal FrameBuffer at the given location.
         
@@ -660,12 +1152,18 @@ class ST7789:
             fbuf (bytes): Data to copy to display
             x (int): Top left corner x coordinate
             Y (int): Top left corner y coordinate
-            width (int): Width
-            height (int): Height
-            buffer_format (framebuf format): the color format to use for the blit function. 
             key (int): color to be considered transparent
             palette (framebuf): the color pallete to use for the buffer
-        """
+            width (int): Width of fbuf. Optional, used to limit the area sent on show()
+            height (int): Height of fbuf. Optional, used to limit the area sent on show()
+        """
+        # FrameBuffer objects don't expose their size,
+        # so without a given size everything right and below x,y is marked as changed
+        self.mark_dirty(
+            x, y,
+            self.width - x if width == None else width,
+            self.height - y if height == None else height,
+            )
         self.fbuf.blit(fbuf, x,y,key,palette)
 
     def rect(self, x, y, w, h, color, fill=False):
@@ -681,6 +1179,7 @@ class ST7789:
         """
         if self.needs_swap:
             color = swap_bytes(color)
+        self.mark_dirty(x, y, w, h)
         self.fbuf.rect(x,y,w,h,color,fill)
         
     def ellipse(self, x, y, xr, yr, color, fill=False):
@@ -697,6 +1196,7 @@ class ST7789:
         """
         if self.needs_swap:
             color = swap_bytes(color)
+        self.mark_dirty(x - xr, y - yr, xr * 2 + 1, yr * 2 + 1)
         self.fbuf.ellipse(x,y,xr,yr,color,fill)
 
     def fill_rect(self, x, y, width, height, color):
@@ -724,6 +1224,7 @@ class ST7789:
         """
         if self.needs_swap:
             color = swap_bytes(color)
+        self.mark_dirty(0, 0, self.width, self.height)
         self.fbuf.fill(color)
 
     def line(self, x0, y0, x1, y1, color):
@@ -739,6 +1240,7 @@ class ST7789:
         """
         if self.needs_swap:
             color = swap_bytes(color)
+        self.mark_dirty(min(x0, x1), min(y0, y1), abs(x1 - x0) + 1, abs(y1 - y0) + 1)
         self.fbuf.line(x0, y0, x1, y1, color)
 
     def vscrdef(self, tfa, vsa, bfa):
@@ -756,6 +1258,7 @@ class ST7789:
             vsa (int): Vertical Scrolling Area
             bfa (int): Bottom Fixed Area
         """
+        self.wait_flush()
         self._write(_ST7789_VSCRDEF, struct.pack(">HHH", tfa, vsa, bfa))
 
     def vscsad(self, vssa):
@@ -775,8 +1278,70 @@ class ST7789:
             vssa (int): Vertical Scrolling Start Address
 
         """
+        self.wait_flush()
         self._write(_ST7789_VSCSAD, struct.pack(">H", vssa))
 
+    def hw_scroll(self, step):
+        """
+        Scroll the whole display using the panel's hardware scrolling (VSCRDEF/VSCSAD).
+        
+        The panel scrolls along its own rows, which is the x axis in landscape rotations,
+        and the y axis in portrait rotations. Positive steps move the content toward 0.
+        
+        The FrameBuffer is shifted to match, so drawing coordinates stay the same.
+        Only the newly exposed strip is marked as changed, so the next show() sends just that strip.
+        The exposed strip still holds old content, and should be drawn before calling show().
+
+        Args:
+            step (int): pixels to scroll by
+
+        Returns:
+            tuple: (x, y, width, height) of the newly exposed strip
+        """
+        # anything drawn before scrolling must reach the panel at its old position
+        self.show()
+        
+        if self._scroll_landscape:
+            span = self.width
+            start = self.xstart
+        else:
+            span = self.height
+            start = self.ystart
+        
+        if step >= span or step <= -span:
+            step %= span
+            exposed = (0, span)
+        elif step > 0:
+            exposed = (span - step, step)
+        else:
+            exposed = (0, -step)
+        
+        self._hw_scroll = (self._hw_scroll + step) % span
+        self.vscrdef(start, span, _ST7789_SCROLL_LINES - start - span)
+        self.vscsad(start + self._hw_scroll)
+        
+        if self._scroll_landscape:
+            xstep, ystep = -step, 0
+            exposed = (exposed[0], 0, exposed[1], self.height)
+        else:
+            xstep, ystep = 0, -step
+            exposed = (0, exposed[0], self.width, exposed[1])
+        self.fbuf.scroll(xstep, ystep)
+        if self._front_mv is not None:
+            # keep the front buffer matching the display
+            framebuf.FrameBuffer(self._front_mv, self.width, self.height, framebuf.RGB565).scroll(xstep, ystep)
+        self.mark_dirty(*exposed)
+        return exposed
+    
+    def reset_hw_scroll(self):
+        """
+        Undo any hardware scrolling, and mark the whole FrameBuffer to be sent again.
+        """
+        self.wait_flush()
+        self._hw_scroll = 0
+        self.vscsad(self.xstart if self._scroll_landscape else self.ystart)
+        self.mark_dirty(0, 0, self.width, self.height)
+
     def scroll(self,xstep,ystep):
         """
         Shift the contents of the FrameBuffer by the given vector.
@@ -786,148 +1351,151 @@ class ST7789:
         this method scrolls the framebuffer itself.
         This is a wrapper for the framebuffer.scroll method:
         """
+        self.mark_dirty(0, 0, self.width, self.height)
         self.fbuf.scroll(xstep,ystep)
 
-    @micropython.viper
-    @staticmethod
-    def _pack8(glyphs, idx: uint, fg_color: uint, bg_color: uint):
-        buffer = bytearray(128)
-        bitmap = ptr16(buffer)
-        glyph = ptr8(glyphs)
-
-        for i in range(0, 64, 8):
-            byte = glyph[idx]
-            bitmap[i] = fg_color if byte & _BIT7 else bg_color
-            bitmap[i + 1] = fg_color if byte & _BIT6 else bg_color
-            bitmap[i + 2] = fg_color if byte & _BIT5 else bg_color
-            bitmap[i + 3] = fg_color if byte & _BIT4 else bg_color
-            bitmap[i + 4] = fg_color if byte & _BIT3 else bg_color
-            bitmap[i + 5] = fg_color if byte & _BIT2 else bg_color
-            bitmap[i + 6] = fg_color if byte & _BIT1 else bg_color
-            bitmap[i + 7] = fg_color if byte & _BIT0 else bg_color
-            idx += 1
-
-        return buffer
-
-    @micropython.viper
-    @staticmethod
-    def _pack16(glyphs, idx: uint, fg_color: uint, bg_color: uint):
+    def _trim_glyph_cache(self):
         """
-        Pack a character into a byte array.
-
-        Args:
-            char (str): character to pack
-
-        Returns:
-            128 bytes: character bitmap in color565 format
+        Remove the least recently used glyphs until the glyph cache is well within its budget.
         """
+        entries = []
+        for font, cache in self._glyph_cache.items():
+            for ch, entry in cache.items():
+                entries.append((entry[1], font, ch))
+        entries.sort(key=lambda entry: entry[0])
+        
+        target = self.glyph_cache_size * 3 // 4
+        for _, font, ch in entries:
+            if self._glyph_cache_used <= target:
+                break
+            del self._glyph_cache[font][ch]
+            self._glyph_cache_used -= (font.WIDTH >> 3) * font.HEIGHT + _GLYPH_OVERHEAD
 
-        buffer = bytearray(256)
-        bitmap = ptr16(buffer)
-        glyph = ptr8(glyphs)
+    def clear_glyph_cache(self):
+        """
+        Free all the glyphs stored by bitmap_text.
+        """
+        self._glyph_cache = {}
+        self._glyph_cache_used = 0
 
-        for i in range(0, 128, 16):
-            byte = glyph[idx]
-
-            bitmap[i] = fg_color if byte & _BIT7 else bg_color
-            bitmap[i + 1] = fg_color if byte & _BIT6 else bg_color
-            bitmap[i + 2] = fg_color if byte & _BIT5 else bg_color
-            bitmap[i + 3] = fg_color if byte & _BIT4 else bg_color
-            bitmap[i + 4] = fg_color if byte & _BIT3 else bg_color
-            bitmap[i + 5] = fg_color if byte & _BIT2 else bg_color
-            bitmap[i + 6] = fg_color if byte & _BIT1 else bg_color
-            bitmap[i + 7] = fg_color if byte & _BIT0 else bg_color
-            idx += 1
-
-            byte = glyph[idx]
-            bitmap[i + 8] = fg_color if byte & _BIT7 else bg_color
-            bitmap[i + 9] = fg_color if byte & _BIT6 else bg_color
-            bitmap[i + 10] = fg_color if byte & _BIT5 else bg_color
-            bitmap[i + 11] = fg_color if byte & _BIT4 else bg_color
-            bitmap[i + 12] = fg_color if byte & _BIT3 else bg_color
-            bitmap[i + 13] = fg_color if byte & _BIT2 else bg_color
-            bitmap[i + 14] = fg_color if byte & _BIT1 else bg_color
-            bitmap[i + 15] = fg_color if byte & _BIT0 else bg_color
-            idx += 1
-
-        return buffer
-
-    def _text8(self, font, text, x0, y0, fg_color=WHITE):
-        """
-        Internal method to write characters with width of 8 and
-        heights of 8 or 16.
+    def _text_glyphs(self, font, text, x0, y0, fg_color=WHITE):
+        """
+        Internal method to draw characters from an 8 or 16 bit wide bitmap font.
+        
+        Glyphs are copied from the font into small MONO_HLSB FrameBuffers the first time they are used,
+        and stored in an LRU cache. The color is applied by the blit palette,
+        so one cached glyph serves every color.
 
         Args:
             font (module): font module to use
             text (str): text to write
             x0 (int): column to start drawing at
             y0 (int): row to start drawing at
-            color (int): 565 encoded color to use for characters
+            fg_color (int): 565 encoded color to use for characters
         """
         if fg_color == 0:
             bg_color = 1
         else:
             bg_color = 0
-            
+        palette = self._glyph_palette
+        palette.pixel(0, 0, bg_color)
+        palette.pixel(1, 0, fg_color)
+        
+        cache = self._glyph_cache.get(font)
+        if cache is None:
+            cache = {}
+            self._glyph_cache[font] = cache
+        
+        width = font.WIDTH
+        height = font.HEIGHT
+        first = font.FIRST
+        last = font.LAST
+        glyph_size = (width >> 3) * height
+        fbuf = self.fbuf
+        self._glyph_tick += 1
+        tick = self._glyph_tick
+        
         for char in text:
+            if x0 > self.width:
+                break
             ch = ord(char)
-            if (
-                font.FIRST <= ch < font.LAST
-                and x0 <= self.width
-                and y0 <= self.height
-            ):
-                if font.HEIGHT == 8:
-                    passes = 1
-                    size = 8
-                    each = 0
+            if first <= ch < last:
+                entry = cache.get(ch)
+                if entry is None:
+                    self.glyph_cache_misses += 1
+                    idx = (ch - first) * glyph_size
+                    entry = [
+                        framebuf.FrameBuffer(
+                            bytearray(font.FONT[idx:idx + glyph_size]), width, height, framebuf.MONO_HLSB
+                            ),
+                        tick,
+                        ]
+                    cache[ch] = entry
+                    self._glyph_cache_used += glyph_size + _GLYPH_OVERHEAD
+                    if self._glyph_cache_used > self.glyph_cache_size:
+                        self._trim_glyph_cache()
                 else:
-                    passes = 2
-                    size = 16
-                    each = 8
-
-                for line in range(passes):
-                    idx = (ch - font.FIRST) * size + (each * line)
-                    buffer = self._pack8(font.FONT, idx, fg_color, bg_color)
-                    self.blit_buffer(buffer, x0, y0 + 8 * line, 8, 8,key=bg_color)
-
-                x0 += 8
+                    self.glyph_cache_hits += 1
+                    entry[1] = tick
+                
+                fbuf.blit(entry[0], x0, y0, bg_color, palette)
+            x0 += width
 
-    def _text16(self, font, text, x0, y0, fg_color=WHITE):
+    @micropython.viper
+    @staticmethod
+    def _pack_line(
+            buffer, glyphs, codes, colors, start: int, end: int,
+            char_width: int, height: int, first: int, last: int, bg_color: int, swap: int):
         """
-        Internal method to draw characters with width of 16 and heights of 16
-        or 32.
+        Rasterize a line of characters, each with their own color, into an RGB565 buffer.
 
         Args:
-            font (module): font module to use
-            text (str): text to write
-            x0 (int): column to start drawing at
-            y0 (int): row to start drawing at
-            color (int): 565 encoded color to use for characters
+            buffer (bytearray): buffer to draw into, at least (end - start) * char_width * height * 2 bytes
+            glyphs (memoryview): the FONT data from the font module
+            codes (bytes): character codes to draw
+            colors (array('H')): 565 encoded color for each character code
+            start (int): index of the first character to draw
+            end (int): index after the last character to draw
+            swap (int): byte swap the colors if True
         """
-        if fg_color == 0:
-            bg_color = 1
-        else:
-            bg_color = 0
-        for char in text:
-            ch = ord(char)
-            if (
-                font.FIRST <= ch < font.LAST
-                and x0 <= self.width
-                and y0 <= self.height
-            ):
-                each = 16
-                if font.HEIGHT == 16:
-                    passes = 2
-                    size = 32
-                else:
-                    passes = 4
-                    size = 64
-
-                for line in range(passes):
-                    idx = (ch - font.FIRST) * size + (each * line)
-                    buffer = self._pack16(font.FONT, idx, fg_color, bg_color)
-                    self.blit_buffer(buffer, x0, y0 + 8 * line, 16, 8,key=bg_color)
-            x0 += 16
+        bitmap = ptr16(buffer)
+        glyph = ptr8(glyphs)
+        code = ptr8(codes)
+        color = ptr16(colors)
+        row_bytes = char_width >> 3
+        glyph_size = row_bytes * height
+        line_width = (end - start) * char_width
+
+        for i in range(start, end):
+            fg_color = int(color[i])
+            if swap:
+                fg_color = ((fg_color & 0xFF) << 8) | (fg_color >> 8)
+            ch = int(code[i])
+            x = (i - start) * char_width
+
+            if ch >= first and ch < last:
+                idx = (ch - first) * glyph_size
+                for row in range(height):
+                    px = row * line_width + x
+                    for _ in range(row_bytes):
+                        byte = int(glyph[idx])
+                        bitmap[px] = fg_color if byte & _BIT7 else bg_color
+                        bitmap[px + 1] = fg_color if byte & _BIT6 else bg_color
+                        bitmap[px + 2] = fg_color if byte & _BIT5 else bg_color
+                        bitmap[px + 3] = fg_color if byte & _BIT4 else bg_color
+                        bitmap[px + 4] = fg_color if byte & _BIT3 else bg_color
+                        bitmap[px + 5] = fg_color if byte & _BIT2 else bg_color
+                        bitmap[px + 6] = fg_color if byte & _BIT1 else bg_color
+                        bitmap[px + 7] = fg_color if byte & _BIT0 else bg_color
+                        px += 8
+                        idx += 1
+            else:
+                # character not in font, leave it blank
+                for row in range(height):
+                    px = row * line_width + x
+                    for _ in range(char_width):
+                        bitmap[px] = bg_color
+                        px += 1
 
     def text(self, text, x, y, color=WHITE):
         """
@@ -943,6 +1511,7 @@ class ST7789:
         """
         if self.needs_swap:
             color = swap_bytes(color)
+        self.mark_dirty(x, y, len(text) * 8, 8)
         self.fbuf.text(text, x, y, color)
 
     def bitmap_text(self, font, text, x0, y0, color=WHITE):
@@ -957,13 +1526,72 @@ class ST7789:
             y0 (int): row to start drawing at
             color (int): 565 encoded color to use for characters
         """
+        if hasattr(font, "get"):
+            # binary font files (lib.fontfile) provide their own glyphs
+            self.write(font, text, x0, y0, color)
+            return
+        
         if self.needs_swap:
             color=swap_bytes(color)
+        
+        self.mark_dirty(x0, y0, len(text) * font.WIDTH, font.HEIGHT)
+        self._text_glyphs(font, text, x0, y0, color)
 
-        if font.WIDTH == 8:
-            self._text8(font, text, x0, y0, color)
-        else:
-            self._text16(font, text, x0, y0, color)
+    def bitmap_text_colors(self, font, text, x0, y0, colors):
+        """
+        Draw text on display, giving each character its own color. 8 and 16 bit wide
+        fonts are supported.
+        
+        The visible part of the string is rasterized into a reusable line buffer and blitted at once,
+        which is much faster than drawing the characters one at a time.
+
+        Args:
+            font (module): font module to use.
+            text (str): text to write
+            x0 (int): column to start drawing at
+            y0 (int): row to start drawing at
+            colors (array('H')): 565 encoded color for each character in text.
+                This may be longer than text; extra colors are ignored.
+        """
+        char_width = font.WIDTH
+        height = font.HEIGHT
+        
+        # only rasterize the characters that land on the display
+        start = 0 if x0 >= 0 else (-x0) // char_width
+        end = len(text)
+        max_end = (self.width - x0 + char_width - 1) // char_width
+        if max_end < end:
+            end = max_end
+        if start >= end:
+            return
+        x0 += start * char_width
+        
+        codes = text.encode()
+        if len(codes) != len(text):
+            # multi-byte characters must still take exactly one place each
+            codes = bytes(ord(char) if ord(char) < 256 else 0 for char in text)
+        
+        # find a transparent color that isn't used by the text
+        key = 0
+        while key in colors:
+            key += 1
+        if self.needs_swap:
+            key = swap_bytes(key)
+        
+        line_width = (end - start) * char_width
+        buffer_size = line_width * height * 2
+        if len(self._line_buffer) < buffer_size:
+            self._line_buffer = bytearray(buffer_size)
+        
+        self._pack_line(
+            self._line_buffer, font.FONT, codes, colors, start, end,
+            char_width, height, font.FIRST, font.LAST, key, self.needs_swap,
+            )
+        self.mark_dirty(x0, y0, line_width, height)
+        self.fbuf.blit(
+            framebuf.FrameBuffer(self._line_buffer, line_width, height, framebuf.RGB565),
+            x0, y0, key,
+            )
 
     def bitmap(self, bitmap, x, y, index=0, key=-1):
         """
@@ -1082,34 +1710,64 @@ class ST7789:
         """
         if self.needs_swap:
             fg = swap_bytes(fg)
+        if fg == 0:
+            bg = 1
+        else:
+            bg = 0
+        palette = self._glyph_palette
+        palette.pixel(0, 0, bg)
+        palette.pixel(1, 0, fg)
+        
+        glyphs = self.load_font_atlas(font)
+        if glyphs is None:
+            # not enough memory for the whole font, just unpack the glyphs we need this time
+            try:
+                glyphs = self._build_font_atlas(font, set(string))
+            except MemoryError:
+                # not even that, so draw one glyph at a time
+                self._write_glyphs(font, string, x, y, bg, palette)
+                return
+        
+        height = font.HEIGHT
+        fbuf = self.fbuf
+        for character in string:
+            glyph = glyphs.get(character)
+            if glyph is None:
+                print("write: a char used doesn't exist in the font")
+                continue
             
+            self.mark_dirty(x, y, glyph[1], height)
+            fbuf.blit(glyph[0], x, y, bg, palette)
+            x += glyph[1]
+
+    def _write_glyphs(self, font, string, x, y, bg, palette):
+        """
+        Draw a string in a converted true-type font, unpacking one glyph at a time into a single small buffer.
+        This is slower than using an atlas, but only needs enough memory for the widest glyph.
+        """
+        height = font.HEIGHT
+        widths = font.WIDTHS
+        offsets = font.OFFSETS
+        offset_width = font.OFFSET_WIDTH
+        stride = (font.MAX_WIDTH + 7) >> 3
+        buffer = bytearray(stride * height)
+        fbuf = self.fbuf
         for character in string:
-            try:
-                char_index = font.MAP.index(character)
-                offset = char_index * font.OFFSET_WIDTH
-                bs_bit = font.OFFSETS[offset]
-                
-                if font.OFFSET_WIDTH > 2:
-                    bs_bit = (bs_bit << 8) + font.OFFSETS[offset + 2]
-                elif font.OFFSET_WIDTH > 1:
-                    bs_bit = (bs_bit << 8) + font.OFFSETS[offset + 1]
-                
-                char_width = font.WIDTHS[char_index]
-                buffer_needed = char_width * font.HEIGHT
-                
-                for i in range(0, buffer_needed):
-                    px_x = x + ((i) % char_width)
-                    px_y = y + ((i) // char_width)
-                    if font.BITMAPS[bs_bit // 8] & 1 << (7 - (bs_bit % 8)) > 0:
-                        self.fbuf.pixel(px_x,px_y,fg)
-                    
-                    bs_bit += 1
-
-                x += char_width
-
-            except ValueError:
-                print("ValueError in write; probably because a char used doesn't exists in the font")
-                pass
+            idx = font.MAP.find(character)
+            if idx == -1:
+                print("write: a char used doesn't exist in the font")
+                continue
+            bs_bit = 0
+            for i in range(idx * offset_width, (idx + 1) * offset_width):
+                bs_bit = (bs_bit << 8) + offsets[i]
+            width = widths[idx]
+            
+            glyph = framebuf.FrameBuffer(buffer, width, height, framebuf.MONO_HLSB, stride << 3)
+            glyph.fill(0)
+            self._unpack_glyph(buffer, stride, 0, font.BITMAPS, bs_bit, width, height)
+            self.mark_dirty(x, y, width, height)
+            fbuf.blit(glyph, x, y, bg, palette)
+            x += width
 
     def write_width(self, font, string):
         """
@@ -1124,16 +1782,128 @@ class ST7789:
             int: The width of the string in pixels
 
         """
+        atlas = self._font_atlases.get(font)
         width = 0
         for character in string:
-            try:
-                char_index = font.MAP.index(character)
-                width += font.WIDTHS[char_index]
-            except ValueError:
-                pass
+            if atlas is not None:
+                glyph = atlas.get(character)
+                if glyph is not None:
+                    width += glyph[1]
+            else:
+                char_index = font.MAP.find(character)
+                if char_index != -1:
+                    width += font.WIDTHS[char_index]
 
         return width
     
+    def load_font_atlas(self, font):
+        """
+        Get the glyph atlas for a converted true-type font, building it if needed.
+        
+        If there isn't enough memory, other atlases and cached glyphs are dropped to make room.
+        Returns None if the atlas still can't be built.
+        
+        Binary font files (lib.fontfile) read and cache their own glyphs, so they are returned as-is.
+        """
+        if hasattr(font, "get"):
+            return font
+        glyphs = self._font_atlases.get(font)
+        if glyphs is None:
+            try:
+                glyphs = self._build_font_atlas(font)
+            except MemoryError:
+                self.drop_font_atlas()
+                self.clear_glyph_cache()
+                gc.collect()
+                try:
+                    glyphs = self._build_font_atlas(font)
+                except MemoryError:
+                    return None
+            self._font_atlases[font] = glyphs
+        return glyphs
+    
+    def drop_font_atlas(self, font=None):
+        """
+        Free the glyph atlas for the given font (or every font, if None).
+        It will be rebuilt the next time the font is used.
+        """
+        if font is None:
+            self._font_atlases = {}
+        elif font in self._font_atlases:
+            del self._font_atlases[font]
+    
+    def _build_font_atlas(self, font, characters=None):
+        """
+        Expand the glyphs of a converted true-type font into one MONO_HLSB atlas.
+        
+        Each glyph starts on a byte boundary, so that it can be addressed by a
+        FrameBuffer into the atlas (using the atlas width as stride).
+        Returns a dict of {character: (FrameBuffer, width)}.
+        
+        Args:
+            font (module): the converted true-type font
+            characters (set): only include these characters, default is the whole font
+        """
+        height = font.HEIGHT
+        widths = font.WIDTHS
+        offsets = font.OFFSETS
+        offset_width = font.OFFSET_WIDTH
+        
+        indices = []
+        atlas_width = 0
+        for idx, character in enumerate(font.MAP):
+            if characters is None or character in characters:
+                indices.append(idx)
+                atlas_width += (widths[idx] + 7) & ~7
+        if not atlas_width:
+            return {}
+        
+        stride = atlas_width >> 3
+        # an extra row lets glyphs at the end of a row pass FrameBuffer's buffer size check
+        atlas = bytearray(stride * (height + 1))
+        atlas_mv = memoryview(atlas)
+        
+        glyphs = {}
+        byte_x = 0
+        for idx in indices:
+            bs_bit = 0
+            for i in range(idx * offset_width, (idx + 1) * offset_width):
+                bs_bit = (bs_bit << 8) + offsets[i]
+            width = widths[idx]
+            
+            self._unpack_glyph(atlas, stride, byte_x, font.BITMAPS, bs_bit, width, height)
+            glyphs[font.MAP[idx]] = (
+                framebuf.FrameBuffer(atlas_mv[byte_x:], width, height, framebuf.MONO_HLSB, atlas_width),
+                width,
+                )
+            byte_x += (width + 7) >> 3
+        return glyphs
+    
+    @micropython.viper
+    @staticmethod
+    def _unpack_glyph(atlas, stride: int, byte_x: int, bitmaps, bs_bit: int, width: int, height: int):
+        """
+        Copy a glyph from a 1 bit per pixel bitstream into a MONO_HLSB atlas.
+
+        Args:
+            atlas (bytearray): the atlas buffer, 'stride' bytes per row
+            stride (int): bytes per atlas row
+            byte_x (int): byte column in the atlas where the glyph starts
+            bitmaps (buffer): font bitmap data
+            bs_bit (int): bit offset of the glyph in bitmaps
+            width (int): glyph width
+            height (int): glyph height
+        """
+        out = ptr8(atlas)
+        bits = ptr8(bitmaps)
+        row = byte_x
+        for y in range(height):
+            for x in range(width):
+                if bits[bs_bit >> 3] & (0x80 >> (bs_bit & 7)):
+                    out[row + (x >> 3)] |= 0x80 >> (x & 7)
+                bs_bit += 1
+            row += stride
+    
     def simple_poly(self,points,x,y,color,fill=False):
         """
         Draw a polygon on the display.
@@ -1146,9 +1916,29 @@ class ST7789:
         """
         if self.needs_swap:
             color = swap_bytes(color)
+        self._mark_points(points, x, y)
         self.fbuf.poly(x,y,points,color,fill)
     
     
+    def _mark_points(self, points, x, y):
+        """
+        Mark the bounding box of an array of points as changed.
+        """
+        min_x = max_x = points[0]
+        min_y = max_y = points[1]
+        for i in range(2, len(points), 2):
+            px = points[i]
+            py = points[i + 1]
+            if px < min_x:
+                min_x = px
+            elif px > max_x:
+                max_x = px
+            if py < min_y:
+                min_y = py
+            elif py > max_y:
+                max_y = py
+        self.mark_dirty(x + min_x, y + min_y, max_x - min_x + 1, max_y - min_y + 1)
+    
     
     def polygon(self, points, x, y, color, angle=0, center_x=None, center_y=None, scale=1, warp=None, fill=False):
         """
@@ -1168,30 +1958,51 @@ class ST7789:
         if angle == 0 and scale == 1 and warp == None:
             if self.needs_swap:
                 color = swap_bytes(color)
+            self._mark_points(points, x, y)
             self.fbuf.poly(x,y,points,color,fill)
         
         #complex polygon
         else:
             if self.needs_swap:
                 color = swap_bytes(color)
-            #clone array so we don't modify original
-            points = array.array('h',points)
+            #transform into the scratch array so we don't modify original
+            count = len(points)
+            if len(self._poly_scratch) < count:
+                self._poly_scratch = array.array('h', (0 for _ in range(count)))
+            transformed = memoryview(self._poly_scratch)[:count]
             
-            #scale
-            if scale != 1:
-                scale_poly(points,scale)
+            if center_x == None or center_y == None:
+                center = floor(max(points) * scale) // 2
+                if center_x == None:
+                    center_x = center
+                if center_y == None:
+                    center_y = center
             
-            if center_x == None:
-                center_x = max(points) // 2
-            if center_y == None:
-                center_y = max(points) // 2
+            #scale, then rotate around the center, as one fixed-point matrix
+            turn = round(angle * _ANGLE_STEPS / (2 * pi)) & _ANGLE_MASK
+            sin_a = _SIN_TABLE[turn]
+            cos_a = _SIN_TABLE[(turn + _QUARTER_TURN) & _ANGLE_MASK]
+            scale = round(scale * _FIXED_ONE)
+            matrix = self._poly_matrix
+            matrix[0] = matrix[3] = (cos_a * scale) >> _FIXED_SHIFT
+            matrix[2] = (sin_a * scale) >> _FIXED_SHIFT
+            matrix[1] = -matrix[2]
+            matrix[4] = (center_x << _FIXED_SHIFT) - cos_a * center_x + sin_a * center_y
+            matrix[5] = (center_y << _FIXED_SHIFT) - sin_a * center_x - cos_a * center_y
+            _affine_points(points, transformed, count, matrix)
             
-            #rotate
-            if angle != 0:
-                points = rotate_points(points, angle, center_x, center_y)
-                
             if warp != None:
-                warp_points(points, warp)
+                smallest = min(transformed)
+                largest = max(transformed)
+                if largest > smallest:
+                    params = self._warp_params
+                    params[0] = smallest
+                    params[1] = largest
+                    params[2] = round(warp * _WARP_ONE)
+                    params[3] = 1
+                    params[4] = 65536 // (largest - smallest)
+                    _warp_fixed(transformed, count, params, _EASE_SINE_TABLE, _EASE_CIRC_TABLE)
             
-            self.fbuf.poly(x,y,points,color,fill)
+            self._mark_points(transformed, x, y)
+            self.fbuf.poly(x,y,transformed,color,fill)
 
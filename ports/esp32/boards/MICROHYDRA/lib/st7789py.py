@@ -34,6 +34,8 @@ This driver supports:
 - Display rotation
 - RGB and BGR color orders
 - Hardware based scrolling
+- Command batching (redundant window commands are skipped, and begin_batch/end_batch
+  keep CS asserted across a sequence of drawing calls)
 - Drawing text using 8 and 16 bit wide bitmap fonts with heights that are
   multiples of 8.  Included are 12 bitmap fonts derived from classic pc
   BIOS text mode fonts.
@@ -82,6 +84,12 @@ except ImportError:
 
 import struct
 
+# optional, lets drivers skip initializing a panel that the last app already set up
+try:
+    from lib import displaysession
+except ImportError:
+    displaysession = None
+
 # ST7789 commands
 _ST7789_SWRESET = b"\x01"
 _ST7789_SLPIN = b"\x10"
@@ -226,6 +234,30 @@ def color565(red, green=0, blue=0):
     return (red & 0xF8) << 8 | (green & 0xFC) << 3 | blue >> 3
 
 
+# lookup tables for converted true-type fonts, keyed by font module
+_FONT_LUTS = {}
+
+
+def font_lut(font):
+    """
+    Return a dict mapping each character of a converted true-type font to its
+    (bitmap bit offset, width). The table is built once per font module.
+    """
+    lut = _FONT_LUTS.get(font)
+    if lut is None:
+        lut = {}
+        offset_width = font.OFFSET_WIDTH
+        offsets = font.OFFSETS
+        widths = font.WIDTHS
+        for idx, character in enumerate(font.MAP):
+            bs_bit = 0
+            for i in range(idx * offset_width, (idx + 1) * offset_width):
+                bs_bit = (bs_bit << 8) + offsets[i]
+            lut[character] = (bs_bit, widths[idx])
+        _FONT_LUTS[font] = lut
+    return lut
+
+
 class ST7789:
     """
     ST7789 driver class
@@ -301,13 +333,32 @@ class ST7789:
         self._rotation = rotation % 4
         self.color_order = color_order
         self.init_cmds = custom_init or _ST7789_INIT_CMDS
-        self.hard_reset()
-        # yes, twice, once is not always enough
-        self.init(self.init_cmds)
-        self.init(self.init_cmds)
-        self.rotation(self._rotation)
+        
+        # preallocated buffers for packing window addresses and pixels
+        self._pos_buf = bytearray(4)
+        self._pixel_buf = bytearray(2)
+        # a _BUFFER_SIZE run of self._fill_color, for fill_rect
+        self._fill_buf = bytearray(_BUFFER_SIZE * 2)
+        self._fill_mv = memoryview(self._fill_buf)
+        self._fill_color = -1
+        # the last CASET/RASET sent to the panel ((start << 16) | end), -1 if unknown
+        self._caset = -1
+        self._raset = -1
+        # nesting depth of begin_batch calls
+        self._batch_depth = 0
+        
+        resuming = displaysession is not None and displaysession.take_over(self, custom_init)
+        if not resuming:
+            self.hard_reset()
+            # yes, twice, once is not always enough
+            self.init(self.init_cmds)
+            self.init(self.init_cmds)
+            self.rotation(self._rotation)
+            if displaysession is not None:
+                displaysession.save(self, custom_init)
         self.needs_swap = False
-        self.fill(0x0)
+        if not resuming:
+            self.fill(0x0)
 
         if backlight is not None:
             backlight.value(1)
@@ -323,27 +374,53 @@ class ST7789:
         """
         Initialize display.
         """
+        self._caset = self._raset = -1
         for command, data, delay in commands:
             self._write(command, data)
             sleep_ms(delay)
 
     def _write(self, command=None, data=None):
         """SPI write to the device: commands and data."""
-        if self.cs:
-            self.cs.off()
+        # CS stays asserted for the whole batch
+        cs = None if self._batch_depth else self.cs
+        if cs:
+            cs.off()
         if command is not None:
             self.dc.off()
             self.spi.write(command)
         if data is not None:
             self.dc.on()
             self.spi.write(data)
-            if self.cs:
+            if cs:
+                cs.on()
+
+    def begin_batch(self):
+        """
+        Start a batch of drawing calls.
+
+        CS is kept asserted until the matching end_batch(), instead of being toggled for every command.
+        Batches can be nested, and most multi-part drawing methods use one internally.
+        """
+        if not self._batch_depth and self.cs:
+            self.cs.off()
+        self._batch_depth += 1
+
+    def end_batch(self):
+        """
+        End a batch of drawing calls started with begin_batch().
+        """
+        if self._batch_depth:
+            self._batch_depth -= 1
+            if not self._batch_depth and self.cs:
                 self.cs.on()
 
     def hard_reset(self):
         """
         Hard reset display.
         """
+        if displaysession is not None:
+            displaysession.end()
+        self._caset = self._raset = -1
         if self.cs:
             self.cs.off()
         if self.reset:
@@ -362,7 +439,10 @@ class ST7789:
         """
         Soft reset display.
         """
+        if displaysession is not None:
+            displaysession.end()
         self._write(_ST7789_SWRESET)
+        self._caset = self._raset = -1
         sleep_ms(150)
 
     def sleep_mode(self, value):
@@ -374,6 +454,9 @@ class ST7789:
             mode
         """
         if value:
+            if displaysession is not None:
+                # the next driver will need to wake the panel up again
+                displaysession.end()
             self._write(_ST7789_SLPIN)
         else:
             self._write(_ST7789_SLPOUT)
@@ -386,6 +469,9 @@ class ST7789:
             value (bool): if True enable inversion mode. if False disable
             inversion mode
         """
+        if displaysession is not None:
+            # differs from the init commands
+            displaysession.end()
         if value:
             self._write(_ST7789_INVON)
         else:
@@ -421,11 +507,16 @@ class ST7789:
             madctl &= ~_ST7789_MADCTL_BGR
 
         self._write(_ST7789_MADCTL, bytes([madctl]))
+        # the address registers are in the old orientation, and the fill buffer may need swapping
+        self._caset = self._raset = -1
+        self._fill_color = -1
 
     def _set_window(self, x0, y0, x1, y1):
         """
         Set window to column and row address.
 
+        CASET and RASET are only sent if they differ from the current window.
+
         Args:
             x0 (int): column start address
             y0 (int): row start address
@@ -433,14 +524,21 @@ class ST7789:
             y1 (int): row end address
         """
         if x0 <= x1 <= self.width and y0 <= y1 <= self.height:
-            self._write(
-                _ST7789_CASET,
-                struct.pack(_ENCODE_POS, x0 + self.xstart, x1 + self.xstart),
-            )
-            self._write(
-                _ST7789_RASET,
-                struct.pack(_ENCODE_POS, y0 + self.ystart, y1 + self.ystart),
-            )
+            pos_buf = self._pos_buf
+            x0 += self.xstart
+            x1 += self.xstart
+            caset = (x0 << 16) | x1
+            if caset != self._caset:
+                self._caset = caset
+                struct.pack_into(_ENCODE_POS, pos_buf, 0, x0, x1)
+                self._write(_ST7789_CASET, pos_buf)
+            y0 += self.ystart
+            y1 += self.ystart
+            raset = (y0 << 16) | y1
+            if raset != self._raset:
+                self._raset = raset
+                struct.pack_into(_ENCODE_POS, pos_buf, 0, y0, y1)
+                self._write(_ST7789_RASET, pos_buf)
             self._write(_ST7789_RAMWR)
 
     def vline(self, x, y, length, color):
@@ -477,12 +575,10 @@ class ST7789:
             color (int): 565 encoded color
         """
         self._set_window(x, y, x, y)
-        self._write(
-            None,
-            struct.pack(
-                _ENCODE_PIXEL_SWAPPED if self.needs_swap else _ENCODE_PIXEL, color
-            ),
+        struct.pack_into(
+            _ENCODE_PIXEL_SWAPPED if self.needs_swap else _ENCODE_PIXEL, self._pixel_buf, 0, color
         )
+        self._write(None, self._pixel_buf)
 
     def blit_buffer(self, buffer, x, y, width, height):
         """
@@ -509,10 +605,12 @@ class ST7789:
             height (int): Height in pixels
             color (int): 565 encoded color
         """
+        self.begin_batch()
         self.hline(x, y, w, color)
         self.vline(x, y, h, color)
         self.vline(x + w - 1, y, h, color)
         self.hline(x, y + h - 1, w, color)
+        self.end_batch()
 
     def fill_rect(self, x, y, width, height, color):
         """
@@ -527,16 +625,19 @@ class ST7789:
         """
         self._set_window(x, y, x + width - 1, y + height - 1)
         chunks, rest = divmod(width * height, _BUFFER_SIZE)
-        pixel = struct.pack(
-            _ENCODE_PIXEL_SWAPPED if self.needs_swap else _ENCODE_PIXEL, color
-        )
+        if color != self._fill_color:
+            # only rebuild the fill buffer when the color changes
+            self._fill_color = color
+            self._fill_buf[:] = struct.pack(
+                _ENCODE_PIXEL_SWAPPED if self.needs_swap else _ENCODE_PIXEL, color
+            ) * _BUFFER_SIZE
         self.dc.on()
         if chunks:
-            data = pixel * _BUFFER_SIZE
+            data = self._fill_buf
             for _ in range(chunks):
                 self._write(None, data)
         if rest:
-            self._write(None, pixel * rest)
+            self._write(None, self._fill_mv[:rest * 2])
 
     def fill(self, color):
         """
@@ -569,6 +670,7 @@ class ST7789:
         dy = abs(y1 - y0)
         err = dx // 2
         ystep = 1 if y0 < y1 else -1
+        self.begin_batch()
         while x0 <= x1:
             if steep:
                 self.pixel(y0, x0, color)
@@ -579,6 +681,7 @@ class ST7789:
                 y0 += ystep
                 err += dx
             x0 += 1
+        self.end_batch()
 
     def vscrdef(self, tfa, vsa, bfa):
         """
@@ -680,6 +783,26 @@ class ST7789:
 
         return buffer
 
+    @micropython.viper
+    @staticmethod
+    def _unpack_bits(buffer, bitmaps, bs_bit: int, pixels: int, fg_color: int, bg_color: int):
+        """
+        Expand a 1 bit per pixel bitstream into color565 pixels, in one pass.
+
+        Args:
+            buffer (bytearray): buffer to write the pixels to
+            bitmaps (buffer): font bitmap data
+            bs_bit (int): bit offset of the first pixel in bitmaps
+            pixels (int): number of pixels to expand
+            fg_color (int): 565 encoded color for set bits, in display byte order
+            bg_color (int): 565 encoded color for clear bits, in display byte order
+        """
+        bitmap = ptr16(buffer)
+        bits = ptr8(bitmaps)
+        for i in range(pixels):
+            bitmap[i] = fg_color if bits[bs_bit >> 3] & (_BIT7 >> (bs_bit & 7)) else bg_color
+            bs_bit += 1
+
     def _text8(self, font, text, x0, y0, fg_color=WHITE, bg_color=BLACK):
         """
         Internal method to write characters with width of 8 and
@@ -772,10 +895,12 @@ class ST7789:
             else ((background << 8) & 0xFF00) | (background >> 8)
         )
 
+        self.begin_batch()
         if font.WIDTH == 8:
             self._text8(font, text, x0, y0, fg_color, bg_color)
         else:
             self._text16(font, text, x0, y0, fg_color, bg_color)
+        self.end_batch()
 
     def bitmap(self, bitmap, x, y, index=0):
         """
@@ -889,6 +1014,7 @@ class ST7789:
         needs_swap = self.needs_swap
         buffer = bytearray(bitmap.WIDTH * 2)
 
+        self.begin_batch()
         for row in range(height):
             for col in range(width):
                 color_index = 0
@@ -911,7 +1037,7 @@ class ST7789:
             if self.width > to_col and self.height > to_row:
                 self._set_window(x, y + row, to_col, to_row)
                 self._write(None, buffer)
-                
+        self.end_batch()
                 
 
             
@@ -928,48 +1054,31 @@ class ST7789:
             fg (int): foreground color, optional, defaults to WHITE
             bg (int): background color, optional, defaults to BLACK
         """
-        buffer_len = font.HEIGHT * font.MAX_WIDTH * 2
-        buffer = bytearray(buffer_len)
-        fg_hi = fg >> 8
-        fg_lo = fg & 0xFF
-
-        bg_hi = bg >> 8
-        bg_lo = bg & 0xFF
+        lut = font_lut(font)
+        height = font.HEIGHT
+        buffer = bytearray(height * font.MAX_WIDTH * 2)
+        buffer_mv = memoryview(buffer)
+        # pixels are sent high byte first
+        fg = ((fg & 0xFF) << 8) | (fg >> 8)
+        bg = ((bg & 0xFF) << 8) | (bg >> 8)
 
+        to_row = y + height - 1
+        self.begin_batch()
         for character in string:
-            try:
-                char_index = font.MAP.index(character)
-                offset = char_index * font.OFFSET_WIDTH
-                bs_bit = font.OFFSETS[offset]
-                if font.OFFSET_WIDTH > 1:
-                    bs_bit = (bs_bit << 8) + font.OFFSETS[offset + 1]
-
-                if font.OFFSET_WIDTH > 2:
-                    bs_bit = (bs_bit << 8) + font.OFFSETS[offset + 2]
-
-                char_width = font.WIDTHS[char_index]
-                buffer_needed = char_width * font.HEIGHT * 2
-
-                for i in range(0, buffer_needed, 2):
-                    if font.BITMAPS[bs_bit // 8] & 1 << (7 - (bs_bit % 8)) > 0:
-                        buffer[i] = fg_hi
-                        buffer[i + 1] = fg_lo
-                    else:
-                        buffer[i] = bg_hi
-                        buffer[i + 1] = bg_lo
-
-                    bs_bit += 1
+            glyph = lut.get(character)
+            if glyph is None:
+                continue
+            bs_bit, char_width = glyph
 
-                to_col = x + char_width - 1
-                to_row = y + font.HEIGHT - 1
-                if self.width > to_col and self.height > to_row:
-                    self._set_window(x, y, to_col, to_row)
-                    self._write(None, buffer[:buffer_needed])
-
-                x += char_width
+            to_col = x + char_width - 1
+            if self.width > to_col and self.height > to_row:
+                pixels = char_width * height
+                self._unpack_bits(buffer, font.BITMAPS, bs_bit, pixels, fg, bg)
+                self._set_window(x, y, to_col, to_row)
+                self._write(None, buffer_mv[: pixels * 2])
 
-            except ValueError:
-                pass
+            x += char_width
+        self.end_batch()
 
     def write_width(self, font, string):
         """
@@ -984,13 +1093,12 @@ class ST7789:
             int: The width of the string in pixels
 
         """
+        lut = font_lut(font)
         width = 0
         for character in string:
-            try:
-                char_index = font.MAP.index(character)
-                width += font.WIDTHS[char_index]
-            except ValueError:
-                pass
+            glyph = lut.get(character)
+            if glyph is not None:
+                width += glyph[1]
 
         return width
 
@@ -1035,6 +1143,7 @@ class ST7789:
         else:
             rotated = [(x + int((point[0])), y + int((point[1]))) for point in points]
 
+        self.begin_batch()
         for i in range(1, len(rotated)):
             self.line(
                 rotated[i - 1][0],
@@ -1043,3 +1152,4 @@ class ST7789:
                 rotated[i][1],
                 color,
             )
+        self.end_batch()
@@ -1,12 +1,24 @@
-import os
+import os, sys, gc
 import machine
 from sys import path
+from lib import displaysession, apploader
 
 #default app path is the path to the launcher
-app_path = '.frozen/launcher/launcher.py'
+_LAUNCHER_PATH = const('.frozen/launcher/launcher.py')
+app_path = _LAUNCHER_PATH
+
+# Apps can be launched without a reset (see launcher.launch_app), 
+# but only if there is at least this much free memory once the previous app is cleaned up.
+_FAST_LAUNCH_MIN_FREE = const(60_000)
+
+rtc = machine.RTC()
+
+# The display can only be taken over from the last app after a machine.reset(), 
+# otherwise it may have lost power (or been reset) since then.
+if machine.reset_cause() != machine.HARD_RESET:
+    displaysession.end()
 
 if machine.reset_cause() != machine.PWRON_RESET: #if this was not a power reset, we are probably launching an app!
-    rtc = machine.RTC()
     app_path = rtc.memory().decode()
     
     # special case for passing data along to an app:
@@ -15,28 +27,69 @@ if machine.reset_cause() != machine.PWRON_RESET: #if this was not a power reset,
         rtc.memory(app_path.replace(paths[0] + "|//|", ""))
         app_path = paths[0]
     else:
-        rtc.memory('.frozen/launcher/launcher.py') # for when we reset again
+        rtc.memory(_LAUNCHER_PATH) # for when we reset again
 
 #add apps directory to PATH
 path.append('/apps')
 
-# only mount the sd card if the app is on the sd card.
-if app_path.startswith("/sd"):
-    sd = machine.SDCard(slot=2, sck=machine.Pin(40), miso=machine.Pin(39), mosi=machine.Pin(14), cs=machine.Pin(12))
-    try:
-        os.mount(sd, '/sd')
-        path.append('/sd/apps')
-    except OSError:
-        with open('log.txt', 'a') as log:
-            log.write(f"Couldn't mount SDCard!\n")
-
-# import the requested app!
-try:
-    __import__(app_path)
-except Exception as e:
-    with open('log.txt', 'a') as log:
-        log.write(f"Tried to launch '{app_path}', but failed: '{e}'\n")
+sd_mounted = False
+launched_in_process = False
+
+while True:
+    # only mount the sd card if the app is on the sd card.
+    if app_path.startswith("/sd") and not sd_mounted:
+        sd = machine.SDCard(slot=2, sck=machine.Pin(40), miso=machine.Pin(39), mosi=machine.Pin(14), cs=machine.Pin(12))
+        try:
+            os.mount(sd, '/sd')
+            path.append('/sd/apps')
+            sd_mounted = True
+        except OSError:
+            with open('log.txt', 'a') as log:
+                log.write(f"Couldn't mount SDCard!\n")
+    
+    # remember what was loaded before the app, so that it can be unloaded again
+    loaded_modules = set(sys.modules)
+    
+    # import the requested app!
     try:
-        __import__('.frozen/launcher/launcher.py')
-    except ImportError:
-        print("Launcher couldn't be imported")
\ No newline at end of file
+        __import__(app_path)
+    except MemoryError:
+        if launched_in_process:
+            # not enough (contiguous) memory left after the last app, try again from a clean boot
+            rtc.memory(app_path)
+            machine.reset()
+        raise
+    except Exception as e:
+        # Importing a file path raises ImportError ('py' isn't a module) after the app has run,
+        # so this is also where we end up when the launcher hands off to another app.
+        if apploader.next_app_path is None:
+            if app_path == _LAUNCHER_PATH:
+                print("Launcher couldn't be imported")
+                break
+            with open('log.txt', 'a') as log:
+                log.write(f"Tried to launch '{app_path}', but failed: '{e}'\n")
+            app_path = _LAUNCHER_PATH
+            continue
+    
+    # The launcher calls apploader.launch_in_process when it wants to launch an app without a reset.
+    # Otherwise, the app has just exited.
+    next_app = apploader.take_next_app()
+    if not next_app:
+        break
+    
+    # unload the previous app, so its memory can be reused
+    for name in list(sys.modules):
+        if name not in loaded_modules:
+            del sys.modules[name]
+    loaded_modules = None
+    gc.collect()
+    
+    if gc.mem_free() < _FAST_LAUNCH_MIN_FREE:
+        # not enough memory, fall back to launching the app with a reset
+        rtc.memory(next_app)
+        machine.reset()
+    
+    # so that calling machine.reset() from the app still returns to the launcher
+    rtc.memory(_LAUNCHER_PATH)
+    app_path = next_app
+    launched_in_process = True
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Convert MicroHydra Python font modules into binary font files (.mhf),
+which can be read with lib/fontfile.py.
+
+Both kinds of font module are supported:
+  - bitmap fonts (WIDTH, HEIGHT, FIRST, LAST, FONT), like font/vga2_16x32.py
+  - converted true-type fonts (MAP, HEIGHT, MAX_WIDTH, WIDTHS, OFFSETS, BITMAPS),
+    like font/NotoSansMono_32.py
+
+usage:
+    python3 fontconvert.py font/vga2_16x32.py [output.mhf]
+"""
+
+import struct
+import sys
+
+MAGIC = b"MHF\x01"
+HEADER_FORMAT = "<4sHHHH"
+
+
+def load_font_module(path):
+    """Run a font module on the host, and return its globals."""
+    namespace = {"const": lambda x: x}
+    with open(path, "r", encoding="utf-8") as f:
+        exec(f.read(), namespace)
+    return namespace
+
+
+def bitmap_font_glyphs(font):
+    """Yield (character, width, MONO_HLSB bytes) for a bitmap font module."""
+    width = font["WIDTH"]
+    height = font["HEIGHT"]
+    data = bytes(font["FONT"])
+    glyph_size = (width // 8) * height
+    for code in range(font["FIRST"], font["LAST"]):
+        idx = (code - font["FIRST"]) * glyph_size
+        glyph = data[idx : idx + glyph_size]
+        if len(glyph) < glyph_size:
+            break
+        yield chr(code), width, glyph
+
+
+def truetype_font_glyphs(font):
+    """Yield (character, width, MONO_HLSB bytes) for a converted true-type font module."""
+    height = font["HEIGHT"]
+    offset_width = font["OFFSET_WIDTH"]
+    offsets = bytes(font["OFFSETS"])
+    widths = bytes(font["WIDTHS"])
+    bitmaps = bytes(font["BITMAPS"])
+
+    for idx, character in enumerate(font["MAP"]):
+        bs_bit = int.from_bytes(offsets[idx * offset_width : (idx + 1) * offset_width], "big")
+        width = widths[idx]
+        row_bytes = (width + 7) // 8
+        glyph = bytearray(row_bytes * height)
+        for y in range(height):
+            for x in range(width):
+                if bitmaps[bs_bit >> 3] & (0x80 >> (bs_bit & 7)):
+                    glyph[y * row_bytes + (x >> 3)] |= 0x80 >> (x & 7)
+                bs_bit += 1
+        yield character, width, bytes(glyph)
+
+
+def convert(font):
+    """Return the binary font file contents for a loaded font module."""
+    if "FONT" in font:
+        glyphs = list(bitmap_font_glyphs(font))
+    else:
+        glyphs = list(truetype_font_glyphs(font))
+
+    height = font["HEIGHT"]
+    char_map = "".join(glyph[0] for glyph in glyphs).encode("utf-8")
+    widths = bytes(glyph[1] for glyph in glyphs)
+    max_width = max(widths) if widths else 0
+
+    header = struct.pack(HEADER_FORMAT, MAGIC, height, max_width, len(glyphs), len(char_map))
+    offset = len(header) + len(char_map) + len(widths) + 4 * len(glyphs)
+    offsets = bytearray()
+    for glyph in glyphs:
+        offsets += struct.pack("<I", offset)
+        offset += len(glyph[2])
+
+    return header + char_map + widths + bytes(offsets) + b"".join(glyph[2] for glyph in glyphs)
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    source = sys.argv[1]
+    output = sys.argv[2] if len(sys.argv) > 2 else source.rsplit(".", 1)[0] + ".mhf"
+
+    data = convert(load_font_module(source))
+    with open(output, "wb") as f:
+        f.write(data)
+    print(f"Wrote {output} ({len(data)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
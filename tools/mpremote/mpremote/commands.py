@@ -1,3 +1,5 @@
+import ast
+import hashlib
 import os
 import sys
 import tempfile
@@ -163,6 +165,151 @@ def do_filesystem(state, args):
             raise CommandError(er)
 
 
+# Lists a remote directory tree as a repr() list of (path, is_dir, size, sha256 hex) tuples,
+# with paths relative to the given root. The root doesn't need to exist.
+_sync_hash_code = """\
+import os, hashlib, binascii
+def __mpr_hash(root):
+    root = root or os.getcwd()
+    base = root.rstrip('/') + '/'
+    buf = bytearray(1024)
+    mv = memoryview(buf)
+    dirs = ['']
+    print('[', end='')
+    while dirs:
+        rel = dirs.pop()
+        try:
+            entries = list(os.ilistdir(base + rel if rel else root))
+        except OSError:
+            continue
+        for e in entries:
+            path = rel + e[0]
+            if e[1] & 0x4000:
+                print(repr((path, True, 0, None)), end=',')
+                dirs.append(path + '/')
+                continue
+            h = hashlib.sha256()
+            size = 0
+            with open(base + path, 'rb') as f:
+                while 1:
+                    n = f.readinto(buf)
+                    if not n:
+                        break
+                    h.update(mv[:n])
+                    size += n
+            print(repr((path, False, size, binascii.hexlify(h.digest()).decode())), end=',')
+    print(']', end='')
+"""
+
+
+def do_sync(state, args):
+    state.ensure_raw_repl()
+    state.did_action()
+
+    src = args.src[0]
+    dest = args.dest[0]
+    if not os.path.isdir(src):
+        raise CommandError("sync: source must be a local directory")
+    if not dest.startswith(":"):
+        raise CommandError("sync: destination must be a remote directory (prefixed with ':')")
+    dest = dest[1:].replace(os.path.sep, "/")
+    if dest != "/":
+        dest = dest.rstrip("/")
+    verbose = args.verbose
+
+    def remote_path(rel):
+        if not dest:
+            return rel
+        return dest.rstrip("/") + "/" + rel
+
+    # Hash local files.
+    local_files = {}
+    local_dirs = set()
+    for dirpath, dirnames, filenames in os.walk(src):
+        rel_dir = os.path.relpath(dirpath, src).replace(os.path.sep, "/")
+        rel_dir = "" if rel_dir == "." else rel_dir + "/"
+        for name in dirnames:
+            local_dirs.add(rel_dir + name)
+        for name in filenames:
+            h = hashlib.sha256()
+            with open(os.path.join(dirpath, name), "rb") as f:
+                for chunk in iter(lambda: f.read(65536), b""):
+                    h.update(chunk)
+            local_files[rel_dir + name] = h.hexdigest()
+
+    # Hash remote files, in one exec.
+    try:
+        state.transport.exec(_sync_hash_code)
+        listing = state.transport.exec("__mpr_hash(%r)" % dest)
+    except TransportError as er:
+        raise CommandError("sync: could not list remote files: {}".format(er))
+    remote_files = {}
+    remote_dirs = set()
+    for path, is_dir, _size, digest in ast.literal_eval(listing.decode()):
+        if is_dir:
+            remote_dirs.add(path)
+        else:
+            remote_files[path] = digest
+
+    changed = sorted(
+        path for path, digest in local_files.items() if remote_files.get(path) != digest
+    )
+
+    # Create any missing directories (parents first), in one exec.
+    new_dirs = set()
+    if changed and dest.strip("/"):
+        parts = dest.split("/")
+        for i in range(len(parts)):
+            if parts[i]:
+                new_dirs.add("/".join(parts[: i + 1]))
+    for path in changed:
+        parts = path.split("/")[:-1]
+        for i in range(len(parts)):
+            d = "/".join(parts[: i + 1])
+            if d not in remote_dirs:
+                new_dirs.add(remote_path(d))
+    if new_dirs:
+        state.transport.exec(
+            "import os\nfor d in %r:\n try:\n  os.mkdir(d)\n except OSError:\n  pass"
+            % sorted(new_dirs, key=lambda d: d.count("/"))
+        )
+
+    for path in changed:
+        state.transport.filesystem_command(
+            ["cp", os.path.join(src, *path.split("/")), ":" + remote_path(path)],
+            progress_callback=show_progress_bar,
+            verbose=verbose,
+        )
+
+    deleted = 0
+    if args.delete:
+        # Remove stale files, then stale directories (deepest first), in one exec.
+        stale = sorted(remote_path(path) for path in remote_files if path not in local_files)
+        stale_dirs = sorted(
+            (remote_path(path) for path in remote_dirs if path not in local_dirs),
+            key=lambda d: -d.count("/"),
+        )
+        if verbose:
+            for path in stale:
+                print("rm :%s" % path)
+            for path in stale_dirs:
+                print("rmdir :%s" % path)
+        if stale or stale_dirs:
+            state.transport.exec(
+                "import os\nfor f in %r:\n os.remove(f)\nfor d in %r:\n os.rmdir(d)"
+                % (stale, stale_dirs)
+            )
+        deleted = len(stale)
+
+    print(
+        "sync: {} copied, {} unchanged{}".format(
+            len(changed),
+            len(local_files) - len(changed),
+            ", {} deleted".format(deleted) if args.delete else "",
+        )
+    )
+
+
 def do_edit(state, args):
     state.ensure_raw_repl()
     state.did_action()
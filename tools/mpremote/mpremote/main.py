@@ -36,6 +36,7 @@ from .commands import (
     do_resume,
     do_rtc,
     do_soft_reset,
+    do_sync,
 )
 from .mip import do_mip
 from .repl import do_repl
@@ -196,6 +197,19 @@ def argparse_filesystem():
     return cmd_parser
 
 
+def argparse_sync():
+    cmd_parser = argparse.ArgumentParser(
+        description="copy new and changed files from a local directory to the device"
+    )
+    _bool_flag(cmd_parser, "delete", "d", False, "delete remote files that don't exist locally")
+    _bool_flag(cmd_parser, "verbose", "v", True, "enable verbose output (default)")
+    cmd_parser.add_argument("src", nargs=1, help="local directory")
+    cmd_parser.add_argument(
+        "dest", nargs=1, help="remote directory, prefixed with ':' (use ':' for the current one)"
+    )
+    return cmd_parser
+
+
 def argparse_mip():
     cmd_parser = argparse.ArgumentParser(
         description="install packages from micropython-lib or third-party sources"
@@ -281,6 +295,10 @@ _COMMANDS = {
         do_filesystem,
         argparse_filesystem,
     ),
+    "sync": (
+        do_sync,
+        argparse_sync,
+    ),
     "mip": (
         do_mip,
         argparse_mip,
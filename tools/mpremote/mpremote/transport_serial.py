@@ -35,7 +35,7 @@
 # Once the API is stabilised, the idea is that mpremote can be used both
 # as a command line tool and a library for interacting with devices.
 
-import ast, io, errno, os, re, struct, sys, time
+import ast, io, errno, os, re, struct, sys, time, zlib
 from collections import namedtuple
 from errno import EPERM
 from .console import VT_ENABLED
@@ -59,11 +59,19 @@ def reraise_filesystem_error(e, info):
 
 
 class SerialTransport(Transport):
+    # Chunk size used by the binary fs_get/fs_put protocol.
+    binary_chunk_size = 4096
+
     def __init__(self, device, baudrate=115200, wait=0, exclusive=True):
         self.in_raw_repl = False
         self.use_raw_paste = True
         self.device_name = device
         self.mounted = False
+        # Use the on-device binary transfer helper for fs_get/fs_put, if it can be installed.
+        self.use_binary_fs = True
+        # None until the helper has been installed (or failed to install) this session.
+        self.binary_fs = None
+        self.binary_fs_crc = False
 
         import serial
         import serial.tools.list_ports
@@ -155,6 +163,7 @@ class SerialTransport(Transport):
                 raise TransportError("could not enter raw repl")
 
             self.serial.write(b"\x04")  # ctrl-D: soft reset
+            self.binary_fs = None
 
             # Waiting for "soft reboot" independently to "raw REPL" (done below)
             # allows boot.py to print, which will show up after "soft reboot"
@@ -381,6 +390,8 @@ class SerialTransport(Transport):
         self.exec("fr.close()\nfw.close()")
 
     def fs_get(self, src, dest, chunk_size=256, progress_callback=None):
+        if self._binary_fs_available():
+            return self._fs_get_binary(src, dest, progress_callback)
         if progress_callback:
             src_size = self.fs_stat(src).st_size
             written = 0
@@ -405,6 +416,8 @@ class SerialTransport(Transport):
         self.exec("f.close()")
 
     def fs_put(self, src, dest, chunk_size=256, progress_callback=None):
+        if self._binary_fs_available():
+            return self._fs_put_binary(src, dest, progress_callback)
         if progress_callback:
             src_size = os.path.getsize(src)
             written = 0
@@ -423,6 +436,102 @@ class SerialTransport(Transport):
                     progress_callback(written, src_size)
         self.exec("f.close()")
 
+    def _binary_fs_available(self):
+        # Install the binary transfer helper on the device, once per session.
+        if not self.use_binary_fs:
+            return False
+        if self.binary_fs is None:
+            try:
+                self.binary_fs_crc = self.exec(fs_binary_code) == b"1"
+                self.binary_fs = True
+            except TransportError:
+                # Device is missing something the helper needs, use the repr() protocol instead.
+                self.binary_fs = False
+        return self.binary_fs
+
+    def _read_exact(self, n, timeout=10):
+        # serial.read() comes back short (or empty) when the port times out, so keep
+        # reading until all the data is here, or nothing has arrived for timeout seconds.
+        data = b""
+        deadline = time.monotonic() + timeout
+        while len(data) < n:
+            new_data = self.serial.read(n - len(data))
+            if new_data:
+                data += new_data
+                deadline = time.monotonic() + timeout
+            elif time.monotonic() > deadline:
+                raise TransportError("timeout during binary transfer")
+        return data
+
+    def _binary_fs_end(self, data):
+        # The helper has returned (or raised), so data should be the end of its normal output.
+        if data != b"\x04":
+            raise TransportError("unexpected read during binary transfer: {}".format(data))
+        data_err = self.read_until(1, b"\x04")
+        if not data_err.endswith(b"\x04"):
+            raise TransportError("timeout waiting for second EOF reception")
+        if data_err[:-1]:
+            raise TransportError("exception", b"", data_err[:-1])
+
+    def _fs_get_binary(self, src, dest, progress_callback=None):
+        # Each frame is: 0x01, u32 length, data, u32 CRC32. The host answers each frame with
+        # ACK, or NAK to abort the transfer. A zero length frame marks the end of the file.
+        if progress_callback:
+            src_size = self.fs_stat(src).st_size
+            written = 0
+        self.exec_raw_no_follow("__mpr_get('%s',%u)" % (src, self.binary_chunk_size))
+        with open(dest, "wb") as f:
+            while True:
+                data = self._read_exact(1)
+                if data != b"\x01":
+                    self._binary_fs_end(data)
+                    raise TransportError("fs_get: transfer ended early")
+                size = struct.unpack("<I", self._read_exact(4))[0]
+                data = self._read_exact(size)
+                crc = struct.unpack("<I", self._read_exact(4))[0]
+                if self.binary_fs_crc and zlib.crc32(data) != crc:
+                    # Resending can't fix a dropped byte (every later frame would be out of
+                    # step), so stop the helper and fail instead.
+                    self.serial.write(b"\x15")
+                    try:
+                        self._binary_fs_end(self._read_exact(1))
+                    except TransportError:
+                        pass
+                    raise TransportError("fs_get: CRC error")
+                self.serial.write(b"\x06")
+                if not size:
+                    break
+                f.write(data)
+                if progress_callback:
+                    written += size
+                    progress_callback(written, src_size)
+        self._binary_fs_end(self._read_exact(1))
+
+    def _fs_put_binary(self, src, dest, progress_callback=None):
+        # The device sends 0x01 when it is ready for a chunk (data, then u32 CRC32).
+        # If a chunk arrives damaged the helper raises, and that error ends the transfer.
+        src_size = os.path.getsize(src)
+        written = 0
+        self.exec_raw_no_follow("__mpr_put('%s',%u,%u)" % (dest, src_size, self.binary_chunk_size))
+        chunk = None
+        with open(src, "rb") as f:
+            while True:
+                data = self._read_exact(1)
+                if data == b"\x01":
+                    if chunk is not None:
+                        written += len(chunk)
+                        if progress_callback:
+                            progress_callback(written, src_size)
+                    chunk = f.read(min(self.binary_chunk_size, src_size - written))
+                else:
+                    if chunk is not None and data == b"\x04":
+                        written += len(chunk)
+                        if progress_callback:
+                            progress_callback(written, src_size)
+                    self._binary_fs_end(data)
+                    return
+                self.serial.write(chunk + struct.pack("<I", zlib.crc32(chunk)))
+
     def fs_mkdir(self, dir):
         self.exec("import os\nos.mkdir('%s')" % dir)
 
@@ -512,6 +621,7 @@ class SerialTransport(Transport):
 
     def write_ctrl_d(self, out_callback):
         self.serial.write(b"\x04")
+        self.binary_fs = None
         if not self.mounted:
             return
 
@@ -961,6 +1071,64 @@ fs_hook_code = re.sub("wr_", "w", fs_hook_code)
 fs_hook_code = re.sub("buf4", "b4", fs_hook_code)
 
 
+# On-device helper for the binary fs_get/fs_put protocol.
+# It prints 1 if the device can check CRC32s, or 0 if it can't.
+fs_binary_code = """\
+import sys, micropython
+
+try:
+    from binascii import crc32 as __mpr_crc
+except ImportError:
+    __mpr_crc = None
+
+def __mpr_put(path, size, chunk):
+    fin = sys.stdin.buffer
+    fout = sys.stdout.buffer
+    buf = bytearray(chunk + 4)
+    mv = memoryview(buf)
+    # the data is binary, so ctrl-C must not interrupt
+    micropython.kbd_intr(-1)
+    try:
+        with open(path, 'wb') as f:
+            while size > 0:
+                n = min(size, chunk)
+                fout.write(b'\\x01')
+                fin.readinto(mv[:n + 4])
+                if __mpr_crc and __mpr_crc(mv[:n]) != int.from_bytes(mv[n:n + 4], 'little'):
+                    raise OSError('CRC error')
+                f.write(mv[:n])
+                size -= n
+    finally:
+        micropython.kbd_intr(3)
+
+def __mpr_get(path, chunk):
+    fin = sys.stdin.buffer
+    fout = sys.stdout.buffer
+    buf = bytearray(chunk)
+    mv = memoryview(buf)
+    with open(path, 'rb') as f:
+        while 1:
+            n = f.readinto(buf)
+            header = n.to_bytes(4, 'little')
+            crc = (__mpr_crc(mv[:n]) if __mpr_crc else 0).to_bytes(4, 'little')
+            fout.write(b'\\x01')
+            fout.write(header)
+            fout.write(mv[:n])
+            fout.write(crc)
+            if fin.read(1) != b'\\x06':
+                raise OSError('transfer aborted')
+            if not n:
+                break
+
+print(1 if __mpr_crc else 0, end='')
+"""
+
+# Apply basic compression on the binary helper code.
+fs_binary_code = re.sub(" *#.*$", "", fs_binary_code, flags=re.MULTILINE)
+fs_binary_code = re.sub("\n\n+", "\n", fs_binary_code)
+fs_binary_code = re.sub("    ", " ", fs_binary_code)
+
+
 class PyboardCommand:
     def __init__(self, fin, fout, path, unsafe_links=False):
         self.fin = fin